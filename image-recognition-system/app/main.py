@@ -3,20 +3,32 @@ FastAPI main application for Image Recognition System
 MVP: CLIP-based image similarity search
 """
 
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi import Depends, FastAPI, File, Request, UploadFile, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 import uvicorn
+import asyncio
+import json
 import os
-from typing import Dict, List
+import time
+import uuid
+from contextlib import AsyncExitStack
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
 
 from app.models.search import SearchResponse, SearchResult
 from app.models.graph import RelatedProductsResponse, OutletRecommendationResponse, RelatedProduct, Outlet
 from app.services.image_processor import ImageProcessor
 from app.services.clip_encoder import CLIPEncoder
-from app.services.vector_store import VectorStore
-from app.services.enhanced_vector_store import EnhancedVectorStore
+from app.services.clip_batcher import CLIPBatcher
+from app.services.compute_executor import ComputeExecutor, ExecutorBusyError
+from app.services.query_cache import QueryCache
+from app.services.text_embedding_cache import TextEmbeddingCache
+from app.services.store_loader import load_vector_stores
 from app.services.feature_extractors.master_extractor import MasterFeatureExtractor
 from app.services.graph_service import GraphService
 
@@ -45,51 +57,313 @@ vector_store = None
 enhanced_vector_store = None
 feature_extractor = None
 graph_service = None
+compute_executor = None
+query_cache = None
+text_embedding_cache = None
 use_enhanced_features = True  # Toggle to use enhanced features
+parallel_feature_extraction = False  # Opt-in: run independent extractors on a thread pool
+feature_extraction_workers = None  # Thread pool size (None = one per extractor, capped at CPU count)
+index_type = "flat"  # FAISS index: 'flat' (exact), 'hnsw', 'ivf_flat' or 'ivf_pq'
+index_params = None  # Index build/search parameters, e.g. {'nprobe': 32} (None = defaults)
+mutation_log_path = "data/index.wal"  # Uploads are logged here and replayed after a crash (None = off)
+index_flush_every = 200  # Save a full index snapshot (and compact the log) after this many uploads
+index_flush_interval = 300.0  # ... or on the first upload this many seconds after the last save
+compute_workers = None  # Threads for decoding, CLIP, feature extraction and search (None = CPU count, max 4)
+compute_max_backlog = 32  # Requests that may queue for a thread; beyond that the API answers 503
+feature_process_workers = 0  # Extract features on this many processes instead of the threads (0 = off)
+clip_max_batch_size = 16  # Concurrent CLIP encodes share one forward pass of up to this many images (1 = off)
+clip_max_wait_ms = 5.0  # How long an encode waits for others to join its batch
+query_cache_size = 1024  # Query images whose embedding and features are kept in memory (0 = off)
+query_cache_dir = None  # On-disk tier for the query cache, e.g. "data/query_cache" (None = memory only)
+text_cache_size = 4096  # Text search queries whose CLIP embedding is kept (besides the craft vocabulary)
+batch_search_max_images = 64  # Most images accepted by one /api/v1/search/batch request
+debug_timings_header = "X-Debug-Timings"  # Send "1" to get per-stage milliseconds in search responses
+
+# Prometheus metrics, served on /metrics
+metrics = CollectorRegistry()
+# Seconds; covers a sub-millisecond index lookup up to a slow cold request
+latency_buckets = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+http_requests = Counter("http_requests_total", "HTTP requests by route and status",
+                        ["method", "path", "status"], registry=metrics)
+http_request_seconds = Histogram("http_request_duration_seconds", "HTTP request latency by route",
+                                 ["path"], buckets=latency_buckets, registry=metrics)
+http_in_flight = Gauge("http_requests_in_flight", "HTTP requests being handled", registry=metrics)
+search_stage_seconds = Histogram("search_stage_duration_seconds", "Time spent in each search stage",
+                                 ["stage"], buckets=latency_buckets, registry=metrics)
+Gauge("compute_requests_in_flight", "Requests admitted to the compute executor", registry=metrics).set_function(
+    lambda: compute_executor.in_flight if compute_executor else 0
+)
+Gauge("clip_batch_queue_depth", "Images waiting for a batched CLIP forward pass", registry=metrics).set_function(
+    lambda: clip_encoder.stats()['queue_depth'] if isinstance(clip_encoder, CLIPBatcher) else 0
+)
 
 
 @app.on_event("startup")
 async def startup_event():
     """Initialize models and services on startup"""
     global image_processor, clip_encoder, vector_store, enhanced_vector_store, feature_extractor, graph_service, use_enhanced_features
+    global compute_executor, query_cache, text_embedding_cache
     
     print("[INFO] Initializing Image Recognition System...")
     
     # Initialize services
+    compute_executor = ComputeExecutor(
+        max_workers=compute_workers,
+        max_backlog=compute_max_backlog,
+        feature_processes=feature_process_workers
+    )
     image_processor = ImageProcessor()
     clip_encoder = CLIPEncoder()
+    if clip_max_batch_size > 1:
+        clip_encoder = CLIPBatcher(clip_encoder, max_batch_size=clip_max_batch_size, max_wait_ms=clip_max_wait_ms)
+    if query_cache_size > 0:
+        query_cache = QueryCache(max_entries=query_cache_size, disk_dir=query_cache_dir,
+                                 namespace=clip_encoder.model_name)
+    text_embedding_cache = TextEmbeddingCache(clip_encoder, max_entries=text_cache_size)
+    text_embedding_cache.warm_up()
     
     # Initialize feature extractor
-    feature_extractor = MasterFeatureExtractor()
-    
-    # Initialize vector stores
-    vector_store = VectorStore()
-    enhanced_vector_store = EnhancedVectorStore()
+    feature_extractor = MasterFeatureExtractor(
+        concurrent=parallel_feature_extraction,
+        max_workers=feature_extraction_workers
+    )
     
     # Initialize graph service
     graph_service = GraphService()
     
-    # Load or create indexes
-    vector_store.load_or_create_index(clip_encoder, create_sample_data=False)
+    # Load or create the vector store (the enhanced store, which also serves CLIP-only search, if it loads)
+    vector_store, enhanced_vector_store = load_vector_stores(
+        clip_encoder, wal_path=mutation_log_path,
+        index_type=index_type, index_params=index_params,
+        flush_every=index_flush_every, flush_interval=index_flush_interval
+    )
     
-    # Try to load enhanced store, fallback to basic if no features exist
-    try:
-        enhanced_vector_store.load_or_create_index(clip_encoder, create_sample_data=False)
+    # Fallback to basic search if no features exist
+    if enhanced_vector_store is None:
+        print("[INFO] Using basic CLIP search.")
+        use_enhanced_features = False
+    else:
+        stale = enhanced_vector_store.stale_features(feature_extractor.feature_versions())
         if len(enhanced_vector_store.features) == 0:
             print("[INFO] No enhanced features found. Using basic CLIP search.")
             print("[INFO] Run: python scripts/reindex_with_features.py to enable multi-feature search")
             use_enhanced_features = False
+        elif stale:
+            print(f"[WARNING] Stored {', '.join(stale)} features come from an older extractor version "
+                  f"and don't compare with new queries. Using basic CLIP search.")
+            print("[INFO] Run: python scripts/reindex_with_features.py to re-enable multi-feature search")
+            use_enhanced_features = False
         else:
             print(f"[OK] Enhanced features loaded for {len(enhanced_vector_store.features)} products")
             use_enhanced_features = True
-    except Exception as e:
-        print(f"[INFO] Enhanced vector store not available: {e}")
-        print("[INFO] Using basic CLIP search.")
-        use_enhanced_features = False
     
     print("[OK] System ready!")
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Save pending index updates and release worker threads on shutdown"""
+    if vector_store is not None:
+        vector_store.flush()
+    if feature_extractor is not None:
+        feature_extractor.shutdown()
+    if compute_executor is not None:
+        compute_executor.shutdown()
+    if isinstance(clip_encoder, CLIPBatcher):
+        clip_encoder.shutdown()
+
+
+@app.exception_handler(ExecutorBusyError)
+async def executor_busy_handler(request: Request, exc: ExecutorBusyError):
+    """Answer 503 when the compute backlog is full, so clients back off"""
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
+
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Count and time requests by route (the path template, e.g. /api/v1/products/{product_id})"""
+    http_in_flight.inc()
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        http_in_flight.dec()
+        path = getattr(request.scope.get("route"), "path", "unmatched")
+        http_requests.labels(method=request.method, path=path, status=status).inc()
+        http_request_seconds.labels(path=path).observe(time.perf_counter() - start)
+
+
+async def compute_slot():
+    """Dependency admitting a request to the compute executor until it completes"""
+    async with compute_executor.reserve():
+        yield
+
+
+def search_filters(material: Optional[str] = None, object_type: Optional[str] = None,
+                   outlet_id: Optional[str] = None, available: bool = False) -> Optional[Dict]:
+    """
+    Dependency turning filter query parameters into store search filters
+    
+    Filters are applied inside the candidate search, so a filtered query
+    returns the nearest matching products rather than an emptied top list.
+    
+    Args:
+        material: Predicted material (e.g. wood)
+        object_type: Predicted object type (e.g. mask)
+        outlet_id: Only products sold at this outlet
+        available: Only products sold at any outlet
+    """
+    filters = {}
+    if material:
+        filters['material'] = material
+    if object_type:
+        filters['object_type'] = object_type
+    if outlet_id or available:
+        if not graph_service:
+            raise HTTPException(status_code=503, detail="Graph service not available")
+        filters['product_ids'] = graph_service.get_products_at_outlets(outlet_id or None)
+    return filters or None
+
+
+def _clip_only_filters(filters: Optional[Dict]) -> Optional[Dict]:
+    """Filters for a CLIP-only search, checking that material/object type filters can be applied"""
+    if not filters or not (filters.get('material') or filters.get('object_type')):
+        return filters
+    if not enhanced_vector_store or len(enhanced_vector_store.features) == 0:
+        raise HTTPException(
+            status_code=400,
+            detail="Material and object type filters need extracted features "
+                   "(run scripts/reindex_with_features.py)"
+        )
+    return filters  # vector_store is the enhanced store, which filters by predicted attributes
+
+
+def _lookup_bytes(image_bytes: bytes) -> Tuple[str, Dict]:
+    """Hash an uploaded file and look it up in the query cache"""
+    bytes_key = query_cache.bytes_key(image_bytes)
+    return bytes_key, query_cache.get(bytes_key) or {}
+
+
+def _decode_and_lookup(image_bytes: bytes) -> Tuple[np.ndarray, Optional[str], Dict]:
+    """Preprocess an uploaded image and look up its pixels in the query cache"""
+    processed_image = image_processor.preprocess(image_bytes)
+    if query_cache is None:
+        return processed_image, None, {}
+    pixels_key = query_cache.pixels_key(processed_image)
+    return processed_image, pixels_key, query_cache.get(pixels_key) or {}
+
+
+async def _run_timed(timings: Optional[Dict], stage: str, fn, *args, **kwargs):
+    """compute_executor.run, storing fn's run time (not its wait for a thread) in timings[stage]"""
+    if timings is None:
+        return await compute_executor.run(fn, *args, **kwargs)
+    
+    def timed():
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            timings[stage] = time.perf_counter() - start
+    return await compute_executor.run(timed)
+
+
+def _cache_query(keys: List[str], entry: Dict):
+    """Store a query's embedding/features under each of its cache keys"""
+    for key in keys:
+        query_cache.put(key, entry)
+
+
+async def embed_query(image_bytes: bytes, with_features: bool,
+                      timings: Optional[Dict] = None) -> Tuple[np.ndarray, Optional[Dict]]:
+    """
+    CLIP embedding (and all extracted features) of a query image
+    
+    Repeated uploads are served from the query cache, keyed by the file
+    bytes and by the decoded pixels, skipping decoding, CLIP and extraction.
+    
+    Args:
+        image_bytes: Uploaded file
+        with_features: Also extract all features
+        timings: If given, seconds spent in each stage that ran ('preprocess',
+            'clip', 'features' and 'extract_<extractor>') are stored in it
+    
+    Returns:
+        (clip_embedding, features); features is None unless with_features
+    """
+    bytes_key = None
+    entry = {}
+    if query_cache is not None:
+        bytes_key, entry = await compute_executor.run(_lookup_bytes, image_bytes)
+        if 'clip' in entry and (not with_features or entry.get('features') is not None):
+            return entry['clip'], entry.get('features') if with_features else None
+    
+    processed_image, pixels_key, pixels_entry = await _run_timed(
+        timings, 'preprocess', _decode_and_lookup, image_bytes
+    )
+    entry = {**pixels_entry, **entry}
+    
+    if 'clip' not in entry:
+        entry['clip'] = await _run_timed(timings, 'clip', clip_encoder.encode_image, processed_image)
+    if with_features and entry.get('features') is None:
+        entry['features'] = await compute_executor.extract_features(feature_extractor, processed_image)
+        if timings is not None:
+            for name, seconds in entry['features']['timings'].items():
+                timings['features' if name == 'total' else f"extract_{name}"] = seconds
+    
+    if query_cache is not None:
+        await compute_executor.run(_cache_query, [bytes_key, pixels_key], entry)
+    return entry['clip'], entry.get('features') if with_features else None
+
+
+def _similarity_features(query_clip: np.ndarray, query_features: Dict) -> Dict:
+    """Prepare a query's extracted features for similarity computation"""
+    return {
+        'geometric': query_features['geometric'],
+        'color': query_features['color'],
+        'texture': query_features['texture'],
+        'pattern': query_features['pattern'],
+        'material': query_features['material'],
+        'object_type': query_features['object_type'],
+        'clip': query_clip
+    }
+
+
+def _features_summary(query_features: Dict) -> Dict:
+    """Query features included in search responses"""
+    return {
+        'material': query_features['material']['predicted_material'],
+        'object_type': query_features['object_type']['predicted_type'],
+        'edge_count': query_features['geometric']['edge_count'],
+        'dominant_colors': len(query_features['color']['dominant_colors'])
+    }
+
+
+def _search_response(response: SearchResponse, timings: Dict[str, float], request: Request) -> JSONResponse:
+    """
+    Serialize a search response and record its stage timings in the metrics
+    
+    With the debug timings header set, the milliseconds spent in each stage
+    are included in the response as 'timings'.
+    """
+    start = time.perf_counter()
+    content = jsonable_encoder(response)
+    timings['serialization'] = time.perf_counter() - start
+    
+    for stage, seconds in timings.items():
+        search_stage_seconds.labels(stage=stage).observe(seconds)
+    if request.headers.get(debug_timings_header, "").lower() in ("1", "true", "yes"):
+        content['timings'] = {stage: round(seconds * 1000.0, 3) for stage, seconds in timings.items()}
+    return JSONResponse(content=content)
+
+
+def _ndjson(obj) -> str:
+    """One line of an NDJSON stream"""
+    return json.dumps(jsonable_encoder(obj)) + "\n"
+
+
 @app.get("/")
 async def root():
     """Health check endpoint"""
@@ -109,12 +383,30 @@ async def health():
             "image_processor": image_processor is not None,
             "clip_encoder": clip_encoder is not None,
             "vector_store": vector_store is not None
-        }
+        },
+        "compute": {
+            "in_flight": compute_executor.in_flight if compute_executor else 0,
+            "capacity": compute_executor.capacity if compute_executor else 0
+        },
+        "clip_batching": clip_encoder.stats() if isinstance(clip_encoder, CLIPBatcher) else None,
+        "query_cache": query_cache.stats() if query_cache else None,
+        "text_cache": text_embedding_cache.stats() if text_embedding_cache else None
     }
 
 
+@app.get("/metrics")
+async def get_metrics():
+    """Request counts, latencies, per-stage search timings and in-flight gauges (Prometheus text format)"""
+    return Response(content=generate_latest(metrics), media_type=CONTENT_TYPE_LATEST)
+
+
 @app.post("/api/v1/search", response_model=SearchResponse)
-async def search_image(file: UploadFile = File(...)):
+async def search_image(
+    request: Request,
+    file: UploadFile = File(...),
+    filters: Optional[Dict] = Depends(search_filters),
+    _slot: None = Depends(compute_slot)
+):
     """
     Search for similar handicraft products by uploading an image
     
@@ -123,9 +415,11 @@ async def search_image(file: UploadFile = File(...)):
     
     Args:
         file: Image file (JPG, PNG, etc.)
+        material, object_type, outlet_id, available: Optional filters
         
     Returns:
         SearchResponse with top matches, similarity scores, and per-feature breakdown
+        (plus per-stage timings if the X-Debug-Timings: 1 header is sent)
     """
     if not file.content_type or not file.content_type.startswith("image/"):
         raise HTTPException(status_code=400, detail="File must be an image")
@@ -134,71 +428,219 @@ async def search_image(file: UploadFile = File(...)):
         # Read uploaded image
         image_bytes = await file.read()
         
-        # Preprocess image
-        processed_image = image_processor.preprocess(image_bytes)
-        
-        # Extract CLIP embedding
-        query_clip = clip_encoder.encode_image(processed_image)
-        
         # Check if enhanced features are available
         global enhanced_vector_store, feature_extractor, use_enhanced_features
         
         # Debug: Check feature availability
         has_features = enhanced_vector_store and len(enhanced_vector_store.features) > 0
+        use_features = bool(use_enhanced_features and has_features)
+        
+        # Decode, extract CLIP embedding (and features), or reuse a cached query
+        timings = {}
+        query_clip, query_features = await embed_query(image_bytes, with_features=use_features, timings=timings)
         
-        if use_enhanced_features and has_features:
+        if use_features:
             # Use enhanced multi-feature search
-            query_features = feature_extractor.extract_all(processed_image)
-            
-            # Prepare features for similarity computation
-            query_features_dict = {
-                'geometric': query_features['geometric'],
-                'color': query_features['color'],
-                'texture': query_features['texture'],
-                'pattern': query_features['pattern'],
-                'material': query_features['material'],
-                'object_type': query_features['object_type'],
-                'clip': query_clip
-            }
-            
-            results = enhanced_vector_store.search_with_features(
-                query_clip, query_features_dict, top_k=5
+            results = await compute_executor.run(
+                enhanced_vector_store.search_with_features,
+                query_clip, _similarity_features(query_clip, query_features), top_k=5,
+                timings=timings, filters=filters
             )
             
             # Include query features in response
-            query_features_summary = {
-                'material': query_features['material']['predicted_material'],
-                'object_type': query_features['object_type']['predicted_type'],
-                'edge_count': query_features['geometric']['edge_count'],
-                'dominant_colors': len(query_features['color']['dominant_colors'])
-            }
+            query_features_summary = _features_summary(query_features)
         else:
             # Fallback to basic CLIP search
-            results = vector_store.search(query_clip, top_k=5)
+            results = await compute_executor.run(
+                vector_store.search, query_clip, top_k=5, timings=timings, filters=_clip_only_filters(filters)
+            )
             query_features_summary = None
         
-        return SearchResponse(
+        return _search_response(SearchResponse(
             query_id=file.filename or "upload",
             results=results,
             total_matches=len(results),
             query_features=query_features_summary
-        )
+        ), timings, request)
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing image: {str(e)}")
 
 
+@app.post("/api/v1/search/batch")
+async def search_batch(
+    files: List[UploadFile] = File(...),
+    top_k: int = 5,
+    filters: Optional[Dict] = Depends(search_filters)
+):
+    """
+    Search with many images in one request (e.g. an inventory photo set)
+    
+    Images are decoded, embedded and feature-extracted in parallel on the
+    compute threads (their CLIP encodes share forward passes), then all of
+    them are matched with a single batched FAISS query.
+    
+    Args:
+        files: Image files
+        top_k: Number of results per image
+        material, object_type, outlet_id, available: Optional filters
+        
+    Returns:
+        NDJSON stream with one SearchResponse per image, or
+        {"query_id", "error"} for an image that could not be processed.
+        Failures are streamed as they happen; results follow the batched query.
+    """
+    if len(files) > batch_search_max_images:
+        raise HTTPException(
+            status_code=400, detail=f"At most {batch_search_max_images} images per batch"
+        )
+    uploads = [
+        (file.filename or f"upload_{i}", file.content_type, await file.read())
+        for i, file in enumerate(files)
+    ]
+    
+    has_features = enhanced_vector_store and len(enhanced_vector_store.features) > 0
+    use_features = bool(use_enhanced_features and has_features)
+    if not use_features:
+        filters = _clip_only_filters(filters)
+    
+    # 503 while the executor is full; the stream takes its compute slot once it
+    # starts, so a response that is never sent holds none
+    compute_executor.check_admission()
+    return StreamingResponse(
+        _stream_batch_search(uploads, top_k, use_features, filters), media_type="application/x-ndjson"
+    )
+
+
+async def _stream_batch_search(uploads: List[Tuple[str, Optional[str], bytes]], top_k: int,
+                               use_features: bool, filters: Optional[Dict]):
+    """Embed a batch's images in parallel, search them together and yield NDJSON lines"""
+    # At most one image per compute thread, so other requests keep being served
+    limit = asyncio.Semaphore(compute_executor.max_workers)
+    
+    async def embed(i: int, image_bytes: bytes):
+        async with limit:
+            try:
+                return i, await embed_query(image_bytes, with_features=use_features), None
+            except Exception as e:
+                return i, None, f"Error processing image: {str(e)}"
+    
+    async with AsyncExitStack() as slot:
+        try:
+            # Held for the whole stream, released when it ends or is closed
+            await slot.enter_async_context(compute_executor.reserve())
+        except ExecutorBusyError as e:
+            # Filled up after the endpoint checked; the 503 can't be sent any more
+            for name, _, _ in uploads:
+                yield _ndjson({"query_id": name, "error": str(e)})
+            return
+        
+        tasks = []
+        for i, (name, content_type, image_bytes) in enumerate(uploads):
+            if not content_type or not content_type.startswith("image/"):
+                yield _ndjson({"query_id": name, "error": "File must be an image"})
+            else:
+                tasks.append(asyncio.ensure_future(embed(i, image_bytes)))
+        
+        try:
+            embedded = {}
+            for next_done in asyncio.as_completed(tasks):
+                i, embedding, error = await next_done
+                if error is not None:
+                    yield _ndjson({"query_id": uploads[i][0], "error": error})
+                else:
+                    embedded[i] = embedding
+        finally:
+            for task in tasks:
+                task.cancel()  # Client went away
+        
+        if not embedded:
+            return
+        order = sorted(embedded)
+        query_clips = np.stack([embedded[i][0] for i in order])
+        try:
+            if use_features:
+                batch = await compute_executor.run(
+                    enhanced_vector_store.search_with_features_batch, query_clips,
+                    [_similarity_features(*embedded[i]) for i in order], top_k=top_k, filters=filters
+                )
+            else:
+                batch = await compute_executor.run(
+                    vector_store.search_batch, query_clips, top_k=top_k, filters=filters
+                )
+        except Exception as e:
+            for i in order:
+                yield _ndjson({"query_id": uploads[i][0], "error": f"Error searching: {str(e)}"})
+            return
+        
+        for i, results in zip(order, batch):
+            yield _ndjson(SearchResponse(
+                query_id=uploads[i][0],
+                results=results,
+                total_matches=len(results),
+                query_features=_features_summary(embedded[i][1]) if use_features else None
+            ))
+
+
+@app.get("/api/v1/search/text", response_model=SearchResponse)
+async def search_text(
+    request: Request,
+    q: str,
+    top_k: int = 5,
+    filters: Optional[Dict] = Depends(search_filters),
+    _slot: None = Depends(compute_slot)
+):
+    """
+    Search products with a text description (e.g. "brass oil lamp")
+    
+    The query is embedded with CLIP's text encoder and matched against the
+    product image embeddings. Craft and material terms are precomputed and
+    recent queries are cached, so repeated searches skip the model.
+    
+    Args:
+        q: Search text
+        top_k: Number of results to return
+        material, object_type, outlet_id, available: Optional filters
+    """
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="Query text must not be empty")
+    filters = _clip_only_filters(filters)
+    
+    try:
+        timings = {}
+        query_clip = text_embedding_cache.get(q)
+        if query_clip is None:
+            query_clip = await _run_timed(timings, 'text_encode', text_embedding_cache.encode, q)
+        
+        results = await compute_executor.run(
+            vector_store.search, query_clip, top_k=top_k, timings=timings, filters=filters
+        )
+        
+        return _search_response(SearchResponse(
+            query_id=q,
+            results=results,
+            total_matches=len(results)
+        ), timings, request)
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error searching text: {str(e)}")
+
+
 @app.post("/api/v1/upload-product")
 async def upload_product(
     file: UploadFile = File(...),
     product_id: str = None,
     title: str = None,
-    description: str = None
+    description: str = None,
+    _slot: None = Depends(compute_slot)
 ):
     """
     Add a product image to the vector database (for indexing products)
     
-    This endpoint allows you to add new product images to the search index
+    This endpoint allows you to add new product images to the search index.
+    Uploading an existing product_id replaces that product.
     """
     if not file.content_type or not file.content_type.startswith("image/"):
         raise HTTPException(status_code=400, detail="File must be an image")
@@ -207,23 +649,21 @@ async def upload_product(
         # Read image
         image_bytes = await file.read()
         
-        # Preprocess
-        processed_image = image_processor.preprocess(image_bytes)
-        
-        # Extract embedding
-        embedding = clip_encoder.encode_image(processed_image)
+        # Preprocess and extract embedding (shared with the query cache)
+        embedding, _ = await embed_query(image_bytes, with_features=False)
         
         # Add to vector store
-        product_id = product_id or f"product_{len(vector_store.products)}"
-        vector_store.add_product(
-            product_id=product_id,
-            embedding=embedding,
-            metadata={
+        product_id = product_id or f"product_{uuid.uuid4().hex[:12]}"
+        product = {
+            'product_id': product_id,
+            'embedding': embedding,
+            'metadata': {
                 "title": title or "Unknown Product",
                 "description": description or "",
                 "filename": file.filename
             }
-        )
+        }
+        await compute_executor.run(vector_store.add_products, [product])
         
         return {
             "status": "success",
@@ -235,6 +675,75 @@ async def upload_product(
         raise HTTPException(status_code=500, detail=f"Error adding product: {str(e)}")
 
 
+@app.delete("/api/v1/products/{product_id}")
+async def delete_product(product_id: str, _slot: None = Depends(compute_slot)):
+    """
+    Remove a product from the search index
+    
+    The index is compacted in the background once enough products were removed
+    """
+    if not await compute_executor.run(vector_store.remove_product, product_id):
+        raise HTTPException(status_code=404, detail=f"Product '{product_id}' not found")
+    
+    return {
+        "status": "success",
+        "product_id": product_id,
+        "message": "Product removed from index"
+    }
+
+
+@app.get("/api/v1/products/{product_id}/similar", response_model=SearchResponse)
+async def get_similar_products(
+    product_id: str,
+    top_k: int = 5,
+    filters: Optional[Dict] = Depends(search_filters),
+    _slot: None = Depends(compute_slot)
+):
+    """
+    Find products that look like a stored product ("more like this")
+    
+    Uses the product's stored CLIP vector and feature rows as the query, so
+    no image is decoded or encoded. The product itself is not returned.
+    
+    Args:
+        product_id: Stored product ID
+        top_k: Number of results to return
+        material, object_type, outlet_id, available: Optional filters
+    """
+    try:
+        results = None
+        query_features_summary = None
+        if use_enhanced_features and enhanced_vector_store:
+            results = await compute_executor.run(
+                enhanced_vector_store.find_similar_with_features, product_id, top_k=top_k, filters=filters
+            )
+            if results is not None:
+                attributes = enhanced_vector_store.features.get(product_id, {})
+                query_features_summary = {
+                    'material': attributes.get('material', {}).get('predicted_material'),
+                    'object_type': attributes.get('object_type', {}).get('predicted_type')
+                }
+        if results is None:
+            # Fallback to basic CLIP search
+            results = await compute_executor.run(
+                vector_store.find_similar, product_id, top_k=top_k, filters=_clip_only_filters(filters)
+            )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error finding similar products: {str(e)}")
+    
+    if results is None:
+        raise HTTPException(status_code=404, detail=f"Product '{product_id}' not found")
+    
+    return SearchResponse(
+        query_id=product_id,
+        results=results,
+        total_matches=len(results),
+        query_features=query_features_summary
+    )
+
+
 @app.get("/api/v1/products/{product_id}/related", response_model=RelatedProductsResponse)
 async def get_related_products(product_id: str, max_results: int = 5):
     """
@@ -255,11 +764,10 @@ async def get_related_products(product_id: str, max_results: int = 5):
     for rel in related:
         # Try to get product metadata
         product_meta = None
-        if enhanced_vector_store:
-            for p in enhanced_vector_store.products:
-                if p['id'] == rel['product_id']:
-                    product_meta = p.get('metadata', {})
-                    break
+        if vector_store:
+            product = vector_store.get_product(rel['product_id'])
+            if product is not None:
+                product_meta = product.get('metadata', {})
         
         filename = None
         image_url = None
@@ -272,6 +780,7 @@ async def get_related_products(product_id: str, max_results: int = 5):
             product_id=rel['product_id'],
             relationship=rel['relationship'],
             weight=rel['weight'],
+            relationships=rel.get('relationships'),
             material=rel.get('metadata', {}).get('material'),
             object_type=rel.get('metadata', {}).get('object_type'),
             title=rel.get('metadata', {}).get('title') or (product_meta.get('title') if product_meta else None),
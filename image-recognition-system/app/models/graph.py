@@ -9,8 +9,9 @@ from typing import List, Dict, Optional, Tuple
 class RelatedProduct(BaseModel):
     """Related product information"""
     product_id: str
-    relationship: str  # SIMILAR_TO, SAME_MATERIAL, SAME_TYPE
-    weight: float
+    relationship: str  # SIMILAR_TO, SAME_MATERIAL, SAME_TYPE (strongest one)
+    weight: float      # Combined weight of all relationships
+    relationships: Optional[Dict[str, float]] = None  # Every relationship type -> weight
     material: Optional[str] = None
     object_type: Optional[str] = None
     title: Optional[str] = None
@@ -26,6 +26,7 @@ class SearchResponse(BaseModel):
     results: List[SearchResult]
     total_matches: int
     query_features: Optional[Dict] = None  # Extracted features from query image
+    timings: Optional[Dict[str, float]] = None  # Milliseconds per search stage (debug header only)
 
 
 
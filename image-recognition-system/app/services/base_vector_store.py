@@ -0,0 +1,576 @@
+"""
+Shared storage for the vector stores
+Positional FAISS rows with tombstones, batched atomic saves, the mutation log, compaction and CLIP search
+"""
+
+import faiss
+import numpy as np
+import pickle
+import os
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from typing import List, Dict, Optional
+
+from app.models.search import SearchResult
+from app.services.index_factory import (
+    build_index, create_index, reconstruct, reconstruct_all, requires_training, resolve_params, search_subset,
+    truncate_index
+)
+from app.services.index_config import IndexConfigMixin
+from app.services.mutation_log import MutationLog
+from app.services.persistence import atomic_path
+from app.services.read_write_lock import ReadWriteLock
+
+
+class BaseVectorStore(IndexConfigMixin):
+    """
+    Product rows, persistence, compaction and CLIP-only search for
+    VectorStore and EnhancedVectorStore
+    
+    Row i of the FAISS index belongs to products[i]. Stores keeping more
+    data per row extend _apply_add, _apply_remove and _tombstone, and
+    load, save and compact that data in _load_rows, _save_rows and
+    _rows_compacted.
+    """
+    
+    def __init__(self, index_path: str, metadata_path: str, index_type: str = "flat",
+                 index_params: Optional[Dict] = None, flush_every: int = 1,
+                 flush_interval: Optional[float] = None, wal_path: Optional[str] = None,
+                 compact_threshold: Optional[float] = 0.25):
+        """
+        Initialize the shared store state (see VectorStore for the arguments)
+        """
+        self.index_path = index_path
+        self.metadata_path = metadata_path
+        self.index_type = index_type
+        self.index_params = resolve_params(index_type, index_params)
+        self._configured_params = dict(index_params or {})  # Explicit overrides of saved params
+        self.active_index_type = "flat"  # Type of the index currently in use
+        self.flush_every = max(1, flush_every)
+        self.flush_interval = flush_interval
+        self._unsaved_count = 0  # Products added or removed since the last save
+        self._last_save_time = time.monotonic()
+        self.mutation_log = MutationLog(wal_path) if wal_path else None
+        self.compact_threshold = compact_threshold
+        self._lock = threading.RLock()  # Guards the index and per-row data against the compaction thread
+        self._index_lock = ReadWriteLock()  # Searches share the index outside _lock; index.add takes it alone
+        self._compaction_thread: Optional[threading.Thread] = None
+        self._generation = 0  # Bumped by every change; a compaction built on an older one is dropped
+        
+        # Create data directory if it doesn't exist
+        os.makedirs(os.path.dirname(index_path), exist_ok=True)
+        
+        self.index: Optional[faiss.Index] = None
+        self.products: List[Dict] = []  # Product metadata list (row i = FAISS id i)
+        self.tombstones: set = set()  # Rows of removed or replaced products, skipped until compact()
+        self._rows: Dict[str, int] = {}  # product_id -> row of its current entry
+        self.embedding_dim: Optional[int] = None
+    
+    def load_or_create_index(self, clip_encoder, create_sample_data: bool = True):
+        """
+        Load existing index or create new one
+        
+        Args:
+            clip_encoder: CLIPEncoder instance (to get embedding dimension)
+            create_sample_data: If True and index is empty, create sample products
+        """
+        self.embedding_dim = clip_encoder.embedding_dim
+        
+        # Try to load existing index
+        if os.path.exists(self.index_path) and os.path.exists(self.metadata_path):
+            print(f"[INFO] Loading existing index from {self.index_path}")
+            self._load_index()
+        else:
+            print("[INFO] Creating new FAISS index")
+            self._create_index()
+            # Products logged before the first save
+            self._replay_mutation_log(snapshot_seq=0)
+            
+            # Create sample data if requested (for testing without real products)
+            if create_sample_data and len(self.products) == 0:
+                print("[INFO] Creating sample products for testing...")
+                self._create_sample_data(clip_encoder)
+    
+    def _create_index(self):
+        """Create a new FAISS index"""
+        # Use L2 (Euclidean) distance index
+        # Since embeddings are normalized, L2 distance is equivalent to cosine distance
+        # Trained index types need embeddings first; start flat until rebuild_index()
+        self.active_index_type = "flat" if requires_training(self.index_type) else self.index_type
+        self.index = create_index(self.embedding_dim, self.active_index_type, self.index_params)
+    
+    def _create_sample_data(self, clip_encoder):
+        """Create sample products for testing"""
+        raise NotImplementedError
+    
+    def _load_index(self):
+        """Load index and metadata from disk and replay the mutation log"""
+        self.index = faiss.read_index(self.index_path)
+        
+        with open(self.metadata_path, 'rb') as f:
+            metadata = pickle.load(f)
+        self.products = metadata.get('products', [])
+        self.tombstones = set(metadata.get('tombstones', []))
+        self._check_index_rows(metadata)
+        self._rebuild_row_map()
+        self._load_rows(metadata)
+        
+        self._replay_mutation_log(metadata.get('wal_seq', 0))
+        
+        # After the per-row data, since a rebuild saves it too
+        self._apply_index_config(metadata.get('index_config'))
+        
+        print(f"[OK] Loaded {self.product_count} products from index")
+    
+    def _check_index_rows(self, metadata: Dict):
+        """
+        Line the loaded index up with the metadata before the log is replayed
+        
+        The index file is replaced before the metadata, so a crash between
+        the two leaves an index with rows of products that are only in the
+        mutation log. Those rows are dropped here and replayed from the log.
+        
+        Raises:
+            ValueError: If the index does not start with the rows the
+                metadata was saved with (e.g. a compaction was interrupted)
+        """
+        saved_rows = metadata.get('ntotal')
+        if saved_rows is None:
+            return  # Saved before the row count was recorded
+        if self.index.ntotal < saved_rows or (
+            saved_rows > 0 and not np.array_equal(reconstruct(self.index, saved_rows - 1), metadata['last_vector'])
+        ):
+            raise ValueError(
+                f"{self.index_path} does not hold the {saved_rows} rows {self.metadata_path} was saved with. "
+                f"Re-index the products (scripts/reindex_with_features.py or scripts/load_images.py)."
+            )
+        if self.index.ntotal > saved_rows:
+            print(f"[WARNING] Dropping {self.index.ntotal - saved_rows} index rows saved after the metadata")
+            saved_config = metadata.get('index_config') or {}
+            self.index = truncate_index(self.index, saved_rows, saved_config.get('params'))
+    
+    def _load_rows(self, metadata: Dict):
+        """Load per-row data saved with the metadata (before the log is replayed)"""
+    
+    def _save_index(self):
+        """Save index, per-row data and metadata to disk (each file is replaced atomically)"""
+        with atomic_path(self.index_path) as tmp_path:
+            faiss.write_index(self.index, tmp_path)
+        
+        self._save_rows()
+        
+        # Metadata last: its wal_seq marks which logged mutations the snapshot holds
+        with atomic_path(self.metadata_path) as tmp_path:
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(self._metadata(), f)
+        
+        # The snapshot now holds every logged mutation: compact the log
+        if self.mutation_log is not None:
+            self.mutation_log.reset()
+        
+        self._unsaved_count = 0
+        self._last_save_time = time.monotonic()
+        print(f"[OK] Saved index with {self.product_count} products")
+    
+    def _save_rows(self):
+        """Save per-row data (after the index, before the metadata)"""
+    
+    def _metadata(self) -> Dict:
+        """Metadata saved with the index"""
+        metadata = {
+            'products': self.products,
+            'tombstones': sorted(self.tombstones),
+            'index_config': self._index_config(),
+            # Checked on load, in case the index file was replaced and the metadata wasn't
+            'ntotal': self.index.ntotal,
+            'last_vector': reconstruct(self.index, self.index.ntotal - 1) if self.index.ntotal else None
+        }
+        if self.mutation_log is not None:
+            metadata['wal_seq'] = self.mutation_log.last_seq  # Logged mutations in this snapshot
+        return metadata
+    
+    def flush(self):
+        """Save products added or removed since the last save, if any"""
+        with self._lock:
+            if self._unsaved_count > 0:
+                self._save_index()
+    
+    def _products_changed(self, count: int):
+        """Record unsaved changes and save once a flush threshold is reached"""
+        self._unsaved_count += count
+        interval_elapsed = (
+            self.flush_interval is not None
+            and time.monotonic() - self._last_save_time >= self.flush_interval
+        )
+        if self._unsaved_count >= self.flush_every or interval_elapsed:
+            self._save_index()
+    
+    def compact(self) -> bool:
+        """
+        Rebuild the index, metadata and per-row data without the rows of
+        removed or replaced products
+        
+        The new index is built outside the lock, so searches and adds go on
+        meanwhile. If the store changed during the build the result is
+        dropped; the next removal schedules another compaction. IVF-PQ
+        indexes are rebuilt from their compressed vectors.
+        
+        Returns:
+            True if the store was compacted
+        """
+        with self._lock:
+            if not self.tombstones:
+                return False
+            generation = self._generation
+            live_rows = np.array(
+                [row for row in range(len(self.products)) if row not in self.tombstones], dtype=np.int64
+            )
+            embeddings = reconstruct_all(self.index)[live_rows]
+            index_type = self.active_index_type
+            if len(live_rows) == 0 and requires_training(index_type):
+                index_type = "flat"  # Nothing to train on
+            params = dict(self.index_params)
+        
+        print(f"[INFO] Compacting index to {len(live_rows)} products...")
+        index = build_index(embeddings, index_type, params)
+        
+        with self._lock:
+            if self._generation != generation:
+                print("[INFO] Index changed during compaction, keeping the current one")
+                return False
+            self.index = index
+            self.active_index_type = index_type
+            self.products = [self.products[row] for row in live_rows]
+            self.tombstones = set()
+            self._rebuild_row_map()
+            self._rows_compacted(live_rows)
+            self._generation += 1
+            self._save_index()
+        return True
+    
+    def _rows_compacted(self, live_rows: np.ndarray):
+        """Keep only the given rows of per-row data (row i becomes live_rows[i])"""
+    
+    def _maybe_compact(self):
+        """Start a background compaction once compact_threshold of the rows are tombstones"""
+        with self._lock:
+            if self.compact_threshold is None or not self.tombstones:
+                return
+            if len(self.tombstones) < self.compact_threshold * len(self.products):
+                return
+            if self._compaction_thread is not None and self._compaction_thread.is_alive():
+                return
+            self._compaction_thread = threading.Thread(target=self.compact, name="index-compaction", daemon=True)
+            self._compaction_thread.start()
+    
+    def add_products(self, products: List[Dict]):
+        """
+        Add several products with a single index update
+        
+        Args:
+            products: List of {'product_id', 'embedding', 'metadata'} dicts
+                (the add_product arguments; EnhancedVectorStore also takes
+                an optional 'all_features'). Stored products with the same
+                IDs are replaced.
+        """
+        if self.index is None:
+            raise RuntimeError("Index not initialized. Call load_or_create_index() first.")
+        if not products:
+            return
+        
+        records = [self._add_record(product) for product in products]
+        with self._lock:
+            # Logged before the index changes, so the products survive a crash before the next save
+            self._apply_add(records, log=True)
+            
+            # Saves once flush_every products are pending (every add by default)
+            self._products_changed(len(records))
+        self._maybe_compact()
+    
+    def _add_record(self, product: Dict) -> Dict:
+        """Mutation log record of an add_products entry"""
+        return {
+            'op': 'add', 'product_id': product['product_id'],
+            'embedding': np.asarray(product['embedding'], dtype='float32'),
+            'metadata': product['metadata']
+        }
+    
+    def remove_product(self, product_id: str) -> bool:
+        """
+        Remove a product from the vector store
+        
+        Its FAISS row stays in the index as a tombstone that search skips
+        (HNSW and PQ indexes cannot delete in place, and deleting from a
+        flat index would renumber the rows) until compact() drops it.
+        
+        Args:
+            product_id: Product identifier
+        
+        Returns:
+            True if the product was stored
+        """
+        with self._lock:
+            if product_id not in self._rows:
+                return False
+            if self.mutation_log is not None:
+                self.mutation_log.append([{'op': 'remove', 'product_id': product_id}])
+            self._apply_remove(product_id)
+            self._products_changed(1)
+        self._maybe_compact()
+        return True
+    
+    def get_product(self, product_id: str) -> Optional[Dict]:
+        """Stored {'id', 'metadata'} entry of a product, or None"""
+        row = self._rows.get(product_id)
+        return self.products[row] if row is not None else None
+    
+    @property
+    def product_count(self) -> int:
+        """Number of stored products (excluding tombstones)"""
+        return len(self._rows)
+    
+    def _apply_add(self, records: List[Dict], log: bool = False):
+        """
+        Add logged-format records to the index and metadata, tombstoning the
+        rows of replaced products
+        
+        Args:
+            records: {'product_id', 'embedding', 'metadata'} dicts
+            log: Write the records to the mutation log before the index changes
+        """
+        if not records:
+            return
+        if log and self.mutation_log is not None:
+            self.mutation_log.append(records)
+        
+        self._index_embeddings(records)
+        
+        # Store metadata
+        for record in records:
+            self._tombstone(record['product_id'])
+            self._rows[record['product_id']] = len(self.products)
+            self.products.append({
+                'id': record['product_id'],
+                'metadata': record['metadata']
+            })
+        self._generation += 1
+    
+    def _index_embeddings(self, records: List[Dict]):
+        """Add the records' embeddings to the FAISS index, after the searches using it"""
+        # Ensure embeddings are the right shape and type
+        embeddings = np.vstack([
+            np.asarray(record['embedding'], dtype='float32').reshape(1, -1) for record in records
+        ])
+        
+        # Ensure embeddings are normalized (L2 norm = 1)
+        faiss.normalize_L2(embeddings)
+        
+        with self._index_lock.write():
+            self.index.add(embeddings)
+    
+    def _apply_remove(self, product_id: str):
+        """Tombstone a product's row"""
+        if self._tombstone(product_id):
+            self._generation += 1
+    
+    def _tombstone(self, product_id: str) -> bool:
+        """Mark the current row of a product as deleted; False if it has none"""
+        row = self._rows.pop(product_id, None)
+        if row is None:
+            return False
+        self.tombstones.add(row)
+        return True
+    
+    def _rebuild_row_map(self):
+        """Map product IDs to rows; older rows of a duplicated ID become tombstones"""
+        self._rows = {}
+        for row, product in enumerate(self.products):
+            if row not in self.tombstones:
+                self._tombstone(product['id'])
+                self._rows[product['id']] = row
+    
+    def _replay_mutation_log(self, snapshot_seq: int):
+        """Re-apply logged mutations that are newer than the loaded snapshot"""
+        if self.mutation_log is None:
+            return
+        records = self.mutation_log.replay(after_seq=snapshot_seq)
+        for record in records:
+            if record['op'] == 'remove':
+                self._apply_remove(record['product_id'])
+            else:
+                self._apply_add([record])
+        if records:
+            self._unsaved_count += len(records)  # Compacted by the next save
+            print(f"[OK] Replayed {len(records)} logged changes from {self.mutation_log.path}")
+    
+    def search(self, query_embedding: np.ndarray, top_k: int = 5,
+               timings: Optional[Dict] = None, filters: Optional[Dict] = None) -> List[SearchResult]:
+        """
+        Search for similar products
+        
+        Args:
+            query_embedding: Query image embedding (should be normalized)
+            top_k: Number of results to return
+            timings: If given, seconds spent searching are stored in it
+                under 'index_search'
+            filters: {'product_ids': [...]} to search only those products
+                (EnhancedVectorStore also filters by material and object_type)
+            
+        Returns:
+            List of SearchResult objects sorted by similarity (highest first)
+        """
+        start = time.perf_counter()
+        results = self.search_batch(query_embedding.reshape(1, -1), top_k, filters=filters)[0]
+        if timings is not None:
+            timings['index_search'] = time.perf_counter() - start
+        return results
+    
+    def search_batch(self, query_embeddings: np.ndarray, top_k: int = 5,
+                     filters: Optional[Dict] = None) -> List[List[SearchResult]]:
+        """
+        Search for several query embeddings in one FAISS call, on CLIP alone
+        
+        Args:
+            query_embeddings: (n, dim) query embeddings
+            top_k: Number of results per query
+            filters: Only return products matching these (see search)
+            
+        Returns:
+            One list of SearchResult objects per query, in query order
+            
+        Raises:
+            ValueError: For filters the store can't apply
+        """
+        # Prepare query embeddings
+        queries = np.array(query_embeddings, dtype='float32').reshape(len(query_embeddings), -1)
+        faiss.normalize_L2(queries)  # Ensure normalization
+        
+        with self._searching(filters) as snapshot:
+            if snapshot is None:
+                return [[] for _ in range(len(queries))]
+            
+            index, products, tombstones = snapshot['index'], snapshot['products'], snapshot['tombstones']
+            if snapshot['rows'] is not None:
+                # Search only the matching products' (live) rows
+                distances, indices = search_subset(index, queries, snapshot['rows'], top_k)
+            else:
+                # Search, with room for tombstoned rows that get skipped
+                k = min(top_k + len(tombstones), index.ntotal)  # Don't ask for more than we have
+                distances, indices = index.search(queries, k)
+        
+        batch_hits = [
+            [
+                (distance, products[idx]) for distance, idx in zip(distances[q], indices[q])
+                if 0 <= idx < snapshot['size'] and idx not in tombstones  # Valid index (-1 = no result)
+            ][:top_k]
+            for q in range(len(queries))
+        ]
+        return [self._to_results(hits) for hits in batch_hits]
+    
+    @contextmanager
+    def _searching(self, filters: Optional[Dict] = None):
+        """
+        Snapshot the store for one search and share the index until the block ends
+        
+        Only the snapshot is taken under the lock, so searches run alongside
+        each other, adds and compactions. Adds append rows past the snapshot
+        and compactions replace the index and row lists instead of changing
+        them, so the snapshot stays consistent; index.add waits for the
+        searches sharing the index.
+        
+        Args:
+            filters: Only search products matching these (see search)
+        
+        Yields:
+            {'index', 'products', 'size', 'tombstones', 'rows'} (rows: live
+            rows matching the filters, or None without filters), or None if
+            the store is empty
+        
+        Raises:
+            ValueError: For filters the store can't apply
+        """
+        filters = {name: value for name, value in (filters or {}).items() if value is not None}
+        with ExitStack() as stack:
+            with self._lock:
+                if self.index is None or self.product_count == 0:
+                    snapshot = None
+                else:
+                    snapshot = self._snapshot(filters)
+                    stack.enter_context(self._index_lock.read())  # Free while _lock is held: adds hold it
+            yield snapshot
+    
+    def _snapshot(self, filters: Dict) -> Dict:
+        """State a search reads (lock held)"""
+        return {
+            'index': self.index,
+            'products': self.products,  # Only appended to: rows past 'size' are ignored
+            'size': len(self.products),
+            'tombstones': frozenset(self.tombstones),
+            'rows': self._filter_rows(filters) if filters else None
+        }
+    
+    def _filter_rows(self, filters: Dict) -> np.ndarray:
+        """
+        Sorted live rows matching filters (lock held)
+        
+        Raises:
+            ValueError: For filters other than product_ids
+        """
+        unsupported = sorted(set(filters) - {'product_ids'})
+        if unsupported:
+            raise ValueError(f"{type(self).__name__} can only filter by product_ids, not {unsupported}")
+        return np.array(sorted(self._rows[pid] for pid in filters['product_ids'] if pid in self._rows), dtype=np.int64)
+    
+    @staticmethod
+    def _to_results(hits: List) -> List[SearchResult]:
+        """Convert (distance, product) hits to SearchResult objects"""
+        results = []
+        for i, (distance, product) in enumerate(hits):
+            metadata = product.get('metadata', {}) or {}
+            filename = metadata.get('filename')
+            image_url = f"/images/{filename}" if filename else None
+            
+            # Convert L2 distance to similarity score (0-1)
+            # For normalized vectors, L2 distance = 2 * (1 - cosine similarity)
+            # So similarity = 1 - (distance / 2)
+            similarity = max(0.0, 1.0 - (distance / 2.0))
+            
+            result = SearchResult(
+                product_id=product['id'],
+                title=metadata.get('title', 'Unknown'),
+                description=metadata.get('description', ''),
+                similarity_score=float(similarity),
+                rank=i + 1,
+                image_filename=filename,
+                image_url=image_url
+            )
+            results.append(result)
+        
+        return results
+    
+    def find_similar(self, product_id: str, top_k: int = 5, timings: Optional[Dict] = None,
+                     filters: Optional[Dict] = None) -> Optional[List[SearchResult]]:
+        """
+        Search with a stored product's CLIP embedding as the query
+        
+        Args:
+            product_id: Stored product to find neighbours of (excluded from results)
+            top_k: Number of results to return
+            timings: If given, seconds spent searching are stored in it
+            filters: Only return products matching these (see search)
+        
+        Returns:
+            List of SearchResult objects, or None if the product is not stored
+        """
+        with self._lock:
+            row = self._rows.get(product_id)
+            if row is None:
+                return None
+            query = reconstruct(self.index, row)
+        results = self.search(query, top_k + 1, timings=timings, filters=filters)
+        
+        results = [result for result in results if result.product_id != product_id][:top_k]
+        for i, result in enumerate(results):
+            result.rank = i + 1
+        return results
@@ -0,0 +1,117 @@
+"""
+Dynamic micro-batching front end for the CLIP encoder
+Collects concurrent encode_image calls into one batched forward pass
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict
+
+import numpy as np
+
+
+class CLIPBatcher:
+    """
+    Drop-in replacement for CLIPEncoder that batches concurrent image encodes
+    
+    Callers (e.g. the API's compute threads) block in encode_image while a
+    single worker thread gathers pending images for up to max_wait_ms or
+    max_batch_size images and encodes them together. Other attributes and
+    methods are forwarded to the wrapped encoder.
+    """
+    
+    def __init__(self, encoder, max_batch_size: int = 16, max_wait_ms: float = 5.0):
+        """
+        Initialize batcher
+        
+        Args:
+            encoder: CLIPEncoder to run the batched forward passes
+            max_batch_size: Most images per forward pass
+            max_wait_ms: How long the first image of a batch waits for others
+        """
+        self.encoder = encoder
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000.0
+        
+        self._queue: queue.Queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._batch_sizes: Dict[int, int] = {}  # Batch size -> number of batches
+        self._worker = threading.Thread(target=self._run, name="clip-batcher", daemon=True)
+        self._worker.start()
+    
+    def __getattr__(self, name):
+        # Only called for attributes the batcher lacks (embedding_dim, encode_text, ...)
+        if name == 'encoder':
+            raise AttributeError(name)
+        return getattr(self.encoder, name)
+    
+    def encode_image(self, image: np.ndarray) -> np.ndarray:
+        """
+        Extract CLIP embedding from image, batched with concurrent calls
+        
+        Args:
+            image: numpy array of shape (H, W, 3) with RGB values 0-255
+        
+        Returns:
+            Normalized embedding vector (shape: (embedding_dim,))
+        """
+        future: Future = Future()
+        self._queue.put((image, future))
+        return future.result()
+    
+    def stats(self) -> Dict:
+        """Queue depth and batch size counters"""
+        with self._stats_lock:
+            batch_sizes = dict(self._batch_sizes)
+        batches = sum(batch_sizes.values())
+        images = sum(size * count for size, count in batch_sizes.items())
+        return {
+            'queue_depth': self._queue.qsize(),
+            'batches': batches,
+            'images': images,
+            'mean_batch_size': images / batches if batches else 0.0,
+            'batch_sizes': batch_sizes
+        }
+    
+    def shutdown(self):
+        """Stop the worker thread once the queued images are encoded"""
+        self._queue.put(None)
+        self._worker.join()
+    
+    def _run(self):
+        """Worker loop: gather a batch, encode it, hand out the embeddings"""
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            
+            self._encode(batch)
+    
+    def _encode(self, batch):
+        """Encode one batch and resolve its callers' futures"""
+        try:
+            embeddings = self.encoder._encode_batch([image for image, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        
+        for (_, future), embedding in zip(batch, embeddings):
+            future.set_result(embedding)
+        with self._stats_lock:
+            self._batch_sizes[len(batch)] = self._batch_sizes.get(len(batch), 0) + 1
@@ -3,6 +3,10 @@ CLIP encoder service for extracting semantic embeddings
 Uses OpenAI CLIP model for image-to-vector conversion
 """
 
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
 import torch
 import clip
 import numpy as np
@@ -52,23 +56,63 @@ class CLIPEncoder:
         Returns:
             Normalized embedding vector (L2 normalized, shape: (embedding_dim,))
         """
-        # Convert numpy array to PIL Image
-        pil_image = Image.fromarray(image.astype('uint8'))
+        return self._encode_batch([image])[0]
+    
+    def encode_images(self, images: List[np.ndarray], batch_size: int = 32,
+                      workers: Optional[int] = None) -> np.ndarray:
+        """
+        Extract CLIP embeddings for many images (for indexing)
         
-        # Preprocess for CLIP (resize to 224x224, normalize, etc.)
-        preprocessed = self.preprocess(pil_image).unsqueeze(0).to(self.device)
+        Images are preprocessed on a thread pool, the next batch while the
+        current one runs through the model.
         
-        # Extract embedding
-        with torch.no_grad():
-            embedding = self.model.encode_image(preprocessed)
+        Args:
+            images: numpy arrays of shape (H, W, 3) with RGB values 0-255
+            batch_size: Images per forward pass
+            workers: Preprocessing threads (default: CPU count, capped at 8)
+            
+        Returns:
+            Normalized embeddings, shape (len(images), embedding_dim)
+        """
+        if len(images) == 0:
+            return np.zeros((0, self.embedding_dim), dtype=np.float32)
+        
+        batches = [images[i:i + batch_size] for i in range(0, len(images), batch_size)]
+        embeddings = []
+        with ThreadPoolExecutor(max_workers=workers or min(8, os.cpu_count() or 1)) as pool:
+            pending = [pool.submit(self._preprocess_image, image) for image in batches[0]]
+            for i in range(len(batches)):
+                tensors = [future.result() for future in pending]
+                if i + 1 < len(batches):
+                    pending = [pool.submit(self._preprocess_image, image) for image in batches[i + 1]]
+                embeddings.append(self._forward_images(torch.stack(tensors)))
+        return np.vstack(embeddings)
+    
+    def _encode_batch(self, images: List[np.ndarray]) -> np.ndarray:
+        """
+        Extract CLIP embeddings for several images in one forward pass
+        
+        Args:
+            images: numpy arrays of shape (H, W, 3) with RGB values 0-255
             
-            # Normalize to unit vector (L2 normalization)
-            embedding = embedding / embedding.norm(dim=-1, keepdim=True)
+        Returns:
+            Normalized embeddings, shape (len(images), embedding_dim)
+        """
+        return self._forward_images(torch.stack([self._preprocess_image(image) for image in images]))
+    
+    def _preprocess_image(self, image: np.ndarray) -> torch.Tensor:
+        """Convert a numpy image to PIL and preprocess it for CLIP (resize to 224x224, normalize, etc.)"""
+        return self.preprocess(Image.fromarray(image.astype('uint8')))
+    
+    def _forward_images(self, preprocessed: torch.Tensor) -> np.ndarray:
+        """Run a preprocessed (n, 3, 224, 224) batch through the model, returning normalized embeddings"""
+        with torch.inference_mode():
+            embeddings = self.model.encode_image(preprocessed.to(self.device))
             
-            # Convert to numpy and squeeze batch dimension
-            embedding_np = embedding.cpu().numpy().flatten()
+            # Normalize to unit vectors (L2 normalization)
+            embeddings = embeddings / embeddings.norm(dim=-1, keepdim=True)
         
-        return embedding_np
+        return embeddings.cpu().numpy()
     
     def encode_text(self, text: str) -> np.ndarray:
         """
@@ -80,16 +124,30 @@ class CLIPEncoder:
         Returns:
             Normalized embedding vector
         """
-        # Tokenize text
-        text_tokens = clip.tokenize([text]).to(self.device)
+        return self.encode_texts([text])[0]
+    
+    def encode_texts(self, texts: List[str], batch_size: int = 256) -> np.ndarray:
+        """
+        Extract CLIP embeddings for many texts
         
-        # Extract embedding
-        with torch.no_grad():
-            embedding = self.model.encode_text(text_tokens)
-            embedding = embedding / embedding.norm(dim=-1, keepdim=True)
-            embedding_np = embedding.cpu().numpy().flatten()
+        Args:
+            texts: Text descriptions
+            batch_size: Texts per forward pass
+            
+        Returns:
+            Normalized embeddings, shape (len(texts), embedding_dim)
+        """
+        if len(texts) == 0:
+            return np.zeros((0, self.embedding_dim), dtype=np.float32)
         
-        return embedding_np
-
-
-
+        embeddings = []
+        for i in range(0, len(texts), batch_size):
+            # Tokenize text
+            text_tokens = clip.tokenize(texts[i:i + batch_size], truncate=True).to(self.device)
+            
+            # Extract embeddings
+            with torch.inference_mode():
+                batch = self.model.encode_text(text_tokens)
+                batch = batch / batch.norm(dim=-1, keepdim=True)
+            embeddings.append(batch.cpu().numpy())
+        return np.vstack(embeddings)
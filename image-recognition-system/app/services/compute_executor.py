@@ -0,0 +1,118 @@
+"""
+Bounded executor for the blocking stages of API requests
+Keeps image decoding, CLIP inference, feature extraction and FAISS search
+off the asyncio event loop and rejects requests once the backlog is full
+"""
+
+import asyncio
+import functools
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+
+class ExecutorBusyError(RuntimeError):
+    """Raised when more requests are in flight than the executor admits"""
+
+
+# Feature extractor of a worker process (created by _init_feature_worker)
+_worker_extractor = None
+
+
+def _init_feature_worker():
+    """Process pool initializer: build one feature extractor per process"""
+    global _worker_extractor
+    from app.services.feature_extractors.master_extractor import MasterFeatureExtractor
+    _worker_extractor = MasterFeatureExtractor()
+
+
+def _extract_features_in_worker(image: np.ndarray) -> Dict:
+    """Run the worker process's feature extractor on an image"""
+    return _worker_extractor.extract_all(image)
+
+
+class ComputeExecutor:
+    """Thread pool (and optional process pool) with an admission limit"""
+    
+    def __init__(self, max_workers: Optional[int] = None, max_backlog: int = 32,
+                 feature_processes: int = 0):
+        """
+        Initialize compute executor
+        
+        Args:
+            max_workers: Threads running blocking stages at once (default:
+                CPU count, capped at 4). torch, OpenCV and FAISS release the
+                GIL, so threads overlap in practice.
+            max_backlog: Requests allowed to wait for a thread beyond the
+                running ones; further requests get ExecutorBusyError
+            feature_processes: Run feature extraction on a pool of this many
+                processes, each with its own extractor (0 = on the threads)
+        """
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self.max_backlog = max(0, max_backlog)
+        self._threads = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="compute")
+        self._processes: Optional[ProcessPoolExecutor] = None
+        if feature_processes > 0:
+            self._processes = ProcessPoolExecutor(
+                max_workers=feature_processes, initializer=_init_feature_worker
+            )
+        self._in_flight = 0  # Admitted requests; only touched on the event loop
+    
+    @property
+    def in_flight(self) -> int:
+        """Number of admitted requests that have not finished"""
+        return self._in_flight
+    
+    @property
+    def capacity(self) -> int:
+        """Maximum number of requests in flight"""
+        return self.max_workers + self.max_backlog
+    
+    def check_admission(self):
+        """
+        Check that a request would be admitted now, without admitting it
+        
+        Raises:
+            ExecutorBusyError: If capacity requests are already in flight
+        """
+        if self._in_flight >= self.capacity:
+            raise ExecutorBusyError(f"Server busy ({self._in_flight} requests in flight)")
+    
+    @asynccontextmanager
+    async def reserve(self):
+        """
+        Admit a request for the duration of the block
+        
+        Raises:
+            ExecutorBusyError: If capacity requests are already in flight
+        """
+        self.check_admission()
+        self._in_flight += 1
+        try:
+            yield
+        finally:
+            self._in_flight -= 1
+    
+    async def run(self, fn: Callable, *args, **kwargs):
+        """Run a blocking call on the thread pool and await its result"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._threads, functools.partial(fn, *args, **kwargs))
+    
+    async def extract_features(self, feature_extractor, image: np.ndarray) -> Dict:
+        """
+        Run feature extraction on the process pool if there is one,
+        otherwise feature_extractor.extract_all on the thread pool
+        """
+        if self._processes is None:
+            return await self.run(feature_extractor.extract_all, image)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._processes, _extract_features_in_worker, image)
+    
+    def shutdown(self):
+        """Stop the worker pools"""
+        self._threads.shutdown(wait=False)
+        if self._processes is not None:
+            self._processes.shutdown(wait=False)
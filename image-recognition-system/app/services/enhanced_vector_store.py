@@ -7,119 +7,282 @@ import faiss
 import numpy as np
 import pickle
 import os
-from typing import List, Dict, Optional
+import time
+from typing import List, Dict, Optional, Tuple
 
 from app.models.search import SearchResult
+from app.services.base_vector_store import BaseVectorStore
+from app.services.index_factory import knn_self_join, reconstruct, search_subset
+from app.services.persistence import atomic_path
 from app.services.similarity_scorer import SimilarityScorer
+from app.services.feature_matrix_store import FeatureMatrixStore
 
 
-class EnhancedVectorStore:
+class EnhancedVectorStore(BaseVectorStore):
     """Enhanced vector store supporting multiple feature types"""
     
+    # Search filters on predicted attributes: filter name -> (feature, key)
+    FILTER_ATTRIBUTES = {
+        'material': ('material', 'predicted_material'),
+        'object_type': ('object_type', 'predicted_type'),
+    }
+    
     def __init__(self, index_path: str = "data/faiss_index.idx", 
                  metadata_path: str = "data/metadata.pkl",
-                 features_path: str = "data/features.pkl"):
+                 features_path: str = "data/features.pkl",
+                 feature_matrix_dir: str = "data/feature_matrices",
+                 mmap_features: bool = False,
+                 index_type: str = "flat",
+                 index_params: Optional[Dict] = None,
+                 flush_every: int = 1,
+                 flush_interval: Optional[float] = None,
+                 wal_path: Optional[str] = None,
+                 compact_threshold: Optional[float] = 0.25):
         """
         Initialize enhanced vector store
         
         Args:
             index_path: Path to FAISS index (for CLIP embeddings)
             metadata_path: Path to product metadata
-            features_path: Path to store all extracted features
+            features_path: Path to store extracted feature attributes
+                (predicted material/type, statistics) per product
+            feature_matrix_dir: Directory for the per-feature float32
+                matrices used for re-ranking (row i = FAISS row i)
+            mmap_features: Memory-map the feature matrices instead of
+                reading them into memory at startup
+            index_type: FAISS index type for CLIP candidates ('flat', 'hnsw',
+                'ivf_flat', 'ivf_pq'); trained types stay flat until there
+                are enough embeddings (see VectorStore)
+            index_params: Build/search parameters (e.g. nprobe, ef_search)
+            flush_every: Save to disk once this many products were added since
+                the last save (1 = after every add). Call flush() to save the rest.
+            flush_interval: Also save on add when this many seconds have passed
+                since the last save (None = no time threshold)
+            wal_path: Append-only mutation log replayed on load so products
+                added since the last save survive a crash (None = off)
+            compact_threshold: Compact the index and feature matrices in a
+                background thread once this fraction of rows belong to removed
+                or replaced products (None = only when compact() is called)
         """
-        self.index_path = index_path
-        self.metadata_path = metadata_path
+        super().__init__(
+            index_path, metadata_path, index_type=index_type, index_params=index_params,
+            flush_every=flush_every, flush_interval=flush_interval, wal_path=wal_path,
+            compact_threshold=compact_threshold
+        )
         self.features_path = features_path
-        
-        # Create data directory
-        os.makedirs(os.path.dirname(index_path), exist_ok=True)
-        
-        self.index: Optional[faiss.Index] = None  # CLIP index
-        self.products: List[Dict] = []  # Product metadata
-        self.features: Dict[str, Dict] = {}  # All extracted features per product
-        self.embedding_dim: Optional[int] = None
+        self.mmap_features = mmap_features
+        self.features: Dict[str, Dict] = {}  # Feature attributes per product (vectors live in feature_matrix)
+        self.feature_matrix = FeatureMatrixStore(feature_matrix_dir)  # Feature vectors by FAISS row
+        self.feature_versions: Dict[str, int] = {}  # Extractor versions of the stored feature vectors
+        self._attribute_rows: Dict[str, Dict[str, set]] = {  # Filter -> value -> live rows
+            name: {} for name in self.FILTER_ATTRIBUTES
+        }
         self.similarity_scorer = SimilarityScorer()
     
-    def load_or_create_index(self, clip_encoder, create_sample_data: bool = True):
-        """Load or create index"""
-        self.embedding_dim = clip_encoder.embedding_dim
-        
-        if os.path.exists(self.index_path) and os.path.exists(self.metadata_path):
-            print(f"[INFO] Loading existing index from {self.index_path}")
-            self._load_index()
-        else:
-            print("[INFO] Creating new FAISS index")
-            self._create_index()
-            if create_sample_data and len(self.products) == 0:
-                print("[INFO] Creating sample products...")
-                self._create_sample_data(clip_encoder)
-    
-    def _create_index(self):
-        """Create new FAISS index"""
-        self.index = faiss.IndexFlatL2(self.embedding_dim)
-    
-    def _load_index(self):
-        """Load index and metadata"""
-        self.index = faiss.read_index(self.index_path)
-        
-        with open(self.metadata_path, 'rb') as f:
-            metadata = pickle.load(f)
-            self.products = metadata.get('products', [])
+    def _load_rows(self, metadata: Dict):
+        """Load feature attributes and matrices, lined up with the loaded products"""
+        self.feature_versions = metadata.get('feature_versions', {})
         
         # Load features if available
         if os.path.exists(self.features_path):
             with open(self.features_path, 'rb') as f:
                 self.features = pickle.load(f)
         
-        print(f"[OK] Loaded {len(self.products)} products from index")
+        # Load feature matrices, or build them from an older features.pkl
+        # that still holds the vectors
+        if self.feature_matrix.exists():
+            self._align_feature_matrix(self.feature_matrix.load(mmap=self.mmap_features))
+        elif any(dict(FeatureMatrixStore.extract_vectors(f)) for f in self.features.values()):
+            self._rebuild_feature_matrix()
+        elif self.features:
+            raise ValueError(f"Feature matrices are missing from {self.feature_matrix.directory}. "
+                             f"Run scripts/reindex_with_features.py to re-extract the features.")
+        else:
+            self._rebuild_feature_matrix()  # Empty rows
+        self.features = {pid: self._strip_vectors(f) for pid, f in self.features.items()}
+        self._rebuild_attribute_index()
         print(f"[OK] Loaded features for {len(self.features)} products")
     
-    def _save_index(self):
-        """Save index, metadata, and features"""
-        faiss.write_index(self.index, self.index_path)
+    def _save_rows(self):
+        """Save feature attributes and matrices"""
+        with atomic_path(self.features_path) as tmp_path:
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(self.features, f)
         
-        metadata = {'products': self.products}
-        with open(self.metadata_path, 'wb') as f:
-            pickle.dump(metadata, f)
+        self.feature_matrix.save([product['id'] for product in self.products])
+    
+    def _metadata(self) -> Dict:
+        """Metadata saved with the index, including the feature extractor versions"""
+        return {**super()._metadata(), 'feature_versions': self.feature_versions}
+    
+    def clear(self):
+        """Remove all products (the next save overwrites the stored index)"""
+        with self._lock:
+            self.products = []
+            self.features = {}
+            self.feature_matrix.clear()
+            self.feature_versions = {}
+            self.tombstones = set()
+            self._rows = {}
+            self._rebuild_attribute_index()
+            self._generation += 1
+            self._create_index()
+    
+    def stale_features(self, feature_versions: Dict[str, int]) -> List[str]:
+        """
+        Feature types whose stored vectors were extracted by another extractor version
         
-        with open(self.features_path, 'wb') as f:
-            pickle.dump(self.features, f)
+        Args:
+            feature_versions: Current versions (MasterFeatureExtractor.feature_versions())
         
-        print(f"[OK] Saved index with {len(self.products)} products")
+        Returns:
+            Names of feature types that need a re-index (empty without stored features);
+            stores saved before versions were recorded count as version 1
+        """
+        if not self.features:
+            return []
+        return sorted(
+            name for name, version in feature_versions.items()
+            if self.feature_versions.get(name, 1) != version
+        )
     
     def add_product(self, product_id: str, clip_embedding: np.ndarray, 
                    all_features: Dict, metadata: Dict):
         """
-        Add product with all features
+        Add product with all features (replacing a stored product with the same ID)
         
         Args:
             product_id: Unique product ID
             clip_embedding: CLIP embedding
-            all_features: All extracted features (geometric, color, etc.)
+            all_features: All extracted features (geometric, color, etc.),
+                or None for a product scored on CLIP alone
             metadata: Product metadata
         """
-        if self.index is None:
-            raise RuntimeError("Index not initialized")
+        self.add_products([{
+            'product_id': product_id,
+            'embedding': clip_embedding,
+            'all_features': all_features,
+            'metadata': metadata
+        }])
+    
+    def upsert_product(self, product_id: str, clip_embedding: np.ndarray,
+                       all_features: Dict, metadata: Dict):
+        """
+        Add a product, or replace the stored product with the same ID
         
-        # Add CLIP embedding to FAISS
-        embedding = clip_embedding.reshape(1, -1).astype('float32')
-        faiss.normalize_L2(embedding)
-        self.index.add(embedding)
+        Same as add_product; the old entry becomes a tombstone until compact().
+        """
+        self.add_product(product_id, clip_embedding, all_features, metadata)
+    
+    def _add_record(self, product: Dict) -> Dict:
+        """Mutation log record of an add_products entry, with its features"""
+        return {**super()._add_record(product), 'all_features': product.get('all_features')}
+    
+    def _apply_add(self, records: List[Dict], log: bool = False):
+        """
+        Add logged-format records to the feature matrix, index and metadata,
+        tombstoning the rows of replaced products
         
-        # Store metadata
-        product_data = {
-            'id': product_id,
-            'metadata': metadata
-        }
-        self.products.append(product_data)
+        Args:
+            records: {'product_id', 'embedding', 'all_features' (may be None),
+                'metadata'} dicts
+            log: Write the records to the mutation log once their features
+                are validated, before the index changes
+        """
+        if not records:
+            return
         
-        # Store all features
-        self.features[product_id] = all_features
+        # Store feature vectors by row (validated before touching the index)
+        first_row = len(self.feature_matrix)
+        try:
+            for record in records:
+                self.feature_matrix.append(record.get('all_features'))
+            if log and self.mutation_log is not None:
+                self.mutation_log.append(records)
+        except (ValueError, OSError):
+            self.feature_matrix.truncate(first_row)
+            raise
         
-        self._save_index()
+        # Add CLIP embeddings to FAISS
+        self._index_embeddings(records)
+        
+        for record in records:
+            # Store metadata
+            self._tombstone(record['product_id'])
+            self._rows[record['product_id']] = len(self.products)
+            self.products.append({
+                'id': record['product_id'],
+                'metadata': record['metadata']
+            })
+            
+            # Store other feature attributes by product ID
+            if record.get('all_features') is not None:
+                self.features[record['product_id']] = self._strip_vectors(record['all_features'])
+                self._index_attributes(self._rows[record['product_id']], self.features[record['product_id']])
+            else:
+                self.features.pop(record['product_id'], None)
+        self._generation += 1
+    
+    def _apply_remove(self, product_id: str):
+        """Tombstone a product's row and drop its feature attributes"""
+        if self._tombstone(product_id):
+            self.features.pop(product_id, None)
+            self._generation += 1
+    
+    def _tombstone(self, product_id: str) -> bool:
+        """Mark the current row of a product as deleted and drop it from the filter lists"""
+        row = self._rows.get(product_id)
+        if not super()._tombstone(product_id):
+            return False
+        for values in self._attribute_rows.values():
+            for rows in values.values():
+                rows.discard(row)
+        return True
+    
+    def _rebuild_attribute_index(self):
+        """Rebuild the filter attribute -> rows lists from the stored feature attributes"""
+        self._attribute_rows = {name: {} for name in self.FILTER_ATTRIBUTES}
+        for product_id, row in self._rows.items():
+            attributes = self.features.get(product_id)
+            if attributes is not None:
+                self._index_attributes(row, attributes)
+    
+    def _index_attributes(self, row: int, attributes: Dict):
+        """Add a row to the lists of its predicted material and object type"""
+        for name, (feature, key) in self.FILTER_ATTRIBUTES.items():
+            value = (attributes.get(feature) or {}).get(key)
+            if value is not None:
+                self._attribute_rows[name].setdefault(str(value).lower(), set()).add(row)
+    
+    def _filter_rows(self, filters: Dict) -> np.ndarray:
+        """Sorted live rows matching all filters (lock held)"""
+        row_sets = []
+        for name in self.FILTER_ATTRIBUTES:
+            if filters.get(name):
+                row_sets.append(self._attribute_rows[name].get(str(filters[name]).lower(), set()))
+        if filters.get('product_ids') is not None:
+            row_sets.append({self._rows[pid] for pid in filters['product_ids'] if pid in self._rows})
+        if not row_sets:
+            return np.array(sorted(self._rows.values()), dtype=np.int64)
+        
+        row_sets.sort(key=len)
+        rows = set(row_sets[0]).intersection(*row_sets[1:])
+        return np.array(sorted(rows), dtype=np.int64)
+    
+    def matching_product_ids(self, filters: Dict) -> set:
+        """
+        IDs of stored products matching filters
+        
+        Args:
+            filters: {'material', 'object_type', 'product_ids'} (any subset;
+                materials and object types are matched case-insensitively)
+        """
+        with self._lock:
+            return {self.products[row]['id'] for row in self._filter_rows(filters)}
     
     def search_with_features(self, query_clip: np.ndarray, query_features: Dict, 
-                            top_k: int = 5) -> List[SearchResult]:
+                            top_k: int = 5, timings: Optional[Dict] = None,
+                            filters: Optional[Dict] = None) -> List[SearchResult]:
         """
         Search using CLIP + all physical features
         
@@ -127,33 +290,187 @@ class EnhancedVectorStore:
             query_clip: CLIP embedding
             query_features: All extracted features from query
             top_k: Number of results
+            timings: If given, seconds spent in 'index_search' and 'rerank'
+                are stored in it
+            filters: Only return products matching these (see
+                matching_product_ids); applied inside the candidate search
             
         Returns:
             List of SearchResult with per-feature scores
         """
-        if self.index is None or len(self.products) == 0:
-            return []
+        return self._search_with_features(query_clip, query_features, top_k, timings=timings, filters=filters)
+    
+    def find_similar_with_features(self, product_id: str, top_k: int = 5, timings: Optional[Dict] = None,
+                                   filters: Optional[Dict] = None) -> Optional[List[SearchResult]]:
+        """
+        Search with a stored product's CLIP vector and feature rows as the query
+        
+        No image processing: the query comes from the index and the feature
+        matrix, then goes through the same re-ranking as search_with_features.
+        A product stored without features (e.g. uploaded through the API)
+        has nothing to compare the candidates' features with, so it is
+        searched like find_similar, with the CLIP vector alone.
         
+        Args:
+            product_id: Stored product to find neighbours of (excluded from results)
+            top_k: Number of results
+            timings: If given, seconds per stage are stored in it (see
+                search_with_features)
+            filters: Only return products matching these (see search_with_features)
+        
+        Returns:
+            List of SearchResult with per-feature scores, or None if the
+            product is not stored
+        """
+        with self._lock:
+            row = self._rows.get(product_id)
+            if row is None:
+                return None
+            query_clip = reconstruct(self.index, row)
+            query_features = self.feature_matrix.get_row(row)
+        if query_features is None:
+            # Re-ranking without query features would score every candidate that has features 0
+            return self.find_similar(product_id, top_k, timings=timings, filters=filters)
+        query_features['clip'] = query_clip
+        return self._search_with_features(
+            query_clip, query_features, top_k, exclude_id=product_id, timings=timings, filters=filters
+        )
+    
+    def similarity_edges(self, k: int = 10, min_similarity: float = 0.0, block_size: int = 1024,
+                         workers: Optional[int] = None) -> List[Tuple[str, str, float]]:
+        """
+        Link every stored product to its k most similar products by CLIP embedding
+        
+        A k-NN self-join over the index: stored vectors are the queries,
+        searched in parallel blocks (see index_factory.knn_self_join).
+        Removed products are neither queries nor neighbours. Holds the lock
+        for the whole join, so run it from offline jobs such as
+        scripts/build_graph.py.
+        
+        Args:
+            k: Neighbours per product
+            min_similarity: Drop pairs less similar than this (0.0 to 1.0)
+            block_size: Queries per FAISS search call
+            workers: Threads searching blocks in parallel (None = CPU count)
+        
+        Returns:
+            List of (product_id1, product_id2, similarity), each pair once
+        """
+        with self._lock:
+            if self.index is None or self.product_count < 2:
+                return []
+            rows = np.array(sorted(self._rows.values()), dtype=np.int64)
+            distances, indices = knn_self_join(self.index, k, rows, block_size, workers)
+            
+            edges = {}
+            for row, row_distances, row_indices in zip(rows.tolist(), distances, indices):
+                for distance, neighbor in zip(row_distances.tolist(), row_indices.tolist()):
+                    if neighbor < 0:
+                        break
+                    # Same conversion as search: squared L2 between unit vectors -> 0..1
+                    similarity = max(0.0, 1.0 - distance / 2.0)
+                    if similarity < min_similarity:
+                        break
+                    pair = (min(row, neighbor), max(row, neighbor))
+                    edges[pair] = max(similarity, edges.get(pair, 0.0))
+            return [
+                (self.products[row1]['id'], self.products[row2]['id'], similarity)
+                for (row1, row2), similarity in sorted(edges.items())
+            ]
+    
+    def search_with_features_batch(self, query_clips: np.ndarray, query_features: List[Dict],
+                                   top_k: int = 5, filters: Optional[Dict] = None) -> List[List[SearchResult]]:
+        """
+        Search for several query images with one FAISS call for all their
+        CLIP candidates, then re-rank each with its features
+        
+        Args:
+            query_clips: (n, dim) CLIP embeddings
+            query_features: All extracted features of each query, in order
+            top_k: Number of results per query
+            filters: Only return products matching these (see search_with_features)
+            
+        Returns:
+            One list of SearchResult per query, in query order
+        """
+        with self._searching(filters) as snapshot:
+            if snapshot is None:
+                return [[] for _ in query_features]
+            distances, indices = self._clip_candidates(snapshot, query_clips, top_k)
+        return [
+            self._rerank(snapshot, features, distances[q], indices[q], top_k)
+            for q, features in enumerate(query_features)
+        ]
+    
+    def _search_with_features(self, query_clip: np.ndarray, query_features: Dict, top_k: int,
+                              exclude_id: Optional[str] = None, timings: Optional[Dict] = None,
+                              filters: Optional[Dict] = None) -> List[SearchResult]:
+        """search_with_features body (the product exclude_id is never returned)"""
         # Step 1: Fast CLIP search to get candidates
-        query = query_clip.reshape(1, -1).astype('float32')
-        faiss.normalize_L2(query)
+        start = time.perf_counter()
+        with self._searching(filters) as snapshot:
+            if snapshot is None:
+                return []
+            distances, indices = self._clip_candidates(snapshot, query_clip.reshape(1, -1), top_k)
+        searched = time.perf_counter()
+        
+        # Step 2: Re-rank using all features, outside the lock
+        results = self._rerank(snapshot, query_features, distances[0], indices[0], top_k, exclude_id)
+        if timings is not None:
+            timings['index_search'] = searched - start
+            timings['rerank'] = time.perf_counter() - searched
+        return results
+    
+    def _snapshot(self, filters: Dict) -> Dict:
+        """State a search reads, with the feature rows for re-ranking (lock held)"""
+        return {
+            **super()._snapshot(filters),
+            'feature_matrix': self.feature_matrix.snapshot(),
+            'features': self.features  # Looked up by product ID only
+        }
+    
+    def _clip_candidates(self, snapshot: Dict, query_clips: np.ndarray, top_k: int):
+        """FAISS search for re-ranking candidates of each query (index shared)"""
+        queries = np.array(query_clips, dtype='float32').reshape(len(query_clips), -1)
+        faiss.normalize_L2(queries)
+        
+        index = snapshot['index']
+        if snapshot['rows'] is not None:
+            # Search only matching rows (all live), so the candidates are
+            # the nearest matching products rather than a filtered top list
+            return search_subset(index, queries, snapshot['rows'], top_k * 3 + 1)
         
-        # Get more candidates than needed for re-ranking
-        candidate_k = min(top_k * 3, len(self.products))
-        distances, indices = self.index.search(query, candidate_k)
+        # Get more candidates than needed for re-ranking, with room for
+        # tombstoned rows that get skipped (and one excluded row)
+        candidate_k = min(top_k * 3 + len(snapshot['tombstones']) + 1, index.ntotal)
+        return index.search(queries, candidate_k)
+    
+    def _rerank(self, snapshot: Dict, query_features: Dict, distances: np.ndarray, indices: np.ndarray,
+                top_k: int, exclude_id: Optional[str] = None) -> List[SearchResult]:
+        """Re-rank one query's CLIP candidates using all features of the snapshot"""
+        products, feature_matrix = snapshot['products'], snapshot['feature_matrix']
+        
+        # Score every candidate that has stored features in one batch
+        candidates = [
+            (distance, int(idx)) for distance, idx in zip(distances, indices)
+            if 0 <= idx < snapshot['size'] and idx not in snapshot['tombstones']
+            and products[idx]['id'] != exclude_id
+        ][:top_k * 3]
+        feature_rows = feature_matrix.rows_with_features([idx for _, idx in candidates])
+        batch_position = {int(row): i for i, row in enumerate(feature_rows)}
+        if len(feature_rows) > 0:
+            batch = self.similarity_scorer.score_batch(
+                query_features, feature_matrix.gather(feature_rows)
+            )
         
-        # Step 2: Re-rank using all features
         scored_results = []
-        for distance, idx in zip(distances[0], indices[0]):
-            if idx >= len(self.products):
-                continue
-            
-            product = self.products[idx]
+        for distance, idx in candidates:
+            product = products[idx]
             product_id = product['id']
             
-            # Get stored features for this product
-            if product_id not in self.features:
-                # Fallback to CLIP-only similarity
+            position = batch_position.get(idx)
+            if position is None:
+                # No stored features: fallback to CLIP-only similarity
                 similarity = max(0.0, 1.0 - (distance / 2.0))
                 scored_results.append({
                     'product': product,
@@ -162,21 +479,17 @@ class EnhancedVectorStore:
                 })
                 continue
             
-            # Convert stored features back to numpy arrays
-            db_features_raw = self.features[product_id]
-            db_features = self._convert_features_to_numpy(db_features_raw)
-            
-            # Compute similarity using all features
-            similarity_result = self.similarity_scorer.compute_similarity(
-                query_features, db_features
-            )
-            
+            per_feature = {
+                name: float(score)
+                for name, score in zip(batch['feature_names'], batch['score_matrix'][position])
+            }
+            attributes = snapshot['features'].get(product_id, {})
             scored_results.append({
                 'product': product,
-                'similarity': similarity_result['final_score'],
-                'per_feature': similarity_result['per_feature_scores'],
-                'material': db_features.get('material', {}).get('predicted_material'),
-                'object_type': db_features.get('object_type', {}).get('predicted_type')
+                'similarity': float(batch['final_scores'][position]),
+                'per_feature': per_feature,
+                'material': attributes.get('material', {}).get('predicted_material'),
+                'object_type': attributes.get('object_type', {}).get('predicted_type')
             })
         
         # Sort by final score
@@ -221,6 +534,7 @@ class EnhancedVectorStore:
             faiss.normalize_L2(embedding)
             self.index.add(embedding)
             
+            self._rows[product["id"]] = len(self.products)
             product_data = {
                 'id': product["id"],
                 'metadata': {
@@ -229,29 +543,71 @@ class EnhancedVectorStore:
                 }
             }
             self.products.append(product_data)
+            self.feature_matrix.append(None)
         
         self._save_index()
         print(f"[OK] Created {len(sample_products)} sample products")
     
-    def _convert_features_to_numpy(self, features: Dict) -> Dict:
-        """Convert stored features (lists) back to numpy arrays"""
-        converted = {}
-        
-        for key, value in features.items():
-            if key == 'clip':
-                converted[key] = np.array(value, dtype=np.float32)
-            elif isinstance(value, dict):
-                if 'feature_vector' in value:
-                    # Convert feature vector
-                    converted[key] = {
-                        **{k: v for k, v in value.items() if k != 'feature_vector'},
-                        'feature_vector': np.array(value['feature_vector'], dtype=np.float32)
-                    }
-                else:
-                    # Recursively convert nested dicts
-                    converted[key] = self._convert_features_to_numpy(value)
-            else:
-                converted[key] = value
+    def _rows_compacted(self, live_rows: np.ndarray):
+        """Keep the feature rows of the compacted products"""
+        self.feature_matrix.keep_rows(live_rows)
+        self._rebuild_attribute_index()
+    
+    def _align_feature_matrix(self, saved_ids: Optional[np.ndarray]):
+        """
+        Line loaded feature rows up with the products
         
-        return converted
-
+        Another writer of the index and metadata (e.g. VectorStore in
+        scripts/load_images.py) may have added, replaced or compacted
+        products. Rows are matched by product ID, the k-th row of an ID to
+        its k-th product entry; products without a saved row get an empty
+        row (scored on CLIP alone).
+        
+        Args:
+            saved_ids: Product ID of each loaded row (None for matrices saved
+                before the IDs were stored)
+        
+        Raises:
+            ValueError: If matrices saved without IDs have more rows than
+                there are products, so rows can't be matched
+        """
+        product_ids = [product['id'] for product in self.products]
+        if saved_ids is None:
+            if len(self.feature_matrix) > len(product_ids):
+                raise ValueError(
+                    f"Feature matrices have {len(self.feature_matrix)} rows for {len(product_ids)} products. "
+                    f"Run scripts/reindex_with_features.py to re-extract the features."
+                )
+            # Products appended without features
+            while len(self.feature_matrix) < len(product_ids):
+                self.feature_matrix.append(None)
+            return
+        
+        saved_ids = saved_ids.tolist()
+        if saved_ids == product_ids:
+            return
+        saved_rows: Dict[str, List[int]] = {}
+        for row in reversed(range(len(saved_ids))):
+            saved_rows.setdefault(saved_ids[row], []).append(row)  # Popped oldest first
+        rows = [saved_rows[pid].pop() if saved_rows.get(pid) else -1 for pid in product_ids]
+        self.feature_matrix.realign(np.array(rows, dtype=np.int64))
+        print(f"[INFO] Realigned feature rows with {len(product_ids)} products "
+              f"({rows.count(-1)} without saved features)")
+    
+    def _rebuild_feature_matrix(self):
+        """Rebuild feature matrices from the vectors in self.features"""
+        print("[INFO] Building feature matrices from stored features...")
+        self.feature_matrix.clear()
+        for product in self.products:
+            self.feature_matrix.append(self.features.get(product['id']))
+        print(f"[OK] Built feature matrices for {self.feature_matrix.feature_count} rows")
+    
+    @staticmethod
+    def _strip_vectors(features: Dict) -> Dict:
+        """Drop feature vectors (kept in feature_matrix) from a features dict"""
+        return {
+            key: {k: v for k, v in value.items() if k != 'feature_vector'}
+            if isinstance(value, dict) else value
+            for key, value in features.items()
+            if key != 'clip'
+        }
@@ -6,41 +6,67 @@ Extracts: HSV histograms, dominant colors, color distribution, brightness, satur
 import cv2
 import numpy as np
 from sklearn.cluster import KMeans
-from typing import Dict, List, Tuple
+from typing import Dict, Tuple
+
+from .image_context import ImageContext
 
 
 class ColorExtractor:
     """Extracts color features from images"""
     
-    def __init__(self, n_dominant_colors: int = 5, histogram_bins: int = 32):
+    # Supported dominant color backends (see _extract_dominant_colors)
+    DOMINANT_COLOR_METHODS = ('histogram_kmeans', 'median_cut', 'kmeans')
+    
+    # Bumped whenever feature vector values change; vectors stored with
+    # another version don't compare with new ones until the store is re-indexed
+    # (2: dominant colors from histogram k-means, sorted by pixel share)
+    FEATURE_VERSION = 2
+    
+    def __init__(self, n_dominant_colors: int = 5, histogram_bins: int = 32,
+                 dominant_color_method: str = 'histogram_kmeans'):
         """
         Initialize color extractor
         
         Args:
             n_dominant_colors: Number of dominant colors to extract
             histogram_bins: Number of bins for HSV histogram
+            dominant_color_method: Dominant color backend:
+                'histogram_kmeans' (median cut refined by a fixed number of
+                k-means iterations over a color histogram), 'median_cut', or
+                'kmeans' (scikit-learn KMeans on sampled pixels, slowest)
         """
+        if dominant_color_method not in self.DOMINANT_COLOR_METHODS:
+            raise ValueError(f"Unknown dominant color method '{dominant_color_method}'. "
+                             f"Use one of {self.DOMINANT_COLOR_METHODS}")
         self.n_dominant_colors = n_dominant_colors
         self.histogram_bins = histogram_bins
+        self.dominant_color_method = dominant_color_method
+        # Bits kept per RGB channel when building the color histogram
+        self.histogram_color_bits = 5
+        # Fixed number of refinement iterations for 'histogram_kmeans'
+        self.refine_iterations = 8
     
-    def extract(self, image: np.ndarray) -> Dict:
+    def extract(self, image: np.ndarray, context: ImageContext = None) -> Dict:
         """
         Extract all color features from image
         
         Args:
             image: RGB image array (H, W, 3)
+            context: Optional shared ImageContext for this image
             
         Returns:
             Dictionary with color features and feature vector
         """
-        # Convert to HSV color space
-        hsv = cv2.cvtColor(image, cv2.COLOR_RGB2HSV)
+        context = context or ImageContext(image)
+        
+        # HSV color space
+        hsv = context.hsv
         
         # HSV Histogram
         h_hist, s_hist, v_hist = self._compute_hsv_histogram(hsv)
         
-        # Dominant colors
-        dominant_colors = self._extract_dominant_colors(image)
+        # Dominant colors (ordered by pixel share, largest first)
+        dominant_colors, dominant_shares = self._extract_dominant_colors(image)
         
         # Color statistics
         brightness = np.mean(hsv[:, :, 2]) / 255.0  # Value channel
@@ -75,6 +101,7 @@ class ColorExtractor:
                 'v': v_hist.tolist()
             },
             'dominant_colors': dominant_colors.tolist(),
+            'dominant_color_shares': dominant_shares.tolist(),
             'brightness': float(brightness),
             'saturation': float(saturation),
             'contrast': float(contrast),
@@ -90,27 +117,151 @@ class ColorExtractor:
         v_hist = cv2.calcHist([hsv], [2], None, [self.histogram_bins], [0, 256])
         return h_hist, s_hist, v_hist
     
-    def _extract_dominant_colors(self, image: np.ndarray) -> np.ndarray:
-        """Extract dominant colors using k-means clustering"""
-        # Reshape image to be a list of pixels
+    def _extract_dominant_colors(self, image: np.ndarray,
+                                 method: str = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Extract dominant colors
+        
+        Args:
+            image: RGB image array (H, W, 3)
+            method: Backend to use (defaults to the extractor's
+                dominant_color_method)
+            
+        Returns:
+            (colors, shares): n_dominant_colors RGB colors (uint8) sorted by
+            the fraction of pixels they represent, and those fractions
+        """
+        method = method or self.dominant_color_method
         pixels = image.reshape(-1, 3)
         
-        # Sample pixels for faster computation (if image is large)
+        if method == 'kmeans':
+            colors, counts = self._dominant_colors_kmeans(pixels)
+        elif method in ('histogram_kmeans', 'median_cut'):
+            hist_colors, hist_counts = self._color_histogram(pixels)
+            colors, counts = self._median_cut(hist_colors, hist_counts)
+            if method == 'histogram_kmeans':
+                colors, counts = self._refine_colors(hist_colors, hist_counts, colors)
+        else:
+            raise ValueError(f"Unknown dominant color method '{method}'. "
+                             f"Use one of {self.DOMINANT_COLOR_METHODS}")
+        
+        # Sort by frequency (largest share first)
+        order = np.argsort(-counts, kind='stable')
+        colors = colors[order]
+        shares = counts[order] / max(counts.sum(), 1)
+        
+        # Always return n_dominant_colors entries (fixed feature vector length)
+        if len(colors) < self.n_dominant_colors:
+            missing = self.n_dominant_colors - len(colors)
+            colors = np.vstack([colors, np.repeat(colors[-1:], missing, axis=0)])
+            shares = np.concatenate([shares, np.zeros(missing)])
+        
+        return np.clip(np.rint(colors), 0, 255).astype(np.uint8), shares.astype(np.float32)
+    
+    def _dominant_colors_kmeans(self, pixels: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Cluster sampled pixels with scikit-learn k-means (baseline backend)"""
+        # Sample pixels for faster computation (if image is large);
+        # a fixed seed keeps results reproducible
         if len(pixels) > 10000:
-            indices = np.random.choice(len(pixels), 10000, replace=False)
+            indices = np.random.default_rng(42).choice(len(pixels), 10000, replace=False)
             pixels = pixels[indices]
         
         # Apply k-means
         try:
             kmeans = KMeans(n_clusters=self.n_dominant_colors, random_state=42, n_init=10)
-            kmeans.fit(pixels)
-            dominant_colors = kmeans.cluster_centers_.astype(np.uint8)
-        except:
+            labels = kmeans.fit_predict(pixels)
+            colors = kmeans.cluster_centers_
+            counts = np.bincount(labels, minlength=len(colors)).astype(np.float64)
+        except Exception:
             # Fallback: use simple color quantization
-            dominant_colors = self._simple_color_quantization(pixels)
+            colors = self._simple_color_quantization(pixels).astype(np.float64)
+            counts = np.ones(len(colors))
+        
+        return colors, counts
+    
+    def _color_histogram(self, pixels: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Build a sparse RGB histogram with histogram_color_bits per channel
+        
+        Returns:
+            (colors, counts) for non-empty bins, where each color is the mean
+            of the pixels that fell into the bin
+        """
+        shift = 8 - self.histogram_color_bits
+        quantized = (pixels >> shift).astype(np.int64)
+        bin_index = (quantized[:, 0] << (2 * self.histogram_color_bits)) \
+            | (quantized[:, 1] << self.histogram_color_bits) | quantized[:, 2]
+        
+        n_bins = 1 << (3 * self.histogram_color_bits)
+        counts = np.bincount(bin_index, minlength=n_bins)
+        occupied = np.nonzero(counts)[0]
+        
+        sums = np.stack([
+            np.bincount(bin_index, weights=pixels[:, c], minlength=n_bins)[occupied]
+            for c in range(3)
+        ], axis=1)
+        counts = counts[occupied].astype(np.float64)
+        return sums / counts[:, None], counts
+    
+    def _median_cut(self, colors: np.ndarray, counts: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Median cut over histogram colors
+        
+        Repeatedly splits the box with the largest (pixel count x channel
+        range) at the weighted median of its widest channel.
+        
+        Returns:
+            (colors, counts): weighted mean color and pixel count per box
+        """
+        boxes = [np.arange(len(colors))]
+        while len(boxes) < self.n_dominant_colors:
+            best, best_score, best_channel = None, 0.0, 0
+            for i, box in enumerate(boxes):
+                if len(box) < 2:
+                    continue
+                ranges = np.ptp(colors[box], axis=0)
+                channel = int(np.argmax(ranges))
+                score = ranges[channel] * counts[box].sum()
+                if score > best_score:
+                    best, best_score, best_channel = i, score, channel
+            if best is None:
+                break  # Every box is a single color
+            
+            box = boxes.pop(best)
+            box = box[np.argsort(colors[box, best_channel], kind='stable')]
+            cumulative = np.cumsum(counts[box])
+            split = int(np.searchsorted(cumulative, cumulative[-1] / 2.0)) + 1
+            split = min(max(split, 1), len(box) - 1)
+            boxes.extend([box[:split], box[split:]])
+        
+        box_counts = np.array([counts[box].sum() for box in boxes])
+        box_colors = np.array([
+            np.average(colors[box], axis=0, weights=counts[box]) for box in boxes
+        ])
+        return box_colors, box_counts
+    
+    def _refine_colors(self, colors: np.ndarray, counts: np.ndarray,
+                       centers: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Refine centers with a fixed number of weighted k-means (Lloyd)
+        iterations over the histogram colors
+        
+        Returns:
+            (centers, counts): refined centers and pixel count per center
+        """
+        centers = centers.astype(np.float64)
+        for _ in range(self.refine_iterations):
+            distances = ((colors[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+            labels = np.argmin(distances, axis=1)
+            weights = np.bincount(labels, weights=counts, minlength=len(centers))
+            for c in range(3):
+                sums = np.bincount(labels, weights=counts * colors[:, c], minlength=len(centers))
+                # Keep empty clusters where they are
+                centers[:, c] = np.where(weights > 0, sums / np.maximum(weights, 1e-12), centers[:, c])
         
-        # Sort by frequency (approximate)
-        return dominant_colors
+        distances = ((colors[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+        labels = np.argmin(distances, axis=1)
+        return centers, np.bincount(labels, weights=counts, minlength=len(centers))
     
     def _simple_color_quantization(self, pixels: np.ndarray) -> np.ndarray:
         """Simple color quantization when k-means fails"""
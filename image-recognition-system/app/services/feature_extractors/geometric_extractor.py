@@ -7,6 +7,8 @@ import cv2
 import numpy as np
 from typing import Dict
 
+from .image_context import ImageContext
+
 
 class GeometricExtractor:
     """Extracts geometric and structural features from images"""
@@ -15,21 +17,24 @@ class GeometricExtractor:
         """Initialize geometric feature extractor"""
         pass
     
-    def extract(self, image: np.ndarray) -> Dict:
+    def extract(self, image: np.ndarray, context: ImageContext = None) -> Dict:
         """
         Extract all geometric features from image
         
         Args:
             image: RGB image array (H, W, 3)
+            context: Optional shared ImageContext for this image
             
         Returns:
             Dictionary with geometric features and feature vector
         """
-        # Convert to grayscale for edge/contour detection
-        gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+        context = context or ImageContext(image)
+        
+        # Grayscale for edge/contour detection
+        gray = context.gray
         
-        # Edge detection
-        edges = self._detect_edges(gray)
+        # Edge detection (Canny on Gaussian-blurred grayscale)
+        edges = context.smoothed_edges
         edge_count = np.sum(edges > 0)
         edge_density = edge_count / (image.shape[0] * image.shape[1])
         
@@ -78,14 +83,6 @@ class GeometricExtractor:
             'feature_vector': feature_vector
         }
     
-    def _detect_edges(self, gray: np.ndarray) -> np.ndarray:
-        """Detect edges using Canny edge detector"""
-        # Apply Gaussian blur to reduce noise
-        blurred = cv2.GaussianBlur(gray, (5, 5), 0)
-        # Canny edge detection with adaptive thresholds
-        edges = cv2.Canny(blurred, 50, 150)
-        return edges
-    
     def _detect_contours(self, edges: np.ndarray) -> list:
         """Detect contours from edges"""
         contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
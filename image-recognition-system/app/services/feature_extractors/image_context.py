@@ -0,0 +1,95 @@
+"""
+Image Context
+Per-image cache of derived planes shared by all feature extractors
+(grayscale, HSV, edges, gradients, Laplacian, FFT magnitude)
+"""
+
+import threading
+
+import cv2
+import numpy as np
+from typing import Tuple
+
+
+class ImageContext:
+    """
+    Lazily computes and memoizes derived planes of a single image
+    
+    Safe to share between extractor threads: each plane is computed once
+    even when several threads ask for it at the same time.
+    """
+    
+    def __init__(self, image: np.ndarray):
+        """
+        Initialize image context
+        
+        Args:
+            image: RGB image array (H, W, 3)
+        """
+        self.image = image
+        self._cache = {}
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+    
+    def _get(self, key: str, compute):
+        """Return cached plane, computing it on first access"""
+        if key in self._cache:
+            return self._cache[key]
+        
+        # One lock per plane so independent planes compute in parallel
+        with self._locks_guard:
+            lock = self._locks.setdefault(key, threading.Lock())
+        with lock:
+            if key not in self._cache:
+                self._cache[key] = compute()
+        return self._cache[key]
+    
+    @property
+    def gray(self) -> np.ndarray:
+        """Grayscale image (H, W), uint8"""
+        return self._get('gray', lambda: cv2.cvtColor(self.image, cv2.COLOR_RGB2GRAY))
+    
+    @property
+    def hsv(self) -> np.ndarray:
+        """HSV image (H, W, 3), OpenCV ranges (H: 0-180, S/V: 0-255)"""
+        return self._get('hsv', lambda: cv2.cvtColor(self.image, cv2.COLOR_RGB2HSV))
+    
+    @property
+    def edges(self) -> np.ndarray:
+        """Canny edges (50/150) of the grayscale image"""
+        return self._get('edges', lambda: cv2.Canny(self.gray, 50, 150))
+    
+    @property
+    def smoothed_edges(self) -> np.ndarray:
+        """Canny edges (50/150) after a 5x5 Gaussian blur to reduce noise"""
+        return self._get('smoothed_edges', lambda: cv2.Canny(
+            cv2.GaussianBlur(self.gray, (5, 5), 0), 50, 150
+        ))
+    
+    @property
+    def gradients(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Sobel gradients (grad_x, grad_y) of the grayscale image, float64"""
+        return self._get('gradients', lambda: (
+            cv2.Sobel(self.gray, cv2.CV_64F, 1, 0, ksize=3),
+            cv2.Sobel(self.gray, cv2.CV_64F, 0, 1, ksize=3)
+        ))
+    
+    @property
+    def gradient_magnitude(self) -> np.ndarray:
+        """Sobel gradient magnitude of the grayscale image"""
+        def compute():
+            grad_x, grad_y = self.gradients
+            return np.sqrt(grad_x**2 + grad_y**2)
+        return self._get('gradient_magnitude', compute)
+    
+    @property
+    def laplacian(self) -> np.ndarray:
+        """Laplacian of the grayscale image, float64"""
+        return self._get('laplacian', lambda: cv2.Laplacian(self.gray, cv2.CV_64F))
+    
+    @property
+    def fft_magnitude(self) -> np.ndarray:
+        """Magnitude of the centred (fftshift-ed) 2D FFT of the grayscale image"""
+        return self._get('fft_magnitude', lambda: np.abs(
+            np.fft.fftshift(np.fft.fft2(self.gray))
+        ))
@@ -3,8 +3,13 @@ Master Feature Extractor
 Combines all feature extractors into a single pipeline
 """
 
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
-from typing import Dict
+from typing import Dict, Optional
 
 from .geometric_extractor import GeometricExtractor
 from .color_extractor import ColorExtractor
@@ -12,19 +17,44 @@ from .texture_extractor import TextureExtractor
 from .pattern_extractor import PatternExtractor
 from .material_classifier import MaterialClassifier
 from .object_type_classifier import ObjectTypeClassifier
+from .image_context import ImageContext
 
 
 class MasterFeatureExtractor:
     """Master feature extractor that combines all feature types"""
     
-    def __init__(self):
-        """Initialize all feature extractors"""
+    def __init__(self, concurrent: bool = False, max_workers: Optional[int] = None):
+        """
+        Initialize all feature extractors
+        
+        Args:
+            concurrent: Run the independent extractors (geometric, color,
+                texture, pattern, material) on a shared thread pool instead
+                of one after another, with object type following geometric
+                on the same thread. OpenCV/NumPy release the GIL for most
+                of their work, so latency drops towards the slowest extractor.
+            max_workers: Thread pool size when concurrent (default: number of
+                independent extractors, capped at the CPU count)
+        """
         self.geometric = GeometricExtractor()
         self.color = ColorExtractor()
         self.texture = TextureExtractor()
         self.pattern = PatternExtractor()
         self.material = MaterialClassifier()
         self.object_type = ObjectTypeClassifier()
+        
+        self.concurrent = concurrent
+        self.max_workers = max_workers or min(5, os.cpu_count() or 1)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+    
+    def feature_versions(self) -> Dict[str, int]:
+        """Feature vector version of each extractor (stored with the index, see EnhancedVectorStore)"""
+        return {
+            name: getattr(extractor, 'FEATURE_VERSION', 1)
+            for name, extractor in (('geometric', self.geometric), ('color', self.color),
+                                    ('texture', self.texture), ('pattern', self.pattern))
+        }
     
     def extract_all(self, image: np.ndarray) -> Dict:
         """
@@ -34,38 +64,107 @@ class MasterFeatureExtractor:
             image: RGB image array (H, W, 3)
             
         Returns:
-            Dictionary with all extracted features
+            Dictionary with all extracted features, plus 'timings' with the
+            seconds spent in each extractor and in total
         """
-        # Extract geometric features first (needed for object type)
-        geometric_features = self.geometric.extract(image)
+        start = time.perf_counter()
         
-        # Extract all other features
-        color_features = self.color.extract(image)
-        texture_features = self.texture.extract(image)
-        pattern_features = self.pattern.extract(image)
-        material_features = self.material.classify(image)
-        object_type_features = self.object_type.classify(image, geometric_features)
+        # Shared derived planes (gray, HSV, edges, gradients, FFT), each
+        # computed at most once for this image
+        context = ImageContext(image)
+        
+        independent = {
+            'geometric': lambda: self.geometric.extract(image, context),
+            'color': lambda: self.color.extract(image, context),
+            'texture': lambda: self.texture.extract(image, context),
+            'pattern': lambda: self.pattern.extract(image, context),
+            'material': lambda: self.material.classify(image, context),
+        }
+        
+        features = {}
+        timings = {}
+        if self.concurrent:
+            # Grayscale is used by nearly every extractor; compute it up front
+            # rather than having the first threads queue on it
+            context.gray
+            
+            executor = self._get_executor()
+            # Object type only needs geometric features: chain it on the
+            # geometric task so it overlaps with the other extractors
+            chained = executor.submit(
+                self._geometric_then_object_type, independent.pop('geometric'), image, context
+            )
+            futures = {
+                name: executor.submit(self._timed, extract)
+                for name, extract in independent.items()
+            }
+            for name, future in futures.items():
+                features[name], timings[name] = future.result()
+            for name, (result, elapsed) in chained.result().items():
+                features[name], timings[name] = result, elapsed
+        else:
+            # Geometric features come first (needed for object type)
+            for name, extract in independent.items():
+                features[name], timings[name] = self._timed(extract)
+            
+            # Object type depends on geometric features
+            features['object_type'], timings['object_type'] = self._timed(
+                lambda: self.object_type.classify(image, features['geometric'], context)
+            )
         
         # Combine all feature vectors
         fused_vector = self._fuse_vectors([
-            geometric_features['feature_vector'],
-            color_features['feature_vector'],
-            texture_features['feature_vector'],
-            pattern_features['feature_vector'],
-            material_features['feature_vector'],
-            object_type_features['feature_vector']
+            features['geometric']['feature_vector'],
+            features['color']['feature_vector'],
+            features['texture']['feature_vector'],
+            features['pattern']['feature_vector'],
+            features['material']['feature_vector'],
+            features['object_type']['feature_vector']
         ])
+        timings['total'] = time.perf_counter() - start
         
         return {
-            'geometric': geometric_features,
-            'color': color_features,
-            'texture': texture_features,
-            'pattern': pattern_features,
-            'material': material_features,
-            'object_type': object_type_features,
-            'fused_vector': fused_vector
+            'geometric': features['geometric'],
+            'color': features['color'],
+            'texture': features['texture'],
+            'pattern': features['pattern'],
+            'material': features['material'],
+            'object_type': features['object_type'],
+            'fused_vector': fused_vector,
+            'timings': timings
         }
     
+    def shutdown(self):
+        """Stop the extractor thread pool (if one was started)"""
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+    
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Return the shared thread pool, creating it on first use"""
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="feature-extractor"
+                )
+            return self._executor
+    
+    def _geometric_then_object_type(self, extract_geometric, image: np.ndarray,
+                                    context: ImageContext) -> Dict:
+        """Run geometric extraction, then object type on its result ({name: (result, seconds)})"""
+        geometric = self._timed(extract_geometric)
+        object_type = self._timed(lambda: self.object_type.classify(image, geometric[0], context))
+        return {'geometric': geometric, 'object_type': object_type}
+    
+    @staticmethod
+    def _timed(func):
+        """Run func and return (result, elapsed seconds)"""
+        start = time.perf_counter()
+        result = func()
+        return result, time.perf_counter() - start
+    
     def _fuse_vectors(self, vectors: list) -> np.ndarray:
         """
         Fuse multiple feature vectors into one
@@ -4,10 +4,11 @@ Classifies material type: wood, clay, fabric, metal, stone, mixed
 Uses rule-based approach for MVP (can be upgraded to CNN later)
 """
 
-import cv2
 import numpy as np
 from typing import Dict, List
 
+from .image_context import ImageContext
+
 
 class MaterialClassifier:
     """Classifies material type from image features"""
@@ -16,22 +17,21 @@ class MaterialClassifier:
         """Initialize material classifier"""
         self.material_classes = ['wood', 'clay', 'fabric', 'metal', 'stone', 'mixed']
     
-    def classify(self, image: np.ndarray) -> Dict:
+    def classify(self, image: np.ndarray, context: ImageContext = None) -> Dict:
         """
         Classify material type
         
         Args:
             image: RGB image array (H, W, 3)
+            context: Optional shared ImageContext for this image
             
         Returns:
             Dictionary with material classification and probabilities
         """
-        # Convert to different color spaces for analysis
-        hsv = cv2.cvtColor(image, cv2.COLOR_RGB2HSV)
-        gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+        context = context or ImageContext(image)
         
         # Extract features for material classification
-        features = self._extract_material_features(image, hsv, gray)
+        features = self._extract_material_features(context)
         
         # Classify using rule-based approach
         probabilities = self._classify_material(features)
@@ -52,8 +52,11 @@ class MaterialClassifier:
             'feature_vector': prob_vector
         }
     
-    def _extract_material_features(self, image: np.ndarray, hsv: np.ndarray, gray: np.ndarray) -> Dict:
+    def _extract_material_features(self, context: ImageContext) -> Dict:
         """Extract features relevant for material classification"""
+        hsv = context.hsv
+        gray = context.gray
+        
         # Color features
         mean_hue = np.mean(hsv[:, :, 0])
         mean_saturation = np.mean(hsv[:, :, 1])
@@ -61,13 +64,13 @@ class MaterialClassifier:
         
         # Texture features
         texture_variance = np.var(gray)
-        edge_density = np.mean(cv2.Canny(gray, 50, 150) > 0)
+        edge_density = np.mean(context.edges > 0)
         
         # Reflectivity (brightness distribution)
         brightness_std = np.std(hsv[:, :, 2])
         
         # Surface properties
-        laplacian_var = np.var(cv2.Laplacian(gray, cv2.CV_64F))
+        laplacian_var = np.var(context.laplacian)
         
         return {
             'mean_hue': mean_hue,
@@ -8,6 +8,8 @@ import cv2
 import numpy as np
 from typing import Dict, List
 
+from .image_context import ImageContext
+
 
 class ObjectTypeClassifier:
     """Classifies object type from image features"""
@@ -16,25 +18,28 @@ class ObjectTypeClassifier:
         """Initialize object type classifier"""
         self.object_types = ['mask', 'pottery', 'jewelry', 'textile', 'sculpture', 'utility']
     
-    def classify(self, image: np.ndarray, geometric_features: Dict = None) -> Dict:
+    def classify(self, image: np.ndarray, geometric_features: Dict = None,
+                 context: ImageContext = None) -> Dict:
         """
         Classify object type
         
         Args:
             image: RGB image array (H, W, 3)
             geometric_features: Optional pre-computed geometric features
+            context: Optional shared ImageContext for this image
             
         Returns:
             Dictionary with object type classification and probabilities
         """
+        context = context or ImageContext(image)
+        
         # Extract features
-        gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
         h, w = image.shape[:2]
         aspect_ratio = w / max(h, 1)
         
         # Get geometric features if not provided
         if geometric_features is None:
-            edges = cv2.Canny(gray, 50, 150)
+            edges = context.edges
             contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
             if contours:
                 largest_contour = max(contours, key=cv2.contourArea)
@@ -48,7 +53,7 @@ class ObjectTypeClassifier:
             aspect_ratio = geometric_features.get('aspect_ratio', aspect_ratio)
         
         # Classify using rule-based approach
-        probabilities = self._classify_object_type(image, gray, aspect_ratio, compactness)
+        probabilities = self._classify_object_type(image, context, aspect_ratio, compactness)
         
         # Get predicted class
         predicted_type = self.object_types[np.argmax(probabilities)]
@@ -66,9 +71,10 @@ class ObjectTypeClassifier:
             'feature_vector': prob_vector
         }
     
-    def _classify_object_type(self, image: np.ndarray, gray: np.ndarray, 
+    def _classify_object_type(self, image: np.ndarray, context: ImageContext, 
                              aspect_ratio: float, compactness: float) -> List[float]:
         """Classify object type using rule-based approach"""
+        gray = context.gray
         scores = {
             'mask': 0.0,
             'pottery': 0.0,
@@ -106,7 +112,7 @@ class ObjectTypeClassifier:
         # Jewelry: Small, intricate, high detail density
         if area < 100000:  # Small objects
             scores['jewelry'] += 0.4
-        if self._has_high_detail_density(gray):
+        if self._has_high_detail_density(context):
             scores['jewelry'] += 0.3
         if aspect_ratio < 2.0:  # Not too elongated
             scores['jewelry'] += 0.2
@@ -120,7 +126,7 @@ class ObjectTypeClassifier:
             scores['textile'] += 0.3
         if area > 50000:
             scores['textile'] += 0.2
-        if self._has_textile_pattern(gray):
+        if self._has_textile_pattern(context):
             scores['textile'] += 0.2
         
         # Sculpture: 3D appearance, moderate to large size
@@ -128,7 +134,7 @@ class ObjectTypeClassifier:
             scores['sculpture'] += 0.3
         if 0.4 < compactness < 0.8:
             scores['sculpture'] += 0.2
-        if self._has_3d_appearance(gray):
+        if self._has_3d_appearance(context):
             scores['sculpture'] += 0.3
         if aspect_ratio < 2.0:
             scores['sculpture'] += 0.2
@@ -168,18 +174,16 @@ class ObjectTypeClassifier:
         ]))
         return center_brightness < edge_brightness * 0.9
     
-    def _has_high_detail_density(self, gray: np.ndarray) -> bool:
+    def _has_high_detail_density(self, context: ImageContext) -> bool:
         """Check for high detail density"""
-        edges = cv2.Canny(gray, 50, 150)
-        edge_density = np.sum(edges > 0) / (gray.shape[0] * gray.shape[1])
+        edges = context.edges
+        edge_density = np.sum(edges > 0) / (edges.shape[0] * edges.shape[1])
         return edge_density > 0.15
     
-    def _has_textile_pattern(self, gray: np.ndarray) -> bool:
+    def _has_textile_pattern(self, context: ImageContext) -> bool:
         """Check for textile-like patterns"""
         # Look for repeating patterns using FFT
-        f_transform = np.fft.fft2(gray)
-        f_shift = np.fft.fftshift(f_transform)
-        magnitude = np.abs(f_shift)
+        magnitude = context.fft_magnitude
         # Textiles often have periodic patterns
         h, w = magnitude.shape
         center_h, center_w = h // 2, w // 2
@@ -188,12 +192,10 @@ class ObjectTypeClassifier:
         pattern_strength = np.mean(magnitude[mask > 0])
         return pattern_strength > np.mean(magnitude) * 1.2
     
-    def _has_3d_appearance(self, gray: np.ndarray) -> bool:
+    def _has_3d_appearance(self, context: ImageContext) -> bool:
         """Check for 3D appearance (shading, depth cues)"""
         # Look for gradual brightness changes (shading)
-        grad_x = cv2.Sobel(gray, cv2.CV_64F, 1, 0, ksize=3)
-        grad_y = cv2.Sobel(gray, cv2.CV_64F, 0, 1, ksize=3)
-        gradient_magnitude = np.sqrt(grad_x**2 + grad_y**2)
+        gradient_magnitude = context.gradient_magnitude
         # 3D objects have more gradual gradients
         gradient_std = np.std(gradient_magnitude)
         return gradient_std > 20
@@ -5,8 +5,11 @@ Extracts: SIFT/ORB keypoints, local descriptors, pattern density, decorative det
 
 import cv2
 import numpy as np
+import threading
 from typing import Dict, Tuple
 
+from .image_context import ImageContext
+
 
 class PatternExtractor:
     """Extracts pattern and detail features from images"""
@@ -19,21 +22,31 @@ class PatternExtractor:
             max_keypoints: Maximum number of keypoints to detect
         """
         self.max_keypoints = max_keypoints
-        # Initialize ORB detector (faster than SIFT, good for real-time)
-        self.orb = cv2.ORB_create(nfeatures=max_keypoints)
+        # ORB detectors (faster than SIFT, good for real-time), one per thread:
+        # extract() runs on the compute executor's threads and a detector isn't thread-safe
+        self._local = threading.local()
+    
+    @property
+    def orb(self):
+        """This thread's ORB detector"""
+        orb = getattr(self._local, 'orb', None)
+        if orb is None:
+            orb = self._local.orb = cv2.ORB_create(nfeatures=self.max_keypoints)
+        return orb
     
-    def extract(self, image: np.ndarray) -> Dict:
+    def extract(self, image: np.ndarray, context: ImageContext = None) -> Dict:
         """
         Extract all pattern features from image
         
         Args:
             image: RGB image array (H, W, 3)
+            context: Optional shared ImageContext for this image
             
         Returns:
             Dictionary with pattern features and feature vector
         """
-        # Convert to grayscale
-        gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+        context = context or ImageContext(image)
+        gray = context.gray
         
         # Detect keypoints and compute descriptors
         keypoints, descriptors = self.orb.detectAndCompute(gray, None)
@@ -3,56 +3,68 @@ Texture Feature Extractor
 Extracts: LBP (Local Binary Patterns), surface roughness, grain direction, texture patterns
 """
 
-import cv2
 import numpy as np
 from typing import Dict
 
+from .image_context import ImageContext
+
 
 class TextureExtractor:
     """Extracts texture features from images"""
     
-    def __init__(self, lbp_radius: int = 3, lbp_points: int = 24):
+    # Supported LBP implementations (see _compute_lbp)
+    LBP_METHODS = ('fast', 'uniform', 'loop')
+    
+    def __init__(self, lbp_radius: int = 3, lbp_points: int = 24, lbp_method: str = 'fast'):
         """
         Initialize texture extractor
         
         Args:
             lbp_radius: Radius for LBP computation
             lbp_points: Number of points for LBP
+            lbp_method: LBP implementation ('fast', 'uniform' or 'loop').
+                'fast' and 'loop' produce identical codes; 'uniform' changes
+                the histogram length, so the index must be rebuilt with the
+                same method before searching.
         """
+        if lbp_method not in self.LBP_METHODS:
+            raise ValueError(f"Unknown LBP method '{lbp_method}'. Use one of {self.LBP_METHODS}")
         self.lbp_radius = lbp_radius
         self.lbp_points = lbp_points
+        self.lbp_method = lbp_method
     
-    def extract(self, image: np.ndarray) -> Dict:
+    def extract(self, image: np.ndarray, context: ImageContext = None) -> Dict:
         """
         Extract all texture features from image
         
         Args:
             image: RGB image array (H, W, 3)
+            context: Optional shared ImageContext for this image
             
         Returns:
             Dictionary with texture features and feature vector
         """
-        # Convert to grayscale
-        gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+        context = context or ImageContext(image)
+        gray = context.gray
         
         # Local Binary Patterns (LBP)
-        lbp = self._compute_lbp(gray)
-        lbp_histogram = self._compute_lbp_histogram(lbp)
+        lbp = self._compute_lbp(gray, self.lbp_method)
+        lbp_histogram = self._compute_lbp_histogram(lbp, self.lbp_method)
         
         # Surface roughness (variance of gradients)
-        roughness = self._calculate_roughness(gray)
+        roughness = self._calculate_roughness(context)
         
         # Grain direction (orientation analysis)
-        grain_direction = self._analyze_grain_direction(gray)
+        grain_direction = self._analyze_grain_direction(context)
         
         # Texture uniformity
         texture_uniformity = self._calculate_texture_uniformity(lbp)
         
         # Repeating patterns (autocorrelation)
-        pattern_strength = self._detect_repeating_patterns(gray)
+        pattern_strength = self._detect_repeating_patterns(context)
         
         # Surface irregularities
-        irregularities = self._detect_irregularities(gray)
+        irregularities = self._detect_irregularities(context)
         
         # Create feature vector
         feature_vector = np.concatenate([
@@ -81,8 +93,31 @@ class TextureExtractor:
             'feature_vector': feature_vector
         }
     
-    def _compute_lbp(self, gray: np.ndarray) -> np.ndarray:
-        """Compute Local Binary Pattern"""
+    def _compute_lbp(self, gray: np.ndarray, method: str = None) -> np.ndarray:
+        """
+        Compute Local Binary Pattern
+        
+        Args:
+            gray: Grayscale image (H, W)
+            method: 'fast' (vectorized, identical to 'loop'), 'uniform'
+                (bilinear sampling, rotation-invariant uniform codes) or
+                'loop' (original per-pixel reference implementation).
+                Defaults to the extractor's lbp_method.
+            
+        Returns:
+            LBP code image with the same shape as gray
+        """
+        method = method or self.lbp_method
+        if method == 'fast':
+            return self._compute_lbp_fast(gray)
+        if method == 'uniform':
+            return self._compute_lbp_uniform(gray)
+        if method == 'loop':
+            return self._compute_lbp_loop(gray)
+        raise ValueError(f"Unknown LBP method '{method}'. Use one of {self.LBP_METHODS}")
+    
+    def _compute_lbp_loop(self, gray: np.ndarray) -> np.ndarray:
+        """Compute Local Binary Pattern pixel by pixel (reference implementation)"""
         # Simplified LBP implementation
         # For production, consider using scikit-image's local_binary_pattern
         h, w = gray.shape
@@ -103,28 +138,113 @@ class TextureExtractor:
         
         return lbp
     
-    def _compute_lbp_histogram(self, lbp: np.ndarray) -> np.ndarray:
-        """Compute histogram of LBP values"""
+    def _compute_lbp_fast(self, gray: np.ndarray) -> np.ndarray:
+        """
+        Compute Local Binary Pattern with whole-array neighbour comparisons
+        
+        Reproduces _compute_lbp_loop exactly: neighbours are sampled at the
+        same truncated coordinates, the border is left at zero and codes are
+        stored in gray's dtype (so bits beyond its width wrap away, as they
+        do in the loop). Those discarded bits are never computed.
+        """
+        h, w = gray.shape
+        r = self.lbp_radius
+        lbp = np.zeros_like(gray)
+        if h <= 2 * r or w <= 2 * r:
+            return lbp
+        
+        rows = np.arange(r, h - r)
+        cols = np.arange(r, w - r)
+        center = gray[r:h - r, r:w - r]
+        codes = np.zeros(center.shape, dtype=np.uint64)
+        
+        # Bits that survive the store into gray's dtype
+        n_bits = self.lbp_points
+        if np.issubdtype(gray.dtype, np.integer):
+            n_bits = min(n_bits, np.iinfo(gray.dtype).bits)
+        
+        for k in range(n_bits):
+            angle = 2 * np.pi * k / self.lbp_points
+            # Same float arithmetic and truncation as the per-pixel loop
+            x = (rows + r * np.cos(angle)).astype(np.int64)
+            y = (cols + r * np.sin(angle)).astype(np.int64)
+            neighbours = gray[x[:, None], y[None, :]]
+            codes |= (neighbours >= center).astype(np.uint64) << np.uint64(k)
+        
+        lbp[r:h - r, r:w - r] = codes.astype(gray.dtype)
+        return lbp
+    
+    def _compute_lbp_uniform(self, gray: np.ndarray) -> np.ndarray:
+        """
+        Compute rotation-invariant uniform LBP (riu2) codes
+        
+        Neighbours on the circle are bilinearly interpolated from shifted
+        views of an edge-padded image. Uniform patterns (at most two 0/1
+        transitions around the circle) map to their number of set bits,
+        everything else maps to lbp_points + 1, giving lbp_points + 2 codes.
+        """
+        h, w = gray.shape
+        r = self.lbp_radius
+        p = self.lbp_points
+        image = gray.astype(np.float32)
+        padded = np.pad(image, r + 1, mode='edge')
+        
+        bits = np.empty((p, h, w), dtype=bool)
+        for k in range(p):
+            angle = 2 * np.pi * k / p
+            # Round away float noise so axis-aligned points sample exact pixels
+            dy = round(r * np.cos(angle), 6)
+            dx = round(r * np.sin(angle), 6)
+            y0, x0 = int(np.floor(dy)), int(np.floor(dx))
+            fy, fx = dy - y0, dx - x0
+            
+            top = r + 1 + y0
+            left = r + 1 + x0
+            p00 = padded[top:top + h, left:left + w]
+            p01 = padded[top:top + h, left + 1:left + 1 + w]
+            p10 = padded[top + 1:top + 1 + h, left:left + w]
+            p11 = padded[top + 1:top + 1 + h, left + 1:left + 1 + w]
+            neighbours = ((1 - fy) * (1 - fx) * p00 + (1 - fy) * fx * p01 +
+                          fy * (1 - fx) * p10 + fy * fx * p11)
+            bits[k] = neighbours >= image - 1e-4
+        
+        transitions = np.count_nonzero(bits != np.roll(bits, 1, axis=0), axis=0)
+        ones = np.count_nonzero(bits, axis=0)
+        lbp = np.where(transitions <= 2, ones, p + 1)
+        return lbp.astype(np.uint8 if p + 1 < 256 else np.uint16)
+    
+    def _compute_lbp_histogram(self, lbp: np.ndarray, method: str = None) -> np.ndarray:
+        """
+        Compute histogram of LBP values
+        
+        Args:
+            lbp: LBP codes from _compute_lbp
+            method: LBP method the codes were computed with (decides the
+                bins). Defaults to the extractor's lbp_method.
+        """
+        method = method or self.lbp_method
+        if method == 'uniform':
+            # One bin per rotation-invariant uniform code
+            n_bins = self.lbp_points + 2
+            hist = np.bincount(lbp.ravel(), minlength=n_bins)[:n_bins]
+            return hist.astype(np.float32)
+        
         # Use 256 bins for 8-bit LBP
         hist, _ = np.histogram(lbp.flatten(), bins=256, range=(0, 256))
         return hist.astype(np.float32)
     
-    def _calculate_roughness(self, gray: np.ndarray) -> float:
+    def _calculate_roughness(self, context: ImageContext) -> float:
         """Calculate surface roughness (variance of gradients)"""
-        # Compute gradients
-        grad_x = cv2.Sobel(gray, cv2.CV_64F, 1, 0, ksize=3)
-        grad_y = cv2.Sobel(gray, cv2.CV_64F, 0, 1, ksize=3)
-        gradient_magnitude = np.sqrt(grad_x**2 + grad_y**2)
+        gradient_magnitude = context.gradient_magnitude
         
         # Roughness = variance of gradient magnitudes
         roughness = np.var(gradient_magnitude) / (255.0 ** 2)
         return min(roughness, 1.0)
     
-    def _analyze_grain_direction(self, gray: np.ndarray) -> float:
+    def _analyze_grain_direction(self, context: ImageContext) -> float:
         """Analyze grain direction/orientation"""
         # Use gradient orientation
-        grad_x = cv2.Sobel(gray, cv2.CV_64F, 1, 0, ksize=3)
-        grad_y = cv2.Sobel(gray, cv2.CV_64F, 0, 1, ksize=3)
+        grad_x, grad_y = context.gradients
         
         # Calculate orientation
         orientation = np.arctan2(grad_y, grad_x)
@@ -143,12 +263,10 @@ class TextureExtractor:
         uniformity = 1.0 - min(lbp_variance / (256.0 ** 2), 1.0)
         return uniformity
     
-    def _detect_repeating_patterns(self, gray: np.ndarray) -> float:
+    def _detect_repeating_patterns(self, context: ImageContext) -> float:
         """Detect repeating patterns using autocorrelation"""
         # Simplified: use FFT to detect periodic patterns
-        f_transform = np.fft.fft2(gray)
-        f_shift = np.fft.fftshift(f_transform)
-        magnitude_spectrum = np.abs(f_shift)
+        magnitude_spectrum = context.fft_magnitude
         
         # Look for strong periodic components
         # (excluding DC component at center)
@@ -162,10 +280,10 @@ class TextureExtractor:
         pattern_strength = np.mean(magnitude_spectrum[mask > 0]) / np.max(magnitude_spectrum)
         return min(pattern_strength, 1.0)
     
-    def _detect_irregularities(self, gray: np.ndarray) -> float:
+    def _detect_irregularities(self, context: ImageContext) -> float:
         """Detect surface irregularities"""
         # Use Laplacian to detect irregularities
-        laplacian = cv2.Laplacian(gray, cv2.CV_64F)
+        laplacian = context.laplacian
         irregularities = np.mean(np.abs(laplacian)) / 255.0
         return min(irregularities, 1.0)
 
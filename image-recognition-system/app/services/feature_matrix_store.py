@@ -0,0 +1,278 @@
+"""
+Columnar feature storage for the enhanced vector store
+Keeps one contiguous float32 matrix per feature type, aligned to FAISS row ids
+"""
+
+import os
+import numpy as np
+from typing import Dict, Iterator, Optional, Sequence, Tuple
+
+from app.services.persistence import atomic_path
+
+
+class FeatureMatrixStore:
+    """Per-feature float32 matrices whose row i belongs to FAISS row i"""
+    
+    # Feature types used for re-ranking, in storage order
+    FEATURE_TYPES = ('geometric', 'color', 'texture', 'pattern', 'material', 'object_type', 'clip')
+    
+    def __init__(self, directory: str = "data/feature_matrices"):
+        """
+        Initialize feature matrix store
+        
+        Args:
+            directory: Directory holding one <feature>.npy file per feature
+                type plus rows.npy (which rows have features) and ids.npy
+                (the product ID of each row)
+        """
+        self.directory = directory
+        self.size = 0
+        self._matrices: Dict[str, np.ndarray] = {}  # May have spare capacity
+        self._has_features = np.zeros(0, dtype=bool)
+    
+    def __len__(self) -> int:
+        return self.size
+    
+    @property
+    def dims(self) -> Dict[str, int]:
+        """Vector length per feature type"""
+        return {name: matrix.shape[1] for name, matrix in self._matrices.items()}
+    
+    @property
+    def feature_count(self) -> int:
+        """Number of rows that have features"""
+        return int(np.count_nonzero(self._has_features[:self.size]))
+    
+    def matrix(self, feature_type: str) -> np.ndarray:
+        """Matrix (rows, dim) for one feature type"""
+        return self._matrices[feature_type][:self.size]
+    
+    def rows_with_features(self, rows: np.ndarray) -> np.ndarray:
+        """Subset of rows (in the given order) that have stored features"""
+        rows = np.asarray(rows, dtype=np.int64)
+        valid = (rows >= 0) & (rows < self.size)
+        rows = rows[valid]
+        return rows[self._has_features[rows]]
+    
+    def gather(self, rows: np.ndarray) -> Dict[str, np.ndarray]:
+        """Matrices restricted to the given rows: {feature_type: (len(rows), dim)}"""
+        rows = np.asarray(rows, dtype=np.int64)
+        return {name: matrix[rows] for name, matrix in self._matrices.items()}
+    
+    def has_features(self, row: int) -> bool:
+        """Whether the given row has stored features"""
+        return 0 <= row < self.size and bool(self._has_features[row])
+    
+    def get_row(self, row: int) -> Optional[Dict]:
+        """
+        Features of one row in the layout SimilarityScorer expects
+        
+        Returns views into the matrices (no copies), or None if the row
+        has no stored features.
+        """
+        if not self.has_features(row):
+            return None
+        features = {}
+        for name, matrix in self._matrices.items():
+            if name == 'clip':
+                features[name] = matrix[row]
+            else:
+                features[name] = {'feature_vector': matrix[row]}
+        return features
+    
+    def snapshot(self) -> 'FeatureMatrixStore':
+        """
+        Store sharing the current rows, for reading while this one changes
+        
+        Appends only write past the snapshot's size, and growing, realigning
+        or clearing replaces the matrices, so the snapshot's rows keep their
+        values without being copied.
+        """
+        snapshot = FeatureMatrixStore(self.directory)
+        snapshot.size = self.size
+        snapshot._matrices = dict(self._matrices)
+        snapshot._has_features = self._has_features
+        return snapshot
+    
+    def append(self, features: Optional[Dict]) -> int:
+        """
+        Append a row
+        
+        Args:
+            features: Extracted features ({'geometric': {'feature_vector': ...},
+                ..., 'clip': [...]}), or None for a product without features
+        
+        Returns:
+            Row index of the new row
+        """
+        row = self.size
+        self._ensure_capacity(row + 1)
+        self.size += 1
+        try:
+            self.set_row(row, features)
+        except ValueError:
+            self.size -= 1
+            raise
+        return row
+    
+    def set_row(self, row: int, features: Optional[Dict]):
+        """Overwrite the features stored in an existing row"""
+        if not 0 <= row < self.size:
+            raise IndexError(f"Row {row} out of range (size {self.size})")
+        
+        if features is None:
+            self._has_features[row] = False
+            for name in self._matrices:
+                self._writable(name)[row] = 0.0
+            return
+        
+        vectors = dict(self.extract_vectors(features))
+        if self._matrices:
+            missing = set(self._matrices) - set(vectors)
+            extra = set(vectors) - set(self._matrices)
+            if (missing or extra) and self.feature_count > 0:
+                raise ValueError(f"Feature types differ from stored rows "
+                                 f"(missing: {sorted(missing)}, extra: {sorted(extra)})")
+        for name, vector in vectors.items():
+            dim = self._matrices[name].shape[1] if name in self._matrices else len(vector)
+            if dim != len(vector):
+                raise ValueError(
+                    f"Feature '{name}' has length {len(vector)}, expected {dim}. "
+                    f"Re-index all products after changing extractor settings."
+                )
+        
+        for name, vector in vectors.items():
+            if name not in self._matrices:
+                self._matrices[name] = np.zeros((len(self._has_features), len(vector)), dtype=np.float32)
+            self._writable(name)[row] = vector
+        self._has_features[row] = True
+    
+    def truncate(self, size: int):
+        """Drop rows from `size` onwards"""
+        if not 0 <= size <= self.size:
+            raise IndexError(f"Cannot truncate to {size} rows (size {self.size})")
+        self.size = size
+    
+    def keep_rows(self, rows: np.ndarray):
+        """Keep only the given rows, in the given order (row i becomes rows[i])"""
+        rows = np.asarray(rows, dtype=np.int64)
+        if len(rows) > 0 and not ((rows >= 0) & (rows < self.size)).all():
+            raise IndexError(f"Rows out of range (size {self.size})")
+        self._has_features = self._has_features[rows]
+        self._matrices = {name: matrix[rows] for name, matrix in self._matrices.items()}
+        self.size = len(rows)
+    
+    def realign(self, rows: np.ndarray):
+        """Rearrange rows: row i becomes rows[i], or a row without features where rows[i] is -1"""
+        rows = np.asarray(rows, dtype=np.int64)
+        if len(rows) > 0 and not (rows < self.size).all():
+            raise IndexError(f"Rows out of range (size {self.size})")
+        present = rows >= 0
+        has_features = np.zeros(len(rows), dtype=bool)
+        has_features[present] = self._has_features[rows[present]]
+        matrices = {}
+        for name, matrix in self._matrices.items():
+            matrices[name] = np.zeros((len(rows), matrix.shape[1]), dtype=np.float32)
+            matrices[name][present] = matrix[rows[present]]
+        self._has_features = has_features
+        self._matrices = matrices
+        self.size = len(rows)
+    
+    def clear(self):
+        """Remove all rows"""
+        self.size = 0
+        self._matrices = {}
+        self._has_features = np.zeros(0, dtype=bool)
+    
+    def save(self, row_ids: Optional[Sequence[str]] = None):
+        """
+        Save matrices to the store directory (each file is replaced atomically)
+        
+        Args:
+            row_ids: Product ID of each row, returned by load() so a reader can
+                realign the rows if another writer reordered the products
+        """
+        if row_ids is not None and len(row_ids) != self.size:
+            raise ValueError(f"Got {len(row_ids)} row IDs for {self.size} rows")
+        os.makedirs(self.directory, exist_ok=True)
+        arrays = {name: self.matrix(name) for name in self._matrices}
+        if row_ids is not None:
+            arrays['ids'] = np.array(row_ids, dtype=str)
+        elif os.path.exists(os.path.join(self.directory, "ids.npy")):
+            os.remove(os.path.join(self.directory, "ids.npy"))  # Would describe older rows
+        # rows.npy last: its length marks how many rows the matrices hold
+        arrays['rows'] = self._has_features[:self.size]
+        for name, array in arrays.items():
+            with atomic_path(os.path.join(self.directory, f"{name}.npy")) as tmp_path:
+                with open(tmp_path, 'wb') as f:
+                    np.save(f, np.ascontiguousarray(array))
+    
+    def exists(self) -> bool:
+        """Whether a saved store is present on disk"""
+        return os.path.exists(os.path.join(self.directory, "rows.npy"))
+    
+    def load(self, mmap: bool = False) -> Optional[np.ndarray]:
+        """
+        Load matrices from the store directory
+        
+        Args:
+            mmap: Memory-map the matrices read-only instead of reading them
+                into memory. They are copied into memory on the first write.
+        
+        Returns:
+            Product ID of each row as passed to save(), or None if the store
+            was saved without them
+        """
+        mmap_mode = 'r' if mmap else None
+        self._has_features = np.array(np.load(os.path.join(self.directory, "rows.npy")), dtype=bool)
+        self.size = len(self._has_features)
+        self._matrices = {}
+        for name in self.FEATURE_TYPES:
+            path = os.path.join(self.directory, f"{name}.npy")
+            if os.path.exists(path):
+                self._matrices[name] = np.load(path, mmap_mode=mmap_mode)
+        
+        ids_path = os.path.join(self.directory, "ids.npy")
+        if not os.path.exists(ids_path):
+            return None
+        row_ids = np.load(ids_path)
+        # An ids.npy left behind by an interrupted save is ignored
+        return row_ids if len(row_ids) == self.size else None
+    
+    @classmethod
+    def extract_vectors(cls, features: Dict) -> Iterator[Tuple[str, np.ndarray]]:
+        """Yield (feature_type, float32 vector) pairs from an extracted features dict"""
+        for name in cls.FEATURE_TYPES:
+            value = features.get(name)
+            if value is None:
+                continue
+            if isinstance(value, dict):
+                value = value.get('feature_vector')
+                if value is None:
+                    continue
+            yield name, np.asarray(value, dtype=np.float32).ravel()
+    
+    def _ensure_capacity(self, rows: int):
+        """Grow buffers (doubling) so at least `rows` rows fit"""
+        capacity = len(self._has_features)
+        if rows <= capacity:
+            return
+        new_capacity = max(rows, 2 * capacity, 16)
+        
+        has_features = np.zeros(new_capacity, dtype=bool)
+        has_features[:self.size] = self._has_features[:self.size]
+        self._has_features = has_features
+        
+        for name, matrix in self._matrices.items():
+            grown = np.zeros((new_capacity, matrix.shape[1]), dtype=np.float32)
+            grown[:self.size] = matrix[:self.size]
+            self._matrices[name] = grown
+    
+    def _writable(self, name: str) -> np.ndarray:
+        """Return the matrix for writing, copying memory-mapped data into memory"""
+        matrix = self._matrices[name]
+        if not matrix.flags.writeable:
+            copy = np.zeros((len(self._has_features), matrix.shape[1]), dtype=np.float32)
+            copy[:len(matrix)] = matrix
+            self._matrices[name] = matrix = copy
+        return matrix
@@ -5,15 +5,31 @@ Can be upgraded to Neo4j later for production
 """
 
 import networkx as nx
+import numpy as np
+import heapq
 import json
 import os
-from typing import List, Dict, Optional, Tuple
-from pathlib import Path
+from collections import defaultdict
+from contextlib import contextmanager
+from itertools import combinations
+from typing import Iterable, Iterator, List, Dict, Optional, Tuple
+
+from app.services.persistence import atomic_path
 
 
 class GraphService:
     """Manages product relationships and outlet connections"""
     
+    # (relationship, feature, predicted attribute, weight) linking products that share the attribute
+    RELATIONSHIP_RULES = (
+        ('SAME_MATERIAL', 'material', 'predicted_material', 0.8),
+        ('SAME_TYPE', 'object_type', 'predicted_type', 0.7),
+    )
+    # Similarity matrix entries computed at once when pruning a bucket
+    SIMILARITY_BLOCK = 4_000_000
+    # Products linked per product and shared attribute (as scripts/build_graph.py)
+    DEFAULT_MAX_NEIGHBORS = 10
+    
     def __init__(self, graph_path: str = "data/product_graph.json"):
         """
         Initialize graph service
@@ -25,6 +41,8 @@ class GraphService:
         self.graph = nx.Graph()  # Undirected graph for product relationships
         self.outlets: Dict[str, Dict] = {}  # Outlet data: {outlet_id: {name, location, products}}
         self.product_outlets: Dict[str, List[str]] = {}  # product_id -> [outlet_ids]
+        self._bulk_depth = 0  # Open bulk() sessions; saves are deferred while > 0
+        self._dirty = False   # Changes not yet written by a deferred save
         
         # Load existing graph if available
         self._load_graph()
@@ -38,6 +56,7 @@ class GraphService:
                     
                     # Reconstruct graph
                     self.graph = nx.node_link_graph(data.get('graph', {}))
+                    self._restore_edge_weights()
                     self.outlets = data.get('outlets', {})
                     self.product_outlets = data.get('product_outlets', {})
                     
@@ -47,17 +66,73 @@ class GraphService:
                 self.graph = nx.Graph()
     
     def _save_graph(self):
-        """Save graph to disk"""
-        os.makedirs(os.path.dirname(self.graph_path), exist_ok=True)
-        
+        """Save graph to disk, or mark it dirty inside a bulk() session"""
+        if self._bulk_depth > 0:
+            self._dirty = True
+            return
+        self._write_graph()
+    
+    def _restore_edge_weights(self):
+        """Recompute combined edge weights after loading (older files: one relationship per edge)"""
+        for _, _, edge_data in self.graph.edges(data=True):
+            if 'relationships' not in edge_data:
+                edge_data['relationships'] = {
+                    edge_data.pop('relationship', 'SIMILAR_TO'): edge_data.get('weight', 1.0)
+                }
+            edge_data['weight'] = self._combined_weight(edge_data['relationships'])
+    
+    def _write_graph(self):
+        """Write the whole graph to disk atomically"""
+        graph_data = nx.node_link_data(self.graph)
+        for link in graph_data.get('edges', graph_data.get('links', [])):
+            link.pop('weight', None)  # Derived from 'relationships' on load
         data = {
-            'graph': nx.node_link_data(self.graph),
+            'graph': graph_data,
             'outlets': self.outlets,
             'product_outlets': self.product_outlets
         }
         
-        with open(self.graph_path, 'w') as f:
-            json.dump(data, f, indent=2)
+        with atomic_path(self.graph_path) as tmp_path:
+            with open(tmp_path, 'w') as f:
+                json.dump(data, f, separators=(',', ':'))
+        self._dirty = False
+    
+    @contextmanager
+    def bulk(self):
+        """
+        Group many changes into a single save
+        
+        Saves requested inside the session are deferred and the graph is
+        written once, atomically, when the outermost session exits. If the
+        session raises, nothing is written and the last saved graph is
+        reloaded, so a failed build leaves neither the file nor the
+        in-memory graph half updated.
+        
+        Usage:
+            with graph_service.bulk():
+                for product in products:
+                    graph_service.add_product(product['id'], metadata)
+        """
+        self._bulk_depth += 1
+        committed = False
+        try:
+            yield self
+            committed = True
+        finally:
+            self._bulk_depth -= 1
+            if self._bulk_depth == 0:
+                if committed and self._dirty:
+                    self._write_graph()
+                elif not committed:
+                    self._rollback()
+    
+    def _rollback(self):
+        """Discard unsaved changes by reloading the last saved graph"""
+        self.graph = nx.Graph()
+        self.outlets = {}
+        self.product_outlets = {}
+        self._dirty = False
+        self._load_graph()
     
     def add_product(self, product_id: str, metadata: Dict):
         """
@@ -76,6 +151,10 @@ class GraphService:
         """
         Add relationship between two products
         
+        An edge holds every relationship type between its two products
+        ({type: weight} in 'relationships'); adding a type again replaces
+        its weight. The edge 'weight' combines them (see _combined_weight).
+        
         Args:
             product_id1: First product ID
             product_id2: Second product ID
@@ -83,88 +162,189 @@ class GraphService:
             weight: Relationship strength (0.0 to 1.0)
         """
         if self.graph.has_node(product_id1) and self.graph.has_node(product_id2):
-            self.graph.add_edge(product_id1, product_id2, 
-                              relationship=relationship_type, weight=weight)
+            edge_data = self.graph.get_edge_data(product_id1, product_id2)
+            if edge_data is None:
+                relationships = {relationship_type: weight}
+            else:
+                relationships = edge_data['relationships']
+                relationships[relationship_type] = weight
+            combined = self._combined_weight(relationships)
+            self.graph.add_edge(product_id1, product_id2, relationships=relationships, weight=combined)
             self._save_graph()
     
-    def build_relationships_from_features(self, products: List[Dict], features: Dict[str, Dict]):
+    @staticmethod
+    def _combined_weight(relationships: Dict[str, float]) -> float:
+        """
+        Combine relationship weights: 1 - prod(1 - w)
+        
+        Each extra relationship raises the score without passing 1.0, so two
+        products sharing material and type (0.8, 0.7 -> 0.94) rank above
+        products sharing only one.
+        """
+        remaining = 1.0
+        for weight in relationships.values():
+            remaining *= 1.0 - min(max(weight, 0.0), 1.0)
+        return 1.0 - remaining
+    
+    @staticmethod
+    def _primary_relationship(relationships: Dict[str, float]) -> str:
+        """Strongest relationship type of an edge"""
+        return max(relationships.items(), key=lambda item: item[1])[0]
+    
+    def build_relationships_from_features(self, products: List[Dict], features: Dict[str, Dict],
+                                          vectors: Optional[Dict[str, np.ndarray]] = None,
+                                          max_neighbors: Optional[int] = DEFAULT_MAX_NEIGHBORS):
         """
         Build product relationships based on extracted features
         
+        Products are grouped into one bucket per predicted material and
+        object type, and only products in the same bucket are linked. Each
+        product keeps edges to its max_neighbors most similar bucket members,
+        so the edge count grows linearly with the catalogue. With
+        max_neighbors=None every pair in a bucket is linked instead: a
+        bucket of n products gets n(n-1)/2 edges, so time, memory and graph
+        size grow quadratically (10,000 products sharing a material already
+        give 50 million edges).
+        
         Args:
             products: List of product metadata
             features: Dict of {product_id: features}
+            vectors: Dict of {product_id: embedding} used to rank bucket
+                members by cosine similarity (required unless max_neighbors
+                is None or every bucket is smaller than max_neighbors + 2)
+            max_neighbors: Most similar products linked per product and
+                relationship (None = link all pairs in a bucket)
+        
+        Raises:
+            ValueError: If max_neighbors is below 1, or vectors are missing
+                for a bucket that has to be pruned
         """
+        if max_neighbors is not None and max_neighbors < 1:
+            raise ValueError(f"max_neighbors must be at least 1, got {max_neighbors}")
         print(f"[INFO] Building relationships for {len(products)} products...")
         
-        # Add all products as nodes
-        for product in products:
-            product_id = product['id']
-            product_features = features.get(product_id, {})
-            
-            metadata = {
-                'material': product_features.get('material', {}).get('predicted_material', 'unknown'),
-                'object_type': product_features.get('object_type', {}).get('predicted_type', 'unknown'),
-                'title': product.get('metadata', {}).get('title', '')
-            }
-            self.add_product(product_id, metadata)
-        
-        # Build relationships
-        product_ids = list(features.keys())
-        relationship_count = 0
-        
-        for i, pid1 in enumerate(product_ids):
-            for pid2 in product_ids[i+1:]:
-                feat1 = features.get(pid1, {})
-                feat2 = features.get(pid2, {})
+        with self.bulk():
+            # Add all products as nodes
+            for product in products:
+                product_id = product['id']
+                product_features = features.get(product_id, {})
                 
-                # Same material relationship
-                mat1 = feat1.get('material', {}).get('predicted_material')
-                mat2 = feat2.get('material', {}).get('predicted_material')
-                if mat1 and mat2 and mat1 == mat2:
-                    self.add_relationship(pid1, pid2, "SAME_MATERIAL", weight=0.8)
-                    relationship_count += 1
+                metadata = {
+                    'material': product_features.get('material', {}).get('predicted_material', 'unknown'),
+                    'object_type': product_features.get('object_type', {}).get('predicted_type', 'unknown'),
+                    'title': product.get('metadata', {}).get('title', '')
+                }
+                self.add_product(product_id, metadata)
+            
+            # Build relationships within each material/type bucket
+            relationship_count = 0
+            for relationship_type, feature_name, attribute, weight in self.RELATIONSHIP_RULES:
+                buckets = defaultdict(list)
+                for product_id, product_features in features.items():
+                    value = product_features.get(feature_name, {}).get(attribute)
+                    if value and self.graph.has_node(product_id):
+                        buckets[value].append(product_id)
                 
-                # Same object type relationship
-                type1 = feat1.get('object_type', {}).get('predicted_type')
-                type2 = feat2.get('object_type', {}).get('predicted_type')
-                if type1 and type2 and type1 == type2:
-                    self.add_relationship(pid1, pid2, "SAME_TYPE", weight=0.7)
-                    relationship_count += 1
+                for bucket in buckets.values():
+                    for pid1, pid2 in self._bucket_pairs(bucket, vectors, max_neighbors):
+                        self.add_relationship(pid1, pid2, relationship_type, weight=weight)
+                        relationship_count += 1
         
         print(f"[OK] Created {relationship_count} relationships")
-        self._save_graph()
+    
+    def add_similarity_edges(self, edges: Iterable[Tuple[str, str, float]]) -> int:
+        """
+        Add SIMILAR_TO relationships weighted by visual similarity
+        
+        Args:
+            edges: (product_id1, product_id2, similarity) tuples, e.g. from
+                EnhancedVectorStore.similarity_edges
+            
+        Returns:
+            Number of relationships added (pairs with both products in the graph)
+        """
+        count = 0
+        with self.bulk():
+            for product_id1, product_id2, similarity in edges:
+                if self.graph.has_node(product_id1) and self.graph.has_node(product_id2):
+                    self.add_relationship(product_id1, product_id2, "SIMILAR_TO", weight=float(similarity))
+                    count += 1
+        print(f"[OK] Created {count} SIMILAR_TO relationships")
+        return count
+    
+    def _bucket_pairs(self, bucket: List[str], vectors: Optional[Dict[str, np.ndarray]],
+                      max_neighbors: Optional[int]) -> Iterator[Tuple[str, str]]:
+        """
+        Yield the product pairs to link within one bucket
+        
+        Args:
+            bucket: Product IDs sharing an attribute
+            vectors: Dict of {product_id: embedding}
+            max_neighbors: Most similar products kept per product (None = all pairs)
+            
+        Returns:
+            Iterator of (product_id1, product_id2), each pair once
+        """
+        if max_neighbors is None or len(bucket) <= max_neighbors + 1:
+            yield from combinations(bucket, 2)
+            return
+        if vectors is None or any(product_id not in vectors for product_id in bucket):
+            raise ValueError("max_neighbors requires a vector for every product")
+        
+        matrix = np.stack([np.asarray(vectors[product_id], dtype=np.float32) for product_id in bucket])
+        matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+        
+        # Top-M neighbours per product, a block of rows of the similarity matrix at a time
+        pairs = set()
+        block = max(1, self.SIMILARITY_BLOCK // len(bucket))
+        for start in range(0, len(bucket), block):
+            similarities = matrix[start:start + block] @ matrix.T
+            rows = np.arange(len(similarities))
+            similarities[rows, rows + start] = -np.inf  # Not its own neighbour
+            nearest = np.argpartition(-similarities, max_neighbors - 1, axis=1)[:, :max_neighbors]
+            for i, neighbors in enumerate(nearest.tolist(), start):
+                pairs.update((min(i, j), max(i, j)) for j in neighbors)
+        
+        for i, j in sorted(pairs):
+            yield bucket[i], bucket[j]
     
     def get_related_products(self, product_id: str, max_results: int = 5) -> List[Dict]:
         """
-        Get products related to a given product
+        Get products related to a given product, strongest relationships first
+        
+        Selects the max_results strongest of the product's d neighbours
+        with a heap, O(d log k), instead of sorting them all, so edge
+        weight changes need no cached order to invalidate.
         
         Args:
             product_id: Product to find related items for
             max_results: Maximum number of results
             
         Returns:
-            List of related product IDs with relationship info
+            List of related product IDs with relationship info ('relationship'
+            is the strongest type, 'relationships' all types with their weights)
         """
-        if not self.graph.has_node(product_id):
+        if not self.graph.has_node(product_id) or max_results <= 0:
             return []
         
-        # Get neighbors (directly connected products)
-        neighbors = list(self.graph.neighbors(product_id))
+        # Strongest neighbours by combined weight (ties by ID)
+        strongest = heapq.nsmallest(max_results, (
+            (-edge_data.get('weight', 1.0), neighbor_id)
+            for neighbor_id, edge_data in self.graph[product_id].items()
+        ))
         
         results = []
-        for neighbor_id in neighbors[:max_results]:
+        for _, neighbor_id in strongest:
             edge_data = self.graph.get_edge_data(product_id, neighbor_id, {})
+            relationships = edge_data.get('relationships', {'SIMILAR_TO': 1.0})
             results.append({
                 'product_id': neighbor_id,
-                'relationship': edge_data.get('relationship', 'SIMILAR_TO'),
+                'relationship': self._primary_relationship(relationships),
+                'relationships': dict(relationships),
                 'weight': edge_data.get('weight', 1.0),
                 'metadata': self.graph.nodes[neighbor_id]
             })
         
-        # Sort by weight (strongest relationships first)
-        results.sort(key=lambda x: x['weight'], reverse=True)
-        
         return results
     
     def add_outlet(self, outlet_id: str, name: str, location: str, 
@@ -215,6 +395,23 @@ class GraphService:
                 result[oid] = outlet_info
         return result
     
+    def get_products_at_outlets(self, outlet_id: Optional[str] = None) -> List[str]:
+        """
+        Get products sold at an outlet, or at any outlet
+        
+        Args:
+            outlet_id: Outlet to list products of (None = all outlets)
+            
+        Returns:
+            List of product IDs
+        """
+        if outlet_id is not None:
+            return [
+                product_id for product_id, outlet_ids in self.product_outlets.items()
+                if outlet_id in outlet_ids
+            ]
+        return [product_id for product_id, outlet_ids in self.product_outlets.items() if outlet_ids]
+    
     def find_outlets_for_products(self, product_ids: List[str]) -> Dict[str, Dict[str, Dict]]:
         """
         Find outlets for multiple products
@@ -232,9 +429,15 @@ class GraphService:
     
     def get_statistics(self) -> Dict:
         """Get graph statistics"""
+        relationship_types: Dict[str, int] = defaultdict(int)
+        for _, _, relationships in self.graph.edges(data='relationships', default={}):
+            for relationship_type in relationships:
+                relationship_types[relationship_type] += 1
         return {
             'total_products': len(self.graph.nodes),
-            'total_relationships': len(self.graph.edges),
+            'total_relationships': sum(relationship_types.values()),
+            'total_edges': len(self.graph.edges),  # Product pairs with at least one relationship
+            'relationship_types': dict(relationship_types),
             'total_outlets': len(self.outlets),
             'products_with_outlets': len(self.product_outlets)
         }
@@ -3,55 +3,91 @@ Image preprocessing service
 Handles image normalization, resizing, and format conversion
 """
 
-from PIL import Image
+from PIL import Image, ImageOps
 import numpy as np
 import io
+import math
+from typing import Optional
 
 
 class ImageProcessor:
     """Handles image preprocessing tasks"""
     
-    def __init__(self, target_size: int = 384):
+    def __init__(self, target_size: int = 384, fast_decode: bool = True,
+                 max_pixels: Optional[int] = 50_000_000):
         """
         Initialize image processor
         
         Args:
             target_size: Target size for the shorter edge (maintains aspect ratio)
+            fast_decode: Decode large JPEGs at reduced resolution (1/2, 1/4
+                or 1/8 scale, still >= target_size) instead of full size.
+                Products must be indexed with the same target_size and
+                fast_decode as queries (re-run scripts/reindex_with_features.py)
+            max_pixels: Reject images with more pixels than this before
+                decoding them (decompression bomb guard; None = no limit)
         """
         self.target_size = target_size
+        self.fast_decode = fast_decode
+        self.max_pixels = max_pixels
     
     def preprocess(self, image_bytes: bytes) -> np.ndarray:
         """
         Preprocess uploaded image for CLIP model
         
         Steps:
-        1. Load image from bytes
-        2. Convert to RGB (handles RGBA, grayscale, etc.)
-        3. Resize maintaining aspect ratio (shorter edge = target_size)
-        4. Convert to numpy array (RGB format, values 0-255)
+        1. Load image from bytes (large JPEGs are decoded at reduced scale)
+        2. Apply EXIF orientation
+        3. Convert to RGB (handles RGBA, grayscale, etc.)
+        4. Resize maintaining aspect ratio (shorter edge = target_size)
+        5. Convert to numpy array (RGB format, values 0-255)
         
         Args:
             image_bytes: Raw image file bytes
             
         Returns:
             numpy array of shape (H, W, 3) with RGB values 0-255
+            
+        Raises:
+            ValueError: If the image has more than max_pixels pixels
         """
-        # Load image from bytes
+        # Load image from bytes (reads the header; pixels are decoded on first use)
         image = Image.open(io.BytesIO(image_bytes))
         
+        # Refuse decompression bombs before decoding any pixels
+        width, height = image.size
+        if self.max_pixels and width * height > self.max_pixels:
+            raise ValueError(f"Image too large: {width}x{height} pixels (limit {self.max_pixels})")
+        
+        # Let the JPEG decoder scale down while decoding, keeping the
+        # shorter edge at least target_size
+        if self.fast_decode and image.format == "JPEG":
+            scale = self.target_size / min(width, height)
+            if scale < 0.5:
+                image.draft("RGB", (math.ceil(width * scale), math.ceil(height * scale)))
+        
+        # Rotate/flip as the camera recorded it (phone photos are often stored sideways)
+        image = ImageOps.exif_transpose(image)
+        
         # Convert to RGB if needed (handles RGBA, grayscale, etc.)
         if image.mode != "RGB":
             image = image.convert("RGB")
         
-        # Resize maintaining aspect ratio (shorter edge = target_size)
-        image = self._resize_with_aspect_ratio(image, self.target_size)
+        # Resize maintaining aspect ratio (shorter edge = target_size); once
+        # within 2x of the target, bicubic is close to LANCZOS and cheaper
+        if self.fast_decode and min(image.size) <= 2 * self.target_size:
+            resample = Image.Resampling.BICUBIC
+        else:
+            resample = Image.Resampling.LANCZOS
+        image = self._resize_with_aspect_ratio(image, self.target_size, resample)
         
         # Convert to numpy array
         image_array = np.array(image)
         
         return image_array
     
-    def _resize_with_aspect_ratio(self, image: Image.Image, target_size: int) -> Image.Image:
+    def _resize_with_aspect_ratio(self, image: Image.Image, target_size: int,
+                                  resample: int = Image.Resampling.LANCZOS) -> Image.Image:
         """
         Resize image maintaining aspect ratio
         
@@ -70,7 +106,7 @@ class ImageProcessor:
             new_width = int(width * (target_size / height))
         
         # Resize with high-quality resampling
-        resized = image.resize((new_width, new_height), Image.Resampling.LANCZOS)
+        resized = image.resize((new_width, new_height), resample)
         
         return resized
 
@@ -0,0 +1,69 @@
+"""
+Index type handling shared by the vector stores
+Rebuilds the FAISS index as another type and persists its configuration
+"""
+
+from typing import Dict, Optional
+
+from app.services.index_factory import (
+    MIN_TRAIN_SIZE, apply_search_params, build_index, get_search_params, reconstruct_all,
+    requires_training, resolve_params
+)
+
+
+class IndexConfigMixin:
+    """
+    Index rebuild and configuration for VectorStore and EnhancedVectorStore
+    
+    Expects the store to set index, index_type, index_params,
+    _configured_params, active_index_type, _lock and _generation, and to
+    provide _save_index().
+    """
+    
+    def rebuild_index(self, index_type: Optional[str] = None, index_params: Optional[Dict] = None):
+        """
+        Rebuild the FAISS index as another type, training it on the stored embeddings
+        
+        Product order (FAISS ids) is preserved. Rebuilding from an IVF-PQ index
+        uses its compressed vectors, so switch away from PQ by re-indexing.
+        
+        Args:
+            index_type: New index type (default: the configured index_type)
+            index_params: Build/search parameters (default: the configured ones)
+        """
+        with self._lock:
+            if index_type is not None or index_params is not None:
+                self.index_type = index_type or self.index_type
+                self.index_params = resolve_params(self.index_type, index_params)
+                self._configured_params = dict(index_params or {})
+            
+            embeddings = reconstruct_all(self.index)
+            print(f"[INFO] Building {self.index_type} index from {len(embeddings)} embeddings...")
+            self.index = build_index(embeddings, self.index_type, self.index_params)
+            self.active_index_type = self.index_type
+            self._generation += 1
+            self._save_index()
+    
+    def _index_config(self) -> Dict:
+        """Index type and parameters persisted alongside the metadata"""
+        return {
+            'type': self.active_index_type,
+            'params': {**self.index_params, **get_search_params(self.index)}
+        }
+    
+    def _apply_index_config(self, saved_config: Optional[Dict]):
+        """Reconcile a loaded index with the configured index type"""
+        saved_config = saved_config or {'type': 'flat', 'params': {}}
+        self.active_index_type = saved_config.get('type', 'flat')
+        
+        if self.active_index_type == self.index_type:
+            # Persisted parameters, overridden by explicitly configured ones
+            self.index_params = resolve_params(
+                self.index_type, {**saved_config.get('params', {}), **self._configured_params}
+            )
+            apply_search_params(self.index, self.index_params)
+        elif not requires_training(self.index_type) or self.index.ntotal >= MIN_TRAIN_SIZE:
+            self.rebuild_index()
+        else:
+            print(f"[INFO] Keeping {self.active_index_type} index until the catalogue has "
+                  f"{MIN_TRAIN_SIZE} products to train a {self.index_type} index")
@@ -0,0 +1,315 @@
+"""
+FAISS index factory
+Builds flat (exact) or approximate nearest-neighbour indexes for CLIP embeddings
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import faiss
+import numpy as np
+from typing import Dict, Optional
+
+
+# Supported index types
+INDEX_TYPES = ('flat', 'hnsw', 'ivf_flat', 'ivf_pq')
+
+# Default build/search parameters per index type
+DEFAULT_PARAMS = {
+    'flat': {},
+    'hnsw': {'m': 32, 'ef_construction': 40, 'ef_search': 64},
+    'ivf_flat': {'nlist': 256, 'nprobe': 16},
+    'ivf_pq': {'nlist': 256, 'nprobe': 16, 'pq_m': 64, 'pq_bits': 8},
+}
+
+# IVF/PQ need roughly this many training points per centroid
+TRAIN_POINTS_PER_LIST = 39
+
+# Below this many vectors a flat index is exact and fast enough, so stores
+# configured for a trained index stay flat until the catalogue grows
+MIN_TRAIN_SIZE = 1000
+
+# Filtered searches over at most this many rows scan their vectors exactly
+# instead of searching the index with an ID selector
+EXACT_SUBSET_SIZE = 2048
+
+
+def requires_training(index_type: str) -> bool:
+    """Whether the index type must be trained on embeddings before use"""
+    return index_type in ('ivf_flat', 'ivf_pq')
+
+
+def resolve_params(index_type: str, params: Optional[Dict] = None) -> Dict:
+    """Merge user parameters over the defaults for an index type"""
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type '{index_type}'. Use one of {INDEX_TYPES}")
+    resolved = dict(DEFAULT_PARAMS[index_type])
+    resolved.update(params or {})
+    return resolved
+
+
+def create_index(dim: int, index_type: str = 'flat', params: Optional[Dict] = None,
+                 n_train: Optional[int] = None) -> faiss.Index:
+    """
+    Create an empty FAISS index (L2 metric)
+    
+    Args:
+        dim: Embedding dimension
+        index_type: 'flat', 'hnsw', 'ivf_flat' or 'ivf_pq'
+        params: Build/search parameters (see DEFAULT_PARAMS)
+        n_train: Number of training vectors available; IVF list count and PQ
+            code size are reduced to what that many vectors can train
+    
+    Returns:
+        FAISS index (IVF indexes still need train())
+    """
+    params = resolve_params(index_type, params)
+    
+    if index_type == 'flat':
+        index = faiss.IndexFlatL2(dim)
+    elif index_type == 'hnsw':
+        index = faiss.IndexHNSWFlat(dim, params['m'])
+        index.hnsw.efConstruction = params['ef_construction']
+    else:
+        nlist = params['nlist']
+        if n_train is not None:
+            nlist = max(1, min(nlist, n_train // TRAIN_POINTS_PER_LIST))
+        if index_type == 'ivf_flat':
+            description = f"IVF{nlist},Flat"
+        else:
+            pq_m, pq_bits = params['pq_m'], params['pq_bits']
+            if dim % pq_m != 0:
+                raise ValueError(f"pq_m={pq_m} must divide the embedding dimension {dim}")
+            if n_train is not None:
+                # Each sub-quantizer trains 2^pq_bits centroids
+                max_bits = int(np.log2(max(n_train // TRAIN_POINTS_PER_LIST, 2)))
+                pq_bits = max(1, min(pq_bits, max_bits))
+            description = f"IVF{nlist},PQ{pq_m}x{pq_bits}"
+        index = faiss.index_factory(dim, description, faiss.METRIC_L2)
+    
+    apply_search_params(index, params)
+    return index
+
+
+def build_index(embeddings: np.ndarray, index_type: str = 'flat',
+                params: Optional[Dict] = None) -> faiss.Index:
+    """
+    Create an index, train it on the embeddings if needed and add them
+    
+    Args:
+        embeddings: (n, dim) float32 embeddings, row i gets FAISS id i
+        index_type: Index type (see INDEX_TYPES)
+        params: Build/search parameters
+    
+    Returns:
+        Populated FAISS index
+    """
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    n, dim = embeddings.shape
+    if requires_training(index_type) and n == 0:
+        raise ValueError(f"Cannot train a '{index_type}' index without embeddings")
+    
+    index = create_index(dim, index_type, params, n_train=n)
+    if not index.is_trained:
+        index.train(embeddings)
+    if n > 0:
+        index.add(embeddings)
+    return index
+
+
+def truncate_index(index: faiss.Index, size: int, params: Optional[Dict] = None) -> faiss.Index:
+    """
+    Keep only the first `size` rows of an index
+    
+    Flat and IVF indexes drop the other rows in place. HNSW indexes can't
+    remove vectors, so they are rebuilt from the kept rows.
+    
+    Args:
+        index: FAISS index
+        size: Number of rows to keep
+        params: Build parameters for a rebuilt HNSW index
+    
+    Returns:
+        The truncated index (a new one if it was rebuilt)
+    """
+    if size >= index.ntotal:
+        return index
+    if isinstance(index, faiss.IndexHNSW):
+        return build_index(reconstruct_all(index)[:size], 'hnsw', params)
+    
+    ivf = _extract_ivf(index)
+    if ivf is not None:
+        ivf.set_direct_map_type(faiss.DirectMap.NoMap)  # Rows can't be removed through an array map
+    index.remove_ids(faiss.IDSelectorRange(size, index.ntotal))
+    if ivf is not None:
+        ivf.make_direct_map()
+    return index
+
+
+def apply_search_params(index: faiss.Index, params: Optional[Dict]):
+    """Set query-time parameters (nprobe for IVF, ef_search for HNSW)"""
+    params = params or {}
+    if 'nprobe' in params:
+        ivf = _extract_ivf(index)
+        if ivf is not None:
+            ivf.nprobe = min(params['nprobe'], ivf.nlist)
+    if 'ef_search' in params and isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = params['ef_search']
+
+
+def get_search_params(index: faiss.Index) -> Dict:
+    """Current query-time parameters of an index"""
+    ivf = _extract_ivf(index)
+    if ivf is not None:
+        return {'nprobe': ivf.nprobe}
+    if isinstance(index, faiss.IndexHNSW):
+        return {'ef_search': index.hnsw.efSearch}
+    return {}
+
+
+def reconstruct_all(index: faiss.Index) -> np.ndarray:
+    """
+    Return all stored vectors as an (ntotal, dim) float32 array
+    
+    Exact for flat, HNSW and IVF-Flat indexes; approximate (PQ-decoded)
+    for IVF-PQ.
+    """
+    if index.ntotal == 0:
+        return np.zeros((0, index.d), dtype=np.float32)
+    _ensure_direct_map(index)
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def reconstruct(index: faiss.Index, row: int) -> np.ndarray:
+    """
+    Return the stored vector of one row as a (dim,) float32 array
+    
+    Approximate (PQ-decoded) for IVF-PQ, like reconstruct_all.
+    """
+    _ensure_direct_map(index)
+    return index.reconstruct(int(row))
+
+
+def search_subset(index: faiss.Index, queries: np.ndarray, rows: np.ndarray, k: int):
+    """
+    Search only the given rows, with the same output as index.search
+    
+    Up to EXACT_SUBSET_SIZE rows are compared exactly against their stored
+    vectors, so even a very selective filter gets its true neighbours from
+    an approximate index. Larger subsets are searched through the index
+    with an ID selector, which skips other rows while scanning.
+    
+    Args:
+        index: FAISS index (L2 metric)
+        queries: (n, dim) float32 queries
+        rows: Row IDs to search (int64)
+        k: Results per query (at most len(rows) are returned)
+    
+    Returns:
+        (distances, indices) arrays of shape (n, min(k, len(rows)))
+    """
+    queries = np.ascontiguousarray(queries, dtype=np.float32)
+    rows = np.ascontiguousarray(rows, dtype=np.int64)
+    k = min(k, len(rows))
+    if k == 0:
+        return np.zeros((len(queries), 0), dtype=np.float32), np.zeros((len(queries), 0), dtype=np.int64)
+    
+    if len(rows) <= EXACT_SUBSET_SIZE:
+        _ensure_direct_map(index)
+        vectors = index.reconstruct_batch(rows)
+        # Squared L2, as returned by IndexFlatL2
+        distances = (
+            (queries ** 2).sum(axis=1, keepdims=True) - 2.0 * queries @ vectors.T
+            + (vectors ** 2).sum(axis=1)[None, :]
+        )
+        nearest = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        nearest_distances = np.take_along_axis(distances, nearest, axis=1)
+        order = np.argsort(nearest_distances, axis=1)
+        return (np.maximum(np.take_along_axis(nearest_distances, order, axis=1), 0.0),
+                rows[np.take_along_axis(nearest, order, axis=1)])
+    
+    selector = faiss.IDSelectorBatch(len(rows), faiss.swig_ptr(rows))
+    ivf = _extract_ivf(index)
+    if ivf is not None:
+        params = faiss.SearchParametersIVF(sel=selector, nprobe=ivf.nprobe)
+    elif isinstance(index, faiss.IndexHNSW):
+        params = faiss.SearchParametersHNSW(sel=selector, efSearch=index.hnsw.efSearch)
+    else:
+        params = faiss.SearchParameters(sel=selector)
+    return index.search(queries, k, params=params)
+
+
+def knn_self_join(index: faiss.Index, k: int, rows: Optional[np.ndarray] = None,
+                  block_size: int = 1024, workers: Optional[int] = None):
+    """
+    Find the k nearest other rows of every row, using the index's own vectors as queries
+    
+    Queries are reconstructed and searched in blocks of block_size rows,
+    with blocks spread over worker threads (FAISS releases the GIL while
+    searching). Each worker limits its own OpenMP thread count to one, so
+    the workers don't compete with FAISS's OpenMP threads; the count is
+    per thread, so the caller and other searches keep theirs. With one
+    worker the blocks are searched on the calling thread, each with
+    FAISS's usual OpenMP parallelism.
+    
+    Args:
+        index: FAISS index (L2 metric)
+        k: Neighbours per row (the row itself is never one)
+        rows: Rows to join, both as queries and as neighbours (None = all rows)
+        block_size: Queries per FAISS search call
+        workers: Threads searching blocks in parallel (None = CPU count)
+    
+    Returns:
+        (distances, indices) arrays of shape (len(rows), k), row-aligned with
+        rows; missing neighbours have index -1 and distance inf
+    """
+    rows = np.arange(index.ntotal, dtype=np.int64) if rows is None else np.asarray(rows, dtype=np.int64)
+    distances = np.full((len(rows), k), np.inf, dtype=np.float32)
+    indices = np.full((len(rows), k), -1, dtype=np.int64)
+    if len(rows) < 2 or k < 1:
+        return distances, indices
+    
+    _ensure_direct_map(index)
+    subset = len(rows) < index.ntotal
+    search_k = min(k + 1, len(rows))  # One extra for the row itself
+    
+    def search_block(start: int):
+        block_rows = rows[start:start + block_size]
+        queries = index.reconstruct_batch(block_rows)
+        if subset:
+            block_distances, block_indices = search_subset(index, queries, rows, search_k)
+        else:
+            block_distances, block_indices = index.search(queries, search_k)
+        for i, row in enumerate(block_rows):
+            # Results are sorted, so if the row itself was not found (approximate
+            # search or duplicates) the first k others are still the nearest
+            keep = (block_indices[i] != row) & (block_indices[i] >= 0)
+            found = min(k, int(keep.sum()))
+            distances[start + i, :found] = block_distances[i][keep][:found]
+            indices[start + i, :found] = block_indices[i][keep][:found]
+    
+    workers = workers or os.cpu_count() or 1
+    starts = range(0, len(rows), block_size)
+    if workers == 1 or len(starts) == 1:
+        for start in starts:
+            search_block(start)
+        return distances, indices
+    
+    with ThreadPoolExecutor(max_workers=workers, initializer=faiss.omp_set_num_threads, initargs=(1,)) as executor:
+        list(executor.map(search_block, starts))
+    return distances, indices
+
+
+def _ensure_direct_map(index: faiss.Index):
+    """Let an IVF index reconstruct vectors by row"""
+    ivf = _extract_ivf(index)
+    if ivf is not None and ivf.direct_map.type == faiss.DirectMap.NoMap:
+        ivf.make_direct_map()
+
+
+def _extract_ivf(index: faiss.Index):
+    """Return the IVF part of an index, or None for non-IVF indexes"""
+    try:
+        return faiss.extract_index_ivf(index)
+    except RuntimeError:
+        return None
@@ -0,0 +1,117 @@
+"""
+Append-only mutation log (write-ahead log) for the vector stores
+Makes each index mutation durable without rewriting the index snapshot
+"""
+
+import os
+import pickle
+import struct
+import zlib
+from typing import Dict, List
+
+# Record frame: payload length and CRC32, followed by the pickled record
+_HEADER = struct.Struct('<II')
+
+
+class MutationLog:
+    """
+    Append-only log of index mutations ({'op': 'add', ...} records)
+    
+    Each record gets an increasing sequence number. A store writes the last
+    sequence number into its snapshot, replays newer records on load and
+    resets the log after the next snapshot (compaction).
+    """
+    
+    def __init__(self, path: str, fsync: bool = True):
+        """
+        Initialize mutation log
+        
+        Args:
+            path: Log file path (created on first append)
+            fsync: Force each appended batch to disk before returning. Without
+                it a record survives a process crash but not a power loss.
+        """
+        self.path = path
+        self.fsync = fsync
+        self.last_seq = 0  # Sequence number of the newest record
+        self._file = None
+        
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+    
+    def append(self, records: List[Dict]):
+        """
+        Append records (one write and one fsync for the whole batch)
+        
+        Args:
+            records: Mutation records; each is given a 'seq' number
+        """
+        if not records:
+            return
+        
+        frames = []
+        for record in records:
+            self.last_seq += 1
+            payload = pickle.dumps({**record, 'seq': self.last_seq}, protocol=pickle.HIGHEST_PROTOCOL)
+            frames.append(_HEADER.pack(len(payload), zlib.crc32(payload)) + payload)
+        
+        if self._file is None:
+            self._file = open(self.path, 'ab')
+        self._file.write(b''.join(frames))
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+    
+    def replay(self, after_seq: int = 0) -> List[Dict]:
+        """
+        Read records newer than a snapshot
+        
+        A torn record at the end (crash mid-append) is dropped and cut from
+        the file so later appends start on a clean record boundary.
+        
+        Args:
+            after_seq: Sequence number stored in the snapshot
+        
+        Returns:
+            Records with seq > after_seq, oldest first
+        """
+        self.last_seq = max(self.last_seq, after_seq)
+        if not os.path.exists(self.path):
+            return []
+        
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        
+        records = []
+        offset = 0
+        while offset + _HEADER.size <= len(data):
+            length, crc = _HEADER.unpack_from(data, offset)
+            payload = data[offset + _HEADER.size:offset + _HEADER.size + length]
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                break
+            record = pickle.loads(payload)
+            self.last_seq = max(self.last_seq, record['seq'])
+            if record['seq'] > after_seq:
+                records.append(record)
+            offset += _HEADER.size + length
+        
+        if offset < len(data):
+            print(f"[WARNING] Dropping {len(data) - offset} bytes of incomplete log records from {self.path}")
+            self.close()
+            with open(self.path, 'rb+') as f:
+                f.truncate(offset)
+        return records
+    
+    def reset(self):
+        """Empty the log once its records are part of a saved snapshot"""
+        self.close()
+        if os.path.exists(self.path):
+            with open(self.path, 'wb'):
+                pass
+    
+    def close(self):
+        """Close the log file handle"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
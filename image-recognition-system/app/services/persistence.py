@@ -0,0 +1,33 @@
+"""
+Crash-safe file writes for index and metadata persistence
+"""
+
+import os
+from contextlib import contextmanager
+
+
+@contextmanager
+def atomic_path(path: str):
+    """
+    Yield a temporary path to write to; it replaces `path` only on success
+    
+    The temp file lives next to the target so os.replace is an atomic
+    rename: readers (and a restart after a crash) see either the old or the
+    new file, never a partially written one.
+    
+    Usage:
+        with atomic_path("data/faiss_index.idx") as tmp_path:
+            faiss.write_index(index, tmp_path)
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = os.path.join(directory, f".{os.path.basename(path)}.tmp")
+    try:
+        yield tmp_path
+        # Make sure the data is on disk before the rename makes it visible
+        with open(tmp_path, 'rb+') as f:
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
@@ -0,0 +1,157 @@
+"""
+Query embedding cache
+Maps a hash of an uploaded image (its bytes, or its decoded pixels) to the
+CLIP embedding and extracted features, so repeated queries skip straight
+to the index lookup
+"""
+
+import hashlib
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import numpy as np
+
+from app.services.persistence import atomic_path
+
+
+class QueryCache:
+    """LRU cache of query embeddings/features with an optional on-disk tier"""
+    
+    def __init__(self, max_entries: int = 1024, disk_dir: Optional[str] = None,
+                 max_disk_entries: int = 10000, namespace: str = ""):
+        """
+        Initialize query cache
+        
+        Args:
+            max_entries: Entries kept in memory (least recently used evicted)
+            disk_dir: Directory for the on-disk tier; memory misses are looked
+                up there and survive restarts (None = memory only)
+            max_disk_entries: Files kept in disk_dir (oldest evicted)
+            namespace: Mixed into every key; change it (e.g. to the CLIP
+                model name) when cached values would no longer match
+        """
+        self.max_entries = max(1, max_entries)
+        self.disk_dir = disk_dir
+        self.max_disk_entries = max(1, max_disk_entries)
+        self.namespace = namespace
+        
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        
+        self._disk_keys: "OrderedDict[str, None]" = OrderedDict()  # Oldest first
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            paths = [
+                os.path.join(disk_dir, name) for name in os.listdir(disk_dir) if name.endswith('.pkl')
+            ]
+            for path in sorted(paths, key=os.path.getmtime):
+                self._disk_keys[os.path.basename(path)[:-4]] = None
+    
+    def bytes_key(self, image_bytes: bytes) -> str:
+        """Key for an uploaded file's raw bytes"""
+        return self._hash(b"bytes", image_bytes)
+    
+    def pixels_key(self, image: np.ndarray) -> str:
+        """Key for a decoded image (same pixels from a different file encoding hit too)"""
+        image = np.ascontiguousarray(image)
+        return self._hash(b"pixels", str(image.shape).encode(), image.dtype.str.encode(), image.data)
+    
+    def get(self, key: str) -> Optional[Dict]:
+        """
+        Look up an entry ({'clip': ..., 'features': ...}; either may be missing)
+        
+        Returns:
+            The cached entry, or None on a miss
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+        
+        entry = self._read_disk(key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._store(key, entry)
+        return entry
+    
+    def put(self, key: str, entry: Dict):
+        """Store an entry in memory and, if configured, on disk"""
+        with self._lock:
+            self._store(key, entry)
+        self._write_disk(key, entry)
+    
+    def stats(self) -> Dict:
+        """Hit/miss counters and sizes"""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                'entries': len(self._entries),
+                'disk_entries': len(self._disk_keys)
+            }
+    
+    def _hash(self, *parts) -> str:
+        """Hex digest of the namespace and parts"""
+        digest = hashlib.blake2b(self.namespace.encode(), digest_size=16)
+        for part in parts:
+            digest.update(part)
+        return digest.hexdigest()
+    
+    def _store(self, key: str, entry: Dict):
+        """Insert into the memory tier (lock held)"""
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+    
+    def _disk_path(self, key: str) -> str:
+        """File holding a disk-tier entry"""
+        return os.path.join(self.disk_dir, f"{key}.pkl")
+    
+    def _read_disk(self, key: str) -> Optional[Dict]:
+        """Entry from the disk tier, or None"""
+        if not self.disk_dir or key not in self._disk_keys:
+            return None
+        try:
+            with open(self._disk_path(key), 'rb') as f:
+                return pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+    
+    def _write_disk(self, key: str, entry: Dict):
+        """Write an entry to the disk tier, evicting the oldest files beyond max_disk_entries"""
+        if not self.disk_dir:
+            return
+        try:
+            with atomic_path(self._disk_path(key)) as tmp_path:
+                with open(tmp_path, 'wb') as f:
+                    pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        except OSError as e:
+            print(f"[WARNING] Could not write query cache entry: {e}")
+            return
+        
+        with self._lock:
+            self._disk_keys[key] = None
+            self._disk_keys.move_to_end(key)
+            evicted = []
+            while len(self._disk_keys) > self.max_disk_entries:
+                evicted.append(self._disk_keys.popitem(last=False)[0])
+        for old_key in evicted:
+            try:
+                os.remove(self._disk_path(old_key))
+            except OSError:
+                pass
@@ -0,0 +1,45 @@
+"""
+Shared/exclusive lock for the FAISS index
+Searches share the index; adds wait until no search is using it
+"""
+
+import threading
+from contextlib import contextmanager
+
+
+class ReadWriteLock:
+    """Any number of readers, or one writer"""
+    
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._readers = 0
+        self._writing = False
+    
+    @contextmanager
+    def read(self):
+        """Hold the lock shared for the duration of the block"""
+        with self._condition:
+            while self._writing:
+                self._condition.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._readers -= 1
+                if self._readers == 0:
+                    self._condition.notify_all()
+    
+    @contextmanager
+    def write(self):
+        """Hold the lock exclusively for the duration of the block"""
+        with self._condition:
+            while self._writing or self._readers > 0:
+                self._condition.wait()
+            self._writing = True
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._writing = False
+                self._condition.notify_all()
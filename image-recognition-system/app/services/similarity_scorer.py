@@ -4,13 +4,18 @@ Computes per-feature similarity scores and weighted fusion
 """
 
 import numpy as np
-from typing import Dict, List
-from scipy.spatial.distance import cosine
+from typing import Dict
 
 
 class SimilarityScorer:
     """Computes similarity scores between query and database items"""
     
+    # Feature types compared with cosine similarity vs. probability overlap
+    COSINE_FEATURES = ('geometric', 'color', 'texture', 'pattern', 'clip')
+    PROBABILITY_FEATURES = ('material', 'object_type')
+    # Order of columns in score_batch output (same order as compute_similarity)
+    FEATURE_ORDER = ('geometric', 'color', 'texture', 'pattern', 'material', 'object_type', 'clip')
+    
     def __init__(self, weights: Dict[str, float] = None):
         """
         Initialize similarity scorer
@@ -102,6 +107,69 @@ class SimilarityScorer:
             'final_score': final_score
         }
     
+    def score_batch(self, query_features: Dict, candidate_matrices: Dict[str, np.ndarray]) -> Dict:
+        """
+        Compute similarity scores between a query and many database items
+        
+        Vectorized equivalent of calling compute_similarity once per
+        candidate: same per-feature measures and weighted fusion.
+        
+        Args:
+            query_features: Features extracted from query image (same layout
+                as for compute_similarity)
+            candidate_matrices: {feature_type: (n_candidates, dim) matrix}
+            
+        Returns:
+            Dictionary with 'feature_names' (column order), 'score_matrix'
+            (n_candidates, n_features) and 'final_scores' (n_candidates,)
+        """
+        n_candidates = len(next(iter(candidate_matrices.values()))) if candidate_matrices else 0
+        
+        feature_names = []
+        columns = []
+        for feature in self.FEATURE_ORDER:
+            if feature not in candidate_matrices or feature not in query_features:
+                continue
+            query_vector = query_features[feature]
+            if feature != 'clip':
+                query_vector = query_vector['feature_vector']
+            query_vector = np.asarray(query_vector, dtype=np.float32).ravel()
+            matrix = np.asarray(candidate_matrices[feature], dtype=np.float32)
+            
+            if feature in self.PROBABILITY_FEATURES:
+                columns.append(self._probability_similarity_batch(query_vector, matrix))
+            else:
+                columns.append(self._cosine_similarity_batch(query_vector, matrix))
+            feature_names.append(feature)
+        
+        if columns:
+            score_matrix = np.stack(columns, axis=1)
+        else:
+            score_matrix = np.zeros((n_candidates, 0), dtype=np.float32)
+        
+        # Weighted fusion, normalized by the total weight of the features used
+        weights = np.array([self.weights.get(f, 0.0) for f in feature_names], dtype=np.float64)
+        final_scores = score_matrix.astype(np.float64) @ weights
+        if weights.sum() > 0:
+            final_scores = final_scores / weights.sum()
+        
+        return {
+            'feature_names': feature_names,
+            'score_matrix': score_matrix,
+            'final_scores': final_scores
+        }
+    
+    def _cosine_similarity_batch(self, vec: np.ndarray, matrix: np.ndarray) -> np.ndarray:
+        """Cosine similarity of vec against each row of matrix, mapped to [0, 1]"""
+        vec = vec / (np.linalg.norm(vec) + 1e-8)
+        norms = np.linalg.norm(matrix, axis=1) + 1e-8
+        similarity = (matrix @ vec) / norms
+        return (similarity + 1.0) / 2.0
+    
+    def _probability_similarity_batch(self, prob: np.ndarray, matrix: np.ndarray) -> np.ndarray:
+        """Bhattacharyya coefficient of prob against each row of matrix"""
+        return np.sqrt(matrix) @ np.sqrt(prob)
+    
     def _cosine_similarity(self, vec1: np.ndarray, vec2: np.ndarray) -> float:
         """Compute cosine similarity between two vectors"""
         # Normalize vectors
@@ -0,0 +1,54 @@
+"""
+Vector store setup for the API
+Opens one store on the index files: the enhanced store, or VectorStore if it can't be loaded
+"""
+
+import os
+from typing import Optional, Tuple
+
+from app.services.base_vector_store import BaseVectorStore
+from app.services.enhanced_vector_store import EnhancedVectorStore
+from app.services.vector_store import VectorStore
+
+
+def load_vector_stores(clip_encoder, data_dir: str = "data", wal_path: Optional[str] = None,
+                       **store_options) -> Tuple[BaseVectorStore, Optional[EnhancedVectorStore]]:
+    """
+    Load the vector store the API searches and writes
+    
+    The enhanced store serves both the multi-feature and the CLIP-only
+    searches from one FAISS index, and is the only store that writes the
+    index files, the log and the feature matrices. If it can't be loaded
+    (e.g. its feature matrices are missing), a VectorStore on the same
+    index files takes its place for CLIP-only search.
+    
+    Args:
+        clip_encoder: CLIPEncoder instance (to get embedding dimension)
+        data_dir: Directory of the index, metadata and feature files
+        wal_path: Mutation log replayed on load (None = off)
+        **store_options: index_type, index_params, flush_every,
+            flush_interval and compact_threshold
+    
+    Returns:
+        (vector_store, enhanced_vector_store): the store for CLIP-only
+        searches, uploads and deletions, and the enhanced store, which is
+        the same object, or None if it could not be loaded
+    """
+    index_path = os.path.join(data_dir, "faiss_index.idx")
+    metadata_path = os.path.join(data_dir, "metadata.pkl")
+    
+    enhanced_vector_store = EnhancedVectorStore(
+        index_path, metadata_path,
+        features_path=os.path.join(data_dir, "features.pkl"),
+        feature_matrix_dir=os.path.join(data_dir, "feature_matrices"),
+        wal_path=wal_path, **store_options
+    )
+    try:
+        enhanced_vector_store.load_or_create_index(clip_encoder, create_sample_data=False)
+        return enhanced_vector_store, enhanced_vector_store
+    except Exception as e:
+        print(f"[INFO] Enhanced vector store not available: {e}")
+    
+    vector_store = VectorStore(index_path, metadata_path, wal_path=wal_path, **store_options)
+    vector_store.load_or_create_index(clip_encoder, create_sample_data=False)
+    return vector_store, None
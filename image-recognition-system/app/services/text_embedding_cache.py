@@ -0,0 +1,111 @@
+"""
+CLIP text embedding cache for text-to-image search
+Precomputes the craft/material vocabulary and keeps recent queries in an LRU
+"""
+
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+# Materials and object types: the feature classifiers' classes plus common catalogue terms
+MATERIALS = ['wood', 'clay', 'fabric', 'metal', 'stone', 'brass', 'silver', 'lacquer', 'coir', 'reed']
+OBJECT_TYPES = ['mask', 'pottery', 'jewelry', 'textile', 'sculpture', 'lamp', 'bowl', 'vase', 'box', 'statue']
+
+# Sri Lankan handicraft terms shoppers search for
+CRAFT_TERMS = [
+    'sanni mask', 'kolam mask', 'raksha mask', 'batik', 'batik wall hanging', 'beeralu lace',
+    'brass oil lamp', 'carved elephant', 'wooden elephant statue', 'terracotta pot', 'clay pot',
+    'lacquer box', 'handloom saree', 'dumbara mat', 'palmyrah basket', 'coconut shell craft',
+    'silver filigree jewelry', 'moonstone carving', 'drum', 'peacock design',
+]
+
+
+def default_vocabulary() -> List[str]:
+    """Phrases precomputed at startup: craft terms, materials, object types and their combinations"""
+    phrases = CRAFT_TERMS + MATERIALS + OBJECT_TYPES
+    phrases += [f"{material} {object_type}" for material in MATERIALS for object_type in OBJECT_TYPES]
+    return list(dict.fromkeys(phrases))
+
+
+class TextEmbeddingCache:
+    """Precomputed vocabulary table plus an LRU of CLIP text embeddings"""
+    
+    def __init__(self, encoder, max_entries: int = 4096):
+        """
+        Initialize text embedding cache
+        
+        Args:
+            encoder: CLIPEncoder (encode_text / encode_texts)
+            max_entries: Query embeddings kept besides the vocabulary
+        """
+        self.encoder = encoder
+        self.max_entries = max(1, max_entries)
+        self._vocabulary: Dict[str, int] = {}  # Phrase -> row of _table
+        self._table = np.zeros((0, 0), dtype=np.float32)
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Cache key of a query: lower case with collapsed whitespace"""
+        return re.sub(r"\s+", " ", text.strip().lower())
+    
+    def warm_up(self, phrases: Optional[List[str]] = None, batch_size: int = 256):
+        """
+        Precompute embeddings for a vocabulary in batched forward passes
+        
+        Args:
+            phrases: Phrases to precompute (default: default_vocabulary())
+            batch_size: Texts per forward pass
+        """
+        phrases = list(dict.fromkeys(self.normalize(p) for p in (phrases or default_vocabulary())))
+        table = np.asarray(self.encoder.encode_texts(phrases, batch_size=batch_size), dtype=np.float32)
+        with self._lock:
+            self._table = table
+            self._vocabulary = {phrase: row for row, phrase in enumerate(phrases)}
+        print(f"[OK] Precomputed text embeddings for {len(phrases)} phrases")
+    
+    def get(self, text: str) -> Optional[np.ndarray]:
+        """Cached embedding of a query (no model call), or None"""
+        key = self.normalize(text)
+        with self._lock:
+            row = self._vocabulary.get(key)
+            if row is not None:
+                self.hits += 1
+                return self._table[row]
+            embedding = self._entries.get(key)
+            if embedding is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            return embedding
+    
+    def encode(self, text: str) -> np.ndarray:
+        """Embedding of a query, running CLIP on a cache miss"""
+        embedding = self.get(text)
+        if embedding is not None:
+            return embedding
+        
+        key = self.normalize(text)
+        embedding = np.asarray(self.encoder.encode_text(key), dtype=np.float32)
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = embedding
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return embedding
+    
+    def stats(self) -> Dict:
+        """Hit/miss counters and sizes"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'vocabulary': len(self._vocabulary),
+                'entries': len(self._entries)
+            }
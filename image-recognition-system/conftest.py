@@ -0,0 +1,55 @@
+"""
+Factories shared by the tests
+
+Plain functions rather than fixtures, so test modules import them
+(from conftest import ...) and still run as scripts.
+"""
+
+import os
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+import faiss
+import numpy as np
+
+# Add app to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.services.enhanced_vector_store import EnhancedVectorStore
+from app.services.vector_store import VectorStore
+
+DIM = 16  # Embedding dimension of the test stores
+
+
+def make_embeddings(n: int, seed: int = 0, dim: int = DIM, normalize: bool = False) -> np.ndarray:
+    """Random float32 embeddings (unit vectors if normalize)"""
+    embeddings = np.random.default_rng(seed).standard_normal((n, dim)).astype(np.float32)
+    if normalize:
+        faiss.normalize_L2(embeddings)
+    return embeddings
+
+
+def make_vector_store(directory: str, dim: int = DIM, **kwargs) -> VectorStore:
+    """VectorStore on index.idx and metadata.pkl in a directory"""
+    store = VectorStore(os.path.join(directory, "index.idx"), os.path.join(directory, "metadata.pkl"), **kwargs)
+    store.load_or_create_index(SimpleNamespace(embedding_dim=dim), create_sample_data=False)
+    return store
+
+
+def make_enhanced_store(directory: str, dim: int = DIM, **kwargs) -> EnhancedVectorStore:
+    """EnhancedVectorStore on the make_vector_store files plus features.pkl and matrices/"""
+    store = EnhancedVectorStore(
+        *[os.path.join(directory, name) for name in ("index.idx", "metadata.pkl", "features.pkl", "matrices")],
+        **kwargs
+    )
+    store.load_or_create_index(SimpleNamespace(embedding_dim=dim), create_sample_data=False)
+    return store
+
+
+def make_image(seed: int = 0, shape=(80, 120, 3)) -> np.ndarray:
+    """RGB test image with shapes and noise (small enough that
+    ColorExtractor does not subsample pixels)"""
+    rng = np.random.default_rng(seed)
+    image = rng.integers(0, 60, size=shape).astype(np.uint8)
+    image[20:70, 30:90] += np.array([150, 90, 40], dtype=np.uint8)
+    return image
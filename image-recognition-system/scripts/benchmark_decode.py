@@ -0,0 +1,93 @@
+"""
+Benchmark ImageProcessor.preprocess on large JPEG uploads
+Compares full-size decoding + LANCZOS with reduced-resolution JPEG decoding
+
+Usage: python scripts/benchmark_decode.py [images_folder] [max_images] [long_edge]
+"""
+
+import io
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.image_processor import ImageProcessor
+
+
+def make_uploads(images_folder: str, max_images: int, long_edge: int) -> list:
+    """Re-encode images as phone-sized JPEGs (long_edge x 3/4 long_edge)"""
+    image_files = sorted(
+        p for p in Path(images_folder).glob('*')
+        if p.suffix.lower() in {'.jpg', '.jpeg', '.png', '.bmp', '.webp'}
+    )[:max_images]
+    
+    sources = [Image.open(path).convert("RGB") for path in image_files]
+    if not sources:
+        # No images: a smooth gradient with noise, which compresses like a photo
+        rng = np.random.default_rng(0)
+        y, x = np.mgrid[0:768, 0:1024]
+        base = np.stack([x % 256, y % 256, (x + y) % 256], axis=2).astype(np.int16)
+        noise = rng.integers(-20, 20, size=base.shape)
+        sources = [Image.fromarray(np.clip(base + noise, 0, 255).astype(np.uint8))]
+    
+    uploads = []
+    for source in sources:
+        large = source.resize((long_edge, long_edge * 3 // 4), Image.Resampling.BICUBIC)
+        buffer = io.BytesIO()
+        large.save(buffer, format="JPEG", quality=90)
+        uploads.append(buffer.getvalue())
+    return uploads
+
+
+def time_per_image(func, inputs: list, repeats: int = 3) -> float:
+    """Return best-of-repeats mean seconds per input for func"""
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for item in inputs:
+            func(item)
+        best = min(best, (time.perf_counter() - start) / max(len(inputs), 1))
+    return best
+
+
+def main():
+    images_folder = sys.argv[1] if len(sys.argv) > 1 else "images"
+    max_images = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    long_edge = int(sys.argv[3]) if len(sys.argv) > 3 else 4032
+    
+    print("=" * 60)
+    print("Image Decode Benchmark")
+    print("=" * 60)
+    
+    uploads = make_uploads(images_folder, max_images, long_edge)
+    print(f"[INFO] {len(uploads)} JPEG upload(s) of {long_edge}x{long_edge * 3 // 4}, "
+          f"mean {np.mean([len(u) for u in uploads]) / 1e6:.1f} MB")
+    
+    processors = {
+        'full decode': ImageProcessor(fast_decode=False),
+        'draft decode': ImageProcessor(fast_decode=True),
+    }
+    timings = {}
+    outputs = {}
+    for name, processor in processors.items():
+        timings[name] = time_per_image(processor.preprocess, uploads)
+        outputs[name] = [processor.preprocess(upload) for upload in uploads]
+        print(f"  {name:14s}: {timings[name] * 1000:8.2f} ms/image, shape {outputs[name][0].shape}")
+    
+    # Quality: mean absolute pixel difference over the common area
+    differences = []
+    for full, draft in zip(outputs['full decode'], outputs['draft decode']):
+        h, w = min(full.shape[0], draft.shape[0]), min(full.shape[1], draft.shape[1])
+        differences.append(np.abs(full[:h, :w].astype(np.int16) - draft[:h, :w].astype(np.int16)).mean())
+    
+    print(f"  Speed-up (full -> draft): {timings['full decode'] / max(timings['draft decode'], 1e-9):.1f}x")
+    print(f"  Mean absolute pixel difference: {np.mean(differences):.2f} (0-255)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Benchmark feature extractor implementations on product images
+Reports per-image time for each implementation being compared
+
+Usage: python scripts/benchmark_extractors.py [images_folder] [max_images]
+"""
+
+import sys
+import time
+import warnings
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.image_processor import ImageProcessor
+from app.services.feature_extractors.texture_extractor import TextureExtractor
+from app.services.feature_extractors.color_extractor import ColorExtractor
+
+
+def load_images(images_folder: str, max_images: int) -> list:
+    """Load and preprocess up to max_images images from a folder"""
+    image_processor = ImageProcessor()
+    image_files = sorted(
+        p for p in Path(images_folder).glob('*')
+        if p.suffix.lower() in {'.jpg', '.jpeg', '.png', '.bmp', '.webp'}
+    )[:max_images]
+    
+    images = []
+    for image_path in image_files:
+        with open(image_path, 'rb') as f:
+            images.append(image_processor.preprocess(f.read()))
+    return images
+
+
+def time_per_image(func, inputs: list) -> float:
+    """Return mean seconds per input for func"""
+    start = time.perf_counter()
+    for item in inputs:
+        func(item)
+    return (time.perf_counter() - start) / max(len(inputs), 1)
+
+
+def benchmark_lbp(images: list):
+    """Compare LBP implementations in TextureExtractor"""
+    print("\nLBP (TextureExtractor._compute_lbp)")
+    print("-" * 60)
+    extractor = TextureExtractor()
+    grays = [cv2.cvtColor(image, cv2.COLOR_RGB2GRAY) for image in images]
+    
+    timings = {}
+    for method in ('loop', 'fast', 'uniform'):
+        with warnings.catch_warnings():
+            # The loop relies on (deprecated) uint8 wrap-around of the codes
+            warnings.simplefilter('ignore', DeprecationWarning)
+            timings[method] = time_per_image(
+                lambda gray: extractor._compute_lbp(gray, method=method), grays
+            )
+        print(f"  {method:10s}: {timings[method] * 1000:10.2f} ms/image")
+    
+    identical = all(
+        np.array_equal(extractor._compute_lbp(gray, method='fast'),
+                       extractor._compute_lbp(gray, method='loop'))
+        for gray in grays[:1]
+    )
+    print(f"  Speed-up (loop -> fast): {timings['loop'] / max(timings['fast'], 1e-9):.0f}x")
+    print(f"  fast == loop: {identical}")
+
+
+def benchmark_dominant_colors(images: list):
+    """Compare dominant color backends in ColorExtractor"""
+    print("\nDominant colors (ColorExtractor._extract_dominant_colors)")
+    print("-" * 60)
+    extractor = ColorExtractor()
+    
+    timings = {}
+    for method in ColorExtractor.DOMINANT_COLOR_METHODS:
+        timings[method] = time_per_image(
+            lambda image: extractor._extract_dominant_colors(image, method=method), images
+        )
+        
+        # Quality: mean RGB distance from each pixel to its nearest dominant color
+        errors = []
+        for image in images:
+            colors, _ = extractor._extract_dominant_colors(image, method=method)
+            pixels = image.reshape(-1, 3).astype(np.float64)
+            distances = ((pixels[:, None, :] - colors[None, :, :].astype(np.float64)) ** 2).sum(axis=2)
+            errors.append(np.sqrt(distances.min(axis=1)).mean())
+        
+        print(f"  {method:18s}: {timings[method] * 1000:8.2f} ms/image, "
+              f"quantization error {np.mean(errors):6.2f}")
+    
+    for method in ('histogram_kmeans', 'median_cut'):
+        print(f"  Speed-up (kmeans -> {method}): {timings['kmeans'] / max(timings[method], 1e-9):.1f}x")
+
+
+def main():
+    images_folder = sys.argv[1] if len(sys.argv) > 1 else "images"
+    max_images = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    
+    print("=" * 60)
+    print("Feature Extractor Benchmark")
+    print("=" * 60)
+    
+    images = load_images(images_folder, max_images)
+    if not images:
+        print(f"[ERROR] No images found in '{images_folder}'")
+        return
+    print(f"[INFO] Benchmarking on {len(images)} image(s), shape {images[0].shape}")
+    
+    benchmark_lbp(images)
+    benchmark_dominant_colors(images)
+
+
+if __name__ == "__main__":
+    main()
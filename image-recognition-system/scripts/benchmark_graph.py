@@ -0,0 +1,126 @@
+"""
+Benchmark GraphService.build_relationships_from_features on synthetic catalogues
+Reports build time and graph file writes, and estimates the cost of the
+previous behaviour of saving the whole graph after every node and edge.
+Then times the k-NN self-join that creates SIMILAR_TO edges.
+
+Usage: python scripts/benchmark_graph.py [sizes] [num_materials] [num_types] [max_neighbors] [similar_k]
+
+sizes is a comma-separated list of product counts (default 1000,10000).
+max_neighbors limits edges per product and relationship to the most similar
+bucket members (default 10, 0 = link all pairs in a bucket).
+similar_k is the number of SIMILAR_TO neighbours per product (default 10).
+"""
+
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.graph_service import GraphService
+from app.services.index_factory import build_index, knn_self_join
+
+
+def make_catalogue(num_products: int, num_materials: int, num_types: int, seed: int = 0, dim: int = 512):
+    """Products, features with random predicted materials and object types, and embeddings"""
+    rng = np.random.default_rng(seed)
+    materials = rng.integers(num_materials, size=num_products)
+    types = rng.integers(num_types, size=num_products)
+    products = [{'id': f"P{i}", 'metadata': {'title': f"Product {i}"}} for i in range(num_products)]
+    features = {
+        f"P{i}": {
+            'material': {'predicted_material': f"material_{materials[i]}"},
+            'object_type': {'predicted_type': f"type_{types[i]}"},
+        }
+        for i in range(num_products)
+    }
+    embeddings = rng.standard_normal((num_products, dim)).astype(np.float32)
+    vectors = {f"P{i}": embeddings[i] for i in range(num_products)}
+    return products, features, vectors
+
+
+def benchmark_build(num_products: int, num_materials: int, num_types: int, max_neighbors: int):
+    """Build one graph and print timings"""
+    products, features, vectors = make_catalogue(num_products, num_materials, num_types)
+    directory = tempfile.mkdtemp()
+    service = GraphService(os.path.join(directory, "product_graph.json"))
+    
+    writes = []
+    write_graph = service._write_graph
+    
+    def timed_write():
+        start = time.perf_counter()
+        write_graph()
+        writes.append(time.perf_counter() - start)
+    
+    service._write_graph = timed_write
+    
+    start = time.perf_counter()
+    service.build_relationships_from_features(
+        products, features, vectors=vectors, max_neighbors=max_neighbors or None
+    )
+    build_time = time.perf_counter() - start
+    
+    nodes, edges = len(service.graph.nodes), len(service.graph.edges)
+    size_mb = os.path.getsize(service.graph_path) / 1e6
+    # Saving after every node and edge wrote graphs growing from empty to the
+    # final one; on average about half the final write time per save
+    legacy_saves = nodes + edges + 1
+    legacy_estimate = legacy_saves * writes[-1] / 2
+    
+    print(f"{num_products:>8} {nodes:>8} {edges:>10} {build_time:>10.2f} {len(writes):>7} "
+          f"{writes[-1]:>9.2f} {size_mb:>9.1f} {legacy_saves:>10} {legacy_estimate / 3600:>11.1f}")
+
+
+def benchmark_knn(num_products: int, similar_k: int):
+    """Time the SIMILAR_TO self-join on one and on all CPU threads"""
+    _, _, vectors = make_catalogue(num_products, 1, 1)
+    embeddings = np.stack(list(vectors.values()))
+    faiss.normalize_L2(embeddings)
+    index = build_index(embeddings, 'flat')
+    
+    join_times = []
+    for workers in (1, None):
+        start = time.perf_counter()
+        _, indices = knn_self_join(index, similar_k, workers=workers)
+        join_times.append(time.perf_counter() - start)
+    
+    print(f"{num_products:>8} {similar_k:>4} {(indices >= 0).sum():>10} "
+          f"{join_times[0]:>14.2f} {join_times[1]:>14.2f}")
+
+
+def main():
+    sizes = [int(s) for s in sys.argv[1].split(',')] if len(sys.argv) > 1 else [1000, 10000]
+    num_materials = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    num_types = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+    max_neighbors = int(sys.argv[4]) if len(sys.argv) > 4 else 10
+    similar_k = int(sys.argv[5]) if len(sys.argv) > 5 else 10
+    
+    print("=" * 90)
+    print("Graph Build Benchmark")
+    print("=" * 90)
+    print(f"[INFO] {num_materials} materials, {num_types} object types, "
+          f"{'all pairs' if not max_neighbors else f'{max_neighbors} neighbours'} per bucket")
+    print(f"\n{'Products':>8} {'Nodes':>8} {'Edges':>10} {'Build (s)':>10} {'Writes':>7} "
+          f"{'Write (s)':>9} {'File (MB)':>9} {'Old saves':>10} {'Old est (h)':>11}")
+    print("-" * 90)
+    
+    for num_products in sizes:
+        benchmark_build(num_products, num_materials, num_types, max_neighbors)
+    
+    print(f"\n[INFO] SIMILAR_TO k-NN self-join (flat index, {os.cpu_count()} CPUs)")
+    print(f"\n{'Products':>8} {'k':>4} {'Neighbours':>10} {'1 thread (s)':>14} {'All CPUs (s)':>14}")
+    print("-" * 90)
+    for num_products in sizes:
+        benchmark_knn(num_products, similar_k)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark FAISS index types for CLIP search
+Reports build time, query latency and recall@k against the exact (flat) index
+
+Usage: python scripts/benchmark_index.py [num_vectors] [num_queries] [k]
+
+Uses the saved index (data/faiss_index.idx) when it has at least num_vectors
+embeddings, otherwise synthetic clustered unit vectors of the same dimension.
+"""
+
+import os
+import sys
+import time
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.index_factory import INDEX_TYPES, build_index, reconstruct_all
+
+
+def load_embeddings(num_vectors: int, dim: int = 512, index_path: str = "data/faiss_index.idx") -> np.ndarray:
+    """Stored embeddings if there are enough, else synthetic clustered ones"""
+    if os.path.exists(index_path):
+        index = faiss.read_index(index_path)
+        if index.ntotal >= num_vectors:
+            print(f"[INFO] Using {num_vectors} embeddings from {index_path}")
+            return reconstruct_all(index)[:num_vectors]
+        dim = index.d
+    
+    print(f"[INFO] Using {num_vectors} synthetic {dim}-d embeddings")
+    rng = np.random.default_rng(0)
+    # CLIP embeddings cluster by category; mimic that with noisy cluster centres
+    centres = rng.standard_normal((max(num_vectors // 100, 1), dim)).astype(np.float32)
+    embeddings = centres[rng.integers(len(centres), size=num_vectors)]
+    embeddings = embeddings + 0.5 * rng.standard_normal((num_vectors, dim)).astype(np.float32)
+    faiss.normalize_L2(embeddings)
+    return embeddings
+
+
+def recall_at_k(found: np.ndarray, expected: np.ndarray) -> float:
+    """Fraction of the exact top-k neighbours that were returned"""
+    hits = sum(len(set(f) & set(e)) for f, e in zip(found, expected))
+    return hits / expected.size
+
+
+def benchmark_index(embeddings: np.ndarray, queries: np.ndarray, k: int):
+    """Compare index types on the same embeddings and queries"""
+    print(f"\n{'Index':<10} {'Build (s)':>10} {'ms/query':>10} {'recall@' + str(k):>10}")
+    print("-" * 60)
+    
+    exact = None
+    for index_type in INDEX_TYPES:
+        start = time.perf_counter()
+        index = build_index(embeddings, index_type)
+        build_time = time.perf_counter() - start
+        
+        start = time.perf_counter()
+        for query in queries:
+            index.search(query.reshape(1, -1), k)
+        query_time = (time.perf_counter() - start) / len(queries)
+        
+        _, found = index.search(queries, k)
+        if exact is None:
+            exact = found  # Flat index is exact
+        print(f"{index_type:<10} {build_time:>10.2f} {1000 * query_time:>10.3f} {recall_at_k(found, exact):>10.3f}")
+
+
+def main():
+    num_vectors = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    num_queries = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    k = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+    
+    print("=" * 60)
+    print("FAISS Index Benchmark")
+    print("=" * 60)
+    
+    embeddings = load_embeddings(num_vectors)
+    # Queries: perturbed catalogue embeddings, like photos of listed products
+    rng = np.random.default_rng(1)
+    queries = embeddings[rng.integers(len(embeddings), size=num_queries)]
+    queries = queries + 0.1 * rng.standard_normal(queries.shape).astype(np.float32)
+    faiss.normalize_L2(queries)
+    
+    benchmark_index(embeddings, queries, k)
+
+
+if __name__ == "__main__":
+    main()
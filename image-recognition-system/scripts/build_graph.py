@@ -1,6 +1,14 @@
 """
 Script to build product relationship graph from indexed products
 Run this after indexing products to create the relationship graph
+
+Usage: python scripts/build_graph.py [max_neighbors] [similar_k]
+
+max_neighbors is the number of most similar products (by CLIP embedding)
+linked per product and shared attribute (default 10, 0 = link every
+product sharing the attribute). similar_k is the number of visually most
+similar products linked per product with SIMILAR_TO edges (default 10,
+0 = none).
 """
 
 import sys
@@ -12,9 +20,10 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 from app.services.clip_encoder import CLIPEncoder
 from app.services.enhanced_vector_store import EnhancedVectorStore
 from app.services.graph_service import GraphService
+from app.services.index_factory import reconstruct_all
 
 
-def build_graph():
+def build_graph(max_neighbors: int = 10, similar_k: int = 10):
     """Build product relationship graph from indexed products"""
     print("=" * 60)
     print("Building Product Relationship Graph")
@@ -26,7 +35,7 @@ def build_graph():
     vector_store = EnhancedVectorStore()
     vector_store.load_or_create_index(clip_encoder, create_sample_data=False)
     
-    if len(vector_store.products) == 0:
+    if vector_store.product_count == 0:
         print("[ERROR] No products found! Index products first.")
         return
     
@@ -34,7 +43,7 @@ def build_graph():
         print("[ERROR] No features found! Run reindex_with_features.py first.")
         return
     
-    print(f"[OK] Loaded {len(vector_store.products)} products")
+    print(f"[OK] Loaded {vector_store.product_count} products")
     print(f"[OK] Loaded features for {len(vector_store.features)} products")
     
     # Initialize graph service
@@ -50,10 +59,29 @@ def build_graph():
     
     # Build relationships
     print("\n[INFO] Building product relationships...")
-    graph_service.build_relationships_from_features(
-        vector_store.products,
-        features_dict
-    )
+    # Skip entries of removed or replaced products
+    products = [
+        product for row, product in enumerate(vector_store.products)
+        if row not in vector_store.tombstones
+    ]
+    # CLIP embeddings rank products sharing an attribute by visual similarity
+    embeddings = reconstruct_all(vector_store.index)
+    vectors = {
+        product['id']: embeddings[row] for row, product in enumerate(vector_store.products)
+        if row not in vector_store.tombstones
+    }
+    with graph_service.bulk():  # One graph write for both stages
+        graph_service.build_relationships_from_features(
+            products,
+            features_dict,
+            vectors=vectors,
+            max_neighbors=max_neighbors or None
+        )
+        
+        # Visual similarity: k-NN self-join over the CLIP index
+        if similar_k > 0:
+            print(f"\n[INFO] Linking each product to its {similar_k} most similar products...")
+            graph_service.add_similarity_edges(vector_store.similarity_edges(k=similar_k))
     
     # Print statistics
     stats = graph_service.get_statistics()
@@ -61,7 +89,9 @@ def build_graph():
     print("Graph Statistics:")
     print("=" * 60)
     print(f"Total Products: {stats['total_products']}")
-    print(f"Total Relationships: {stats['total_relationships']}")
+    print(f"Total Relationships: {stats['total_relationships']} on {stats['total_edges']} product pairs")
+    for relationship_type, count in sorted(stats['relationship_types'].items()):
+        print(f"  {relationship_type}: {count}")
     print(f"Total Outlets: {stats['total_outlets']}")
     print(f"Products with Outlets: {stats['products_with_outlets']}")
     print("\n[OK] Graph built successfully!")
@@ -72,6 +102,9 @@ def build_graph():
 
 
 if __name__ == "__main__":
-    build_graph()
+    build_graph(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 10,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    )
 
 
@@ -26,7 +26,7 @@ def load_images_from_folder(images_folder: str = "images"):
     print("[INFO] Initializing services...")
     image_processor = ImageProcessor()
     clip_encoder = CLIPEncoder()
-    vector_store = VectorStore()
+    vector_store = VectorStore(flush_every=50)  # Save in batches while loading
     
     # Load or create index
     vector_store.load_or_create_index(clip_encoder, create_sample_data=False)
@@ -55,24 +55,43 @@ def load_images_from_folder(images_folder: str = "images"):
     print(f"[INFO] Found {len(image_files)} image(s) to process")
     print("-" * 50)
     
-    # Process each image
+    # Process images in batches: decode each, encode the batch with one
+    # CLIP pass per batch_size images, then add the batch to the index
     success_count = 0
     error_count = 0
+    batch_size = 64
     
-    for idx, image_path in enumerate(image_files, 1):
+    for batch_start in range(0, len(image_files), batch_size):
+        batch_files = []
+        processed_images = []
+        for idx, image_path in enumerate(image_files[batch_start:batch_start + batch_size], batch_start + 1):
+            try:
+                print(f"[{idx}/{len(image_files)}] Processing: {image_path.name}")
+                
+                # Read image
+                with open(image_path, 'rb') as f:
+                    image_bytes = f.read()
+                
+                # Preprocess
+                processed_images.append(image_processor.preprocess(image_bytes))
+                batch_files.append(image_path)
+            except Exception as e:
+                error_count += 1
+                print(f"   [ERROR] Error processing {image_path.name}: {str(e)}")
+        
+        if not batch_files:
+            continue
+        
         try:
-            print(f"[{idx}/{len(image_files)}] Processing: {image_path.name}")
-            
-            # Read image
-            with open(image_path, 'rb') as f:
-                image_bytes = f.read()
-            
-            # Preprocess
-            processed_image = image_processor.preprocess(image_bytes)
-            
-            # Extract CLIP embedding
-            embedding = clip_encoder.encode_image(processed_image)
-            
+            # Extract CLIP embeddings for the whole batch
+            embeddings = clip_encoder.encode_images(processed_images)
+        except Exception as e:
+            error_count += len(batch_files)
+            print(f"   [ERROR] Error encoding batch: {str(e)}")
+            continue
+        
+        products = []
+        for image_path, embedding in zip(batch_files, embeddings):
             # Generate product ID from filename (remove extension)
             product_id = image_path.stem
             
@@ -85,30 +104,30 @@ def load_images_from_folder(images_folder: str = "images"):
             else:
                 title = product_id.replace('_', ' ').title()
             
-            # Add to vector store
-            vector_store.add_product(
-                product_id=product_id,
-                embedding=embedding,
-                metadata={
+            products.append({
+                'product_id': product_id,
+                'embedding': embedding,
+                'metadata': {
                     "title": title,
                     "description": f"Handicraft product from {image_path.name}",
                     "filename": image_path.name,
                     "filepath": str(image_path)
                 }
-            )
-            
-            success_count += 1
-            print(f"   [OK] Added: {product_id} - {title}")
-            
-        except Exception as e:
-            error_count += 1
-            print(f"   [ERROR] Error processing {image_path.name}: {str(e)}")
+            })
+        
+        # Add to vector store
+        vector_store.add_products(products)
+        success_count += len(products)
+        for product in products:
+            print(f"   [OK] Added: {product['product_id']} - {product['metadata']['title']}")
+    
+    vector_store.flush()
     
     print("-" * 50)
     print(f"[OK] Successfully loaded: {success_count} products")
     if error_count > 0:
         print(f"[ERROR] Errors: {error_count} products")
-    print(f"[INFO] Total products in database: {len(vector_store.products)}")
+    print(f"[INFO] Total products in database: {vector_store.product_count}")
 
 
 if __name__ == "__main__":
@@ -16,8 +16,13 @@ from app.services.feature_extractors.master_extractor import MasterFeatureExtrac
 from app.services.enhanced_vector_store import EnhancedVectorStore
 
 
-def reindex_images(images_folder: str = "images"):
-    """Re-index all images with full feature extraction"""
+def reindex_images(images_folder: str = "images", index_type: str = "flat"):
+    """Re-index all images with full feature extraction
+    
+    Args:
+        images_folder: Folder with product images
+        index_type: FAISS index type to build ('flat', 'hnsw', 'ivf_flat', 'ivf_pq')
+    """
     print("=" * 60)
     print("Re-indexing Images with Full Feature Extraction")
     print("=" * 60)
@@ -27,18 +32,15 @@ def reindex_images(images_folder: str = "images"):
     image_processor = ImageProcessor()
     clip_encoder = CLIPEncoder()
     feature_extractor = MasterFeatureExtractor()
-    vector_store = EnhancedVectorStore()
+    vector_store = EnhancedVectorStore(index_type=index_type, flush_every=50)  # Save in batches
     
     # Load or create index
     vector_store.load_or_create_index(clip_encoder, create_sample_data=False)
     
     # Clear existing data if re-indexing
     print("\n[INFO] Clearing existing index...")
-    vector_store.products = []
-    vector_store.features = {}
-    if vector_store.index:
-        vector_store.index.reset()
-    vector_store._create_index()
+    vector_store.clear()
+    vector_store.feature_versions = feature_extractor.feature_versions()
     
     # Get images
     images_path = Path(images_folder)
@@ -59,91 +61,115 @@ def reindex_images(images_folder: str = "images"):
     print(f"[INFO] Found {len(image_files)} images to process")
     print("-" * 60)
     
-    # Process each image
+    # Process images in batches: one CLIP pass per batch, then features per image
     success_count = 0
     error_count = 0
+    batch_size = 32
     
-    for idx, image_path in enumerate(image_files, 1):
+    for batch_start in range(0, len(image_files), batch_size):
+        batch_files = []
+        processed_images = []
+        for idx, image_path in enumerate(image_files[batch_start:batch_start + batch_size], batch_start + 1):
+            try:
+                print(f"[{idx}/{len(image_files)}] Processing: {image_path.name}")
+                
+                # Read and preprocess image
+                with open(image_path, 'rb') as f:
+                    image_bytes = f.read()
+                processed_images.append(image_processor.preprocess(image_bytes))
+                batch_files.append(image_path)
+            except Exception as e:
+                error_count += 1
+                print(f"   [ERROR] Error processing {image_path.name}: {str(e)}")
+        
+        if not batch_files:
+            continue
+        
+        # Extract CLIP embeddings for the whole batch
         try:
-            print(f"[{idx}/{len(image_files)}] Processing: {image_path.name}")
-            
-            # Read and preprocess image
-            with open(image_path, 'rb') as f:
-                image_bytes = f.read()
-            processed_image = image_processor.preprocess(image_bytes)
-            
-            # Extract CLIP embedding
-            clip_embedding = clip_encoder.encode_image(processed_image)
-            
-            # Extract all physical features
-            all_features = feature_extractor.extract_all(processed_image)
-            
-            # Prepare features for storage (convert numpy arrays to lists)
-            stored_features = {
-                'geometric': {
-                    'feature_vector': all_features['geometric']['feature_vector'].tolist(),
-                    **{k: v for k, v in all_features['geometric'].items() if k != 'feature_vector'}
-                },
-                'color': {
-                    'feature_vector': all_features['color']['feature_vector'].tolist(),
-                    **{k: v for k, v in all_features['color'].items() if k != 'feature_vector'}
-                },
-                'texture': {
-                    'feature_vector': all_features['texture']['feature_vector'].tolist(),
-                    **{k: v for k, v in all_features['texture'].items() if k != 'feature_vector'}
-                },
-                'pattern': {
-                    'feature_vector': all_features['pattern']['feature_vector'].tolist(),
-                    **{k: v for k, v in all_features['pattern'].items() if k != 'feature_vector'}
-                },
-                'material': all_features['material'],
-                'object_type': all_features['object_type'],
-                'clip': clip_embedding.tolist()  # Store CLIP for compatibility
-            }
-            
-            # Generate product ID
-            product_id = image_path.stem
-            parts = product_id.split('_')
-            if len(parts) >= 2:
-                product_id = parts[0]
-                title = ' '.join(parts[1:])
-            else:
-                title = product_id.replace('_', ' ').title()
-            
-            # Add to vector store
-            vector_store.add_product(
-                product_id=product_id,
-                clip_embedding=clip_embedding,
-                all_features=stored_features,
-                metadata={
-                    "title": title,
-                    "description": f"Handicraft product from {image_path.name}",
-                    "filename": image_path.name,
-                    "filepath": str(image_path)
+            clip_embeddings = clip_encoder.encode_images(processed_images)
+        except Exception as e:
+            error_count += len(batch_files)
+            print(f"   [ERROR] Error encoding batch: {str(e)}")
+            continue
+        
+        for image_path, processed_image, clip_embedding in zip(batch_files, processed_images, clip_embeddings):
+            try:
+                # Extract all physical features
+                all_features = feature_extractor.extract_all(processed_image)
+                
+                # Prepare features for storage (convert numpy arrays to lists)
+                stored_features = {
+                    'geometric': {
+                        'feature_vector': all_features['geometric']['feature_vector'].tolist(),
+                        **{k: v for k, v in all_features['geometric'].items() if k != 'feature_vector'}
+                    },
+                    'color': {
+                        'feature_vector': all_features['color']['feature_vector'].tolist(),
+                        **{k: v for k, v in all_features['color'].items() if k != 'feature_vector'}
+                    },
+                    'texture': {
+                        'feature_vector': all_features['texture']['feature_vector'].tolist(),
+                        **{k: v for k, v in all_features['texture'].items() if k != 'feature_vector'}
+                    },
+                    'pattern': {
+                        'feature_vector': all_features['pattern']['feature_vector'].tolist(),
+                        **{k: v for k, v in all_features['pattern'].items() if k != 'feature_vector'}
+                    },
+                    'material': all_features['material'],
+                    'object_type': all_features['object_type'],
+                    'clip': clip_embedding.tolist()  # Store CLIP for compatibility
                 }
-            )
-            
-            success_count += 1
-            print(f"   [OK] Indexed: {product_id} - {title}")
-            print(f"        Material: {all_features['material']['predicted_material']}, "
-                  f"Type: {all_features['object_type']['predicted_type']}")
+                
+                # Generate product ID
+                product_id = image_path.stem
+                parts = product_id.split('_')
+                if len(parts) >= 2:
+                    product_id = parts[0]
+                    title = ' '.join(parts[1:])
+                else:
+                    title = product_id.replace('_', ' ').title()
+                
+                # Add to vector store
+                vector_store.add_product(
+                    product_id=product_id,
+                    clip_embedding=clip_embedding,
+                    all_features=stored_features,
+                    metadata={
+                        "title": title,
+                        "description": f"Handicraft product from {image_path.name}",
+                        "filename": image_path.name,
+                        "filepath": str(image_path)
+                    }
+                )
+                
+                success_count += 1
+                print(f"   [OK] Indexed: {product_id} - {title}")
+                print(f"        Material: {all_features['material']['predicted_material']}, "
+                      f"Type: {all_features['object_type']['predicted_type']}")
             
-        except Exception as e:
-            error_count += 1
-            print(f"   [ERROR] Error processing {image_path.name}: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            except Exception as e:
+                error_count += 1
+                print(f"   [ERROR] Error processing {image_path.name}: {str(e)}")
+                import traceback
+                traceback.print_exc()
+    
+    # Trained indexes (IVF) are built once all embeddings are in
+    if vector_store.active_index_type != vector_store.index_type and len(vector_store.products) > 0:
+        vector_store.rebuild_index()
+    vector_store.flush()
     
     print("-" * 60)
     print(f"[OK] Successfully indexed: {success_count} products")
     if error_count > 0:
         print(f"[ERROR] Errors: {error_count} products")
-    print(f"[INFO] Total products in database: {len(vector_store.products)}")
+    print(f"[INFO] Total products in database: {vector_store.product_count}")
     print(f"[INFO] Total features stored: {len(vector_store.features)}")
 
 
 if __name__ == "__main__":
     images_folder = sys.argv[1] if len(sys.argv) > 1 else "images"
-    reindex_images(images_folder)
+    index_type = sys.argv[2] if len(sys.argv) > 2 else "flat"
+    reindex_images(images_folder, index_type)
 
 
@@ -0,0 +1,87 @@
+"""
+Tests for the CLIP micro-batching front end (uses a fake encoder, no model download)
+
+Usage: python test_clip_batcher.py (or pytest test_clip_batcher.py)
+"""
+
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import numpy as np
+
+# Add app to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.services.clip_batcher import CLIPBatcher
+
+
+class FakeEncoder:
+    """Embeds an image as its mean pixel value, recording batch sizes"""
+    
+    embedding_dim = 4
+    
+    def __init__(self):
+        self.batch_sizes = []
+        self.lock = threading.Lock()
+    
+    def _encode_batch(self, images):
+        with self.lock:
+            self.batch_sizes.append(len(images))
+        return np.stack([np.full(self.embedding_dim, image.mean(), dtype=np.float32) for image in images])
+    
+    def encode_text(self, text):
+        return np.zeros(self.embedding_dim, dtype=np.float32)
+
+
+def test_concurrent_calls_share_batches():
+    """Each caller gets its own embedding; concurrent calls are batched"""
+    encoder = FakeEncoder()
+    batcher = CLIPBatcher(encoder, max_batch_size=8, max_wait_ms=50)
+    images = [np.full((8, 8, 3), i, dtype=np.uint8) for i in range(16)]
+    
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        embeddings = list(pool.map(batcher.encode_image, images))
+    batcher.shutdown()
+    
+    for i, embedding in enumerate(embeddings):
+        assert np.allclose(embedding, i)
+    assert max(encoder.batch_sizes) > 1 and max(encoder.batch_sizes) <= 8
+    stats = batcher.stats()
+    assert stats['images'] == 16 and stats['batches'] == len(encoder.batch_sizes)
+    assert stats['queue_depth'] == 0
+
+
+def test_errors_reach_callers_and_attributes_forward():
+    """Encoder errors are raised in the caller; other attributes come from the encoder"""
+    encoder = FakeEncoder()
+    batcher = CLIPBatcher(encoder, max_wait_ms=0)
+    assert batcher.embedding_dim == 4
+    assert batcher.encode_text("mask").shape == (4,)
+    
+    def fail(images):
+        raise RuntimeError("CUDA out of memory")
+    encoder._encode_batch = fail
+    try:
+        batcher.encode_image(np.zeros((8, 8, 3), dtype=np.uint8))
+    except RuntimeError as e:
+        assert "out of memory" in str(e)
+    else:
+        raise AssertionError("Expected the encoder error")
+    batcher.shutdown()
+
+
+def main():
+    """Run all CLIP batcher tests"""
+    tests = [
+        test_concurrent_calls_share_batches,
+        test_errors_reach_callers_and_attributes_forward,
+    ]
+    for test in tests:
+        test()
+        print(f"[OK] {test.__name__}")
+    print("\n[SUCCESS] All CLIP batcher tests passed!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Tests for the bounded compute executor used by the API
+
+Usage: python test_compute_executor.py (or pytest test_compute_executor.py)
+"""
+
+import asyncio
+import sys
+import threading
+from pathlib import Path
+
+# Add app to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.services.compute_executor import ComputeExecutor, ExecutorBusyError
+
+
+def test_run_uses_worker_threads():
+    """Blocking calls run off the event loop thread"""
+    executor = ComputeExecutor(max_workers=2)
+    
+    async def main():
+        return await executor.run(lambda x, y=0: (threading.current_thread().name, x + y), 1, y=2)
+    
+    name, total = asyncio.run(main())
+    executor.shutdown()
+    assert name.startswith("compute") and total == 3
+
+
+def test_backlog_limit():
+    """Requests beyond workers + backlog are rejected, and admitted again once one finishes"""
+    executor = ComputeExecutor(max_workers=1, max_backlog=1)
+    release = threading.Event()
+    
+    async def request():
+        async with executor.reserve():
+            await executor.run(release.wait)
+    
+    async def main():
+        running = [asyncio.create_task(request()) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        assert executor.in_flight == 2
+        try:
+            executor.check_admission()
+        except ExecutorBusyError:
+            pass
+        else:
+            raise AssertionError("Expected ExecutorBusyError with a full backlog")
+        try:
+            async with executor.reserve():
+                pass
+        except ExecutorBusyError:
+            pass
+        else:
+            raise AssertionError("Expected ExecutorBusyError with a full backlog")
+        
+        release.set()
+        await asyncio.gather(*running)
+        assert executor.in_flight == 0
+        executor.check_admission()
+        assert executor.in_flight == 0  # Checking admits nothing
+        async with executor.reserve():
+            assert executor.in_flight == 1
+    
+    asyncio.run(main())
+    executor.shutdown()
+
+
+def main():
+    """Run all compute executor tests"""
+    tests = [
+        test_run_uses_worker_threads,
+        test_backlog_limit,
+    ]
+    for test in tests:
+        test()
+        print(f"[OK] {test.__name__}")
+    print("\n[SUCCESS] All compute executor tests passed!")
+
+
+if __name__ == "__main__":
+    main()
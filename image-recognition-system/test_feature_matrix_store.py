@@ -0,0 +1,122 @@
+"""
+Tests for FeatureMatrixStore (columnar feature storage for re-ranking)
+
+Usage: python test_feature_matrix_store.py (or pytest test_feature_matrix_store.py)
+"""
+
+import sys
+import tempfile
+from pathlib import Path
+import numpy as np
+
+# Add app to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.services.feature_matrix_store import FeatureMatrixStore
+
+
+def make_features(seed: int) -> dict:
+    """Build a features dict shaped like MasterFeatureExtractor output + CLIP"""
+    rng = np.random.default_rng(seed)
+    features = {
+        name: {'feature_vector': rng.random(dim).astype(np.float32), 'extra': seed}
+        for name, dim in [('geometric', 7), ('color', 20), ('texture', 31),
+                          ('pattern', 12), ('material', 6), ('object_type', 6)]
+    }
+    features['clip'] = rng.standard_normal(16).tolist()  # stored as a list
+    return features
+
+
+def test_rows_align_with_appends():
+    """Rows hold the appended vectors; rows without features return None"""
+    store = FeatureMatrixStore(tempfile.mkdtemp())
+    first = make_features(1)
+    assert store.append(None) == 0
+    assert store.append(first) == 1
+    for seed in range(2, 40):  # forces buffer growth
+        store.append(make_features(seed))
+    
+    assert len(store) == 40 and store.feature_count == 39
+    assert store.get_row(0) is None
+    row = store.get_row(1)
+    assert np.array_equal(row['texture']['feature_vector'], first['texture']['feature_vector'])
+    assert np.allclose(row['clip'], first['clip'])
+    assert row['clip'].dtype == np.float32
+    assert store.matrix('color').shape == (40, 20)
+    assert not store.matrix('color')[0].any()
+
+
+def test_save_and_load_mmap():
+    """Saved matrices load back identically, memory-mapped or not"""
+    directory = tempfile.mkdtemp()
+    store = FeatureMatrixStore(directory)
+    for seed in range(5):
+        store.append(make_features(seed) if seed != 2 else None)
+    store.save()
+    
+    for mmap in (False, True):
+        loaded = FeatureMatrixStore(directory)
+        loaded.load(mmap=mmap)
+        assert len(loaded) == 5 and not loaded.has_features(2)
+        for name in FeatureMatrixStore.FEATURE_TYPES:
+            assert np.array_equal(loaded.matrix(name), store.matrix(name))
+    
+    # Writing to a memory-mapped store copies it into memory first
+    loaded.append(make_features(9))
+    loaded.set_row(0, None)
+    assert len(loaded) == 6 and not loaded.has_features(0)
+    reloaded = FeatureMatrixStore(directory)
+    reloaded.load()
+    assert reloaded.has_features(0)
+
+
+def test_dimension_mismatch_rejected():
+    """Vectors with a different length than stored rows are rejected"""
+    store = FeatureMatrixStore(tempfile.mkdtemp())
+    store.append(make_features(0))
+    bad = make_features(1)
+    bad['texture']['feature_vector'] = np.zeros(261, dtype=np.float32)
+    try:
+        store.append(bad)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("Expected ValueError for mismatched texture length")
+    assert len(store) == 1
+
+
+def test_row_ids_and_realign():
+    """Saved row IDs come back from load(); realign moves rows and empties missing ones"""
+    directory = tempfile.mkdtemp()
+    store = FeatureMatrixStore(directory)
+    for seed in range(3):
+        store.append(make_features(seed))
+    store.save(["A", "B", "C"])
+    
+    loaded = FeatureMatrixStore(directory)
+    assert loaded.load(mmap=True).tolist() == ["A", "B", "C"]
+    loaded.realign(np.array([2, -1, 0]))
+    assert len(loaded) == 3 and not loaded.has_features(1)
+    assert np.array_equal(loaded.matrix('color')[0], store.matrix('color')[2])
+    assert np.array_equal(loaded.matrix('color')[2], store.matrix('color')[0])
+    
+    store.save()
+    assert FeatureMatrixStore(directory).load() is None  # Saved without IDs
+
+
+def main():
+    """Run all feature matrix store tests"""
+    tests = [
+        test_rows_align_with_appends,
+        test_save_and_load_mmap,
+        test_dimension_mismatch_rejected,
+        test_row_ids_and_realign,
+    ]
+    for test in tests:
+        test()
+        print(f"[OK] {test.__name__}")
+    print("\n[SUCCESS] All feature matrix store tests passed!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+"""
+Tests for GraphService bulk building and persistence
+
+Usage: python test_graph_service.py (or pytest test_graph_service.py)
+"""
+
+import json
+import os
+import sys
+import tempfile
+from itertools import combinations
+from pathlib import Path
+import numpy as np
+
+# Add app to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.services.graph_service import GraphService
+
+
+def make_service(directory: str) -> GraphService:
+    """GraphService whose writes are counted in service.writes"""
+    service = GraphService(os.path.join(directory, "product_graph.json"))
+    service.writes = 0
+    write_graph = service._write_graph
+    
+    def counting_write():
+        service.writes += 1
+        write_graph()
+    
+    service._write_graph = counting_write
+    return service
+
+
+def make_catalogue(n: int):
+    """Products and features with two materials and three object types"""
+    products = [{'id': f"P{i}", 'metadata': {'title': f"Product {i}"}} for i in range(n)]
+    features = {
+        f"P{i}": {
+            'material': {'predicted_material': ['wood', 'clay'][i % 2]},
+            'object_type': {'predicted_type': ['mask', 'bowl', 'vase'][i % 3]},
+        }
+        for i in range(n)
+    }
+    return products, features
+
+
+def test_bulk_writes_once_on_exit():
+    """Saves inside a (nested) bulk session are deferred to one write at the end"""
+    directory = tempfile.mkdtemp()
+    service = make_service(directory)
+    with service.bulk():
+        service.add_product("A", {'material': 'wood'})
+        with service.bulk():
+            service.add_product("B", {'material': 'wood'})
+        service.add_relationship("A", "B", "SAME_MATERIAL", weight=0.8)
+        assert service.writes == 0
+        assert not os.path.exists(service.graph_path)
+    assert service.writes == 1
+    assert os.listdir(directory) == ["product_graph.json"]
+    
+    reloaded = GraphService(service.graph_path)
+    assert reloaded.graph.has_edge("A", "B")
+    
+    # Outside a session every change is saved as before
+    service.add_product("C", {'material': 'clay'})
+    assert service.writes == 2
+
+
+def test_bulk_rolls_back_on_error():
+    """A failing session writes nothing and restores the last saved graph"""
+    directory = tempfile.mkdtemp()
+    service = make_service(directory)
+    service.add_product("A", {'material': 'wood'})
+    try:
+        with service.bulk():
+            service.add_product("B", {'material': 'wood'})
+            raise RuntimeError("build failed")
+    except RuntimeError:
+        pass
+    assert service.writes == 1
+    assert list(service.graph.nodes) == ["A"]
+    assert list(GraphService(service.graph_path).graph.nodes) == ["A"]
+
+
+def test_build_relationships_writes_once():
+    """Building the graph writes the file once, not once per node and edge"""
+    directory = tempfile.mkdtemp()
+    service = make_service(directory)
+    products, features = make_catalogue(30)
+    service.build_relationships_from_features(products, features, max_neighbors=None)
+    assert service.writes == 1
+    
+    reloaded = GraphService(service.graph_path)
+    assert len(reloaded.graph.nodes) == 30
+    assert len(reloaded.graph.edges) == len(service.graph.edges) > 0
+
+
+def test_bucketed_build_matches_all_pairs():
+    """Buckets link the same pairs, with the same relationships, as comparing all pairs"""
+    directory = tempfile.mkdtemp()
+    service = make_service(directory)
+    products, features = make_catalogue(40)
+    service.build_relationships_from_features(products, features, max_neighbors=None)
+    
+    expected = {}
+    for pid1, pid2 in combinations(features, 2):
+        feat1, feat2 = features[pid1], features[pid2]
+        if feat1['material']['predicted_material'] == feat2['material']['predicted_material']:
+            expected.setdefault(frozenset((pid1, pid2)), set()).add('SAME_MATERIAL')
+        if feat1['object_type']['predicted_type'] == feat2['object_type']['predicted_type']:
+            expected.setdefault(frozenset((pid1, pid2)), set()).add('SAME_TYPE')
+    found = {frozenset((u, v)): set(data['relationships']) for u, v, data in service.graph.edges(data=True)}
+    assert found == expected
+
+
+def test_max_neighbors_keeps_most_similar():
+    """With max_neighbors each product is linked to its most similar bucket members"""
+    directory = tempfile.mkdtemp()
+    service = make_service(directory)
+    service.SIMILARITY_BLOCK = 50  # Several row blocks per bucket
+    products, features = make_catalogue(60)
+    rng = np.random.default_rng(0)
+    vectors = {product_id: rng.standard_normal(8) for product_id in features}
+    service.build_relationships_from_features(products, features, vectors=vectors, max_neighbors=3)
+    
+    wood = [pid for pid in features if features[pid]['material']['predicted_material'] == 'wood']
+    unit = {pid: vectors[pid] / np.linalg.norm(vectors[pid]) for pid in wood}
+    for pid in wood:
+        others = sorted((pid2 for pid2 in wood if pid2 != pid), key=lambda pid2: -unit[pid] @ unit[pid2])
+        for neighbor in others[:3]:
+            assert service.graph.has_edge(pid, neighbor)
+    # At most 3 edges added per product and relationship, instead of 435 per 30-product bucket
+    assert len(service.graph.edges) <= 2 * 3 * 60
+    
+    try:
+        service.build_relationships_from_features(products, features, max_neighbors=3)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("Expected ValueError without vectors")
+    
+    # Pruned to DEFAULT_MAX_NEIGHBORS unless all pairs are asked for explicitly
+    service = make_service(tempfile.mkdtemp())
+    products, features = make_catalogue(120)
+    vectors = {product_id: rng.standard_normal(8) for product_id in features}
+    service.build_relationships_from_features(products, features, vectors=vectors)
+    assert len(service.graph.edges) <= 2 * GraphService.DEFAULT_MAX_NEIGHBORS * 120 < 120 * 119 // 2
+
+
+def test_similarity_edges_weighted_by_similarity():
+    """SIMILAR_TO edges carry the similarity and skip products missing from the graph"""
+    directory = tempfile.mkdtemp()
+    service = make_service(directory)
+    products, features = make_catalogue(4)
+    service.build_relationships_from_features(products, features)
+    
+    count = service.add_similarity_edges([("P0", "P1", 0.93), ("P1", "P2", 0.5), ("P1", "missing", 0.99)])
+    assert count == 2
+    assert service.graph.edges["P0", "P1"]['relationships'] == {'SIMILAR_TO': 0.93}
+    assert abs(service.graph.edges["P0", "P1"]['weight'] - 0.93) < 1e-9
+    assert service.writes == 2
+
+
+def test_edges_keep_every_relationship():
+    """Shared material and type both stay on the edge and rank above either alone"""
+    directory = tempfile.mkdtemp()
+    service = make_service(directory)
+    for product_id, material, object_type in [("A", "wood", "mask"), ("B", "wood", "mask"),
+                                              ("C", "wood", "bowl"), ("D", "clay", "mask")]:
+        service.add_product(product_id, {'material': material, 'object_type': object_type})
+    service.add_relationship("A", "D", "SAME_TYPE", weight=0.7)
+    service.add_relationship("A", "C", "SAME_MATERIAL", weight=0.8)
+    service.add_relationship("A", "B", "SAME_MATERIAL", weight=0.8)
+    service.add_relationship("A", "B", "SAME_TYPE", weight=0.7)
+    
+    related = service.get_related_products("A")
+    assert [r['product_id'] for r in related] == ["B", "C", "D"]
+    assert related[0]['relationships'] == {'SAME_MATERIAL': 0.8, 'SAME_TYPE': 0.7}
+    assert related[0]['relationship'] == 'SAME_MATERIAL'
+    assert abs(related[0]['weight'] - 0.94) < 1e-9
+    stats = service.get_statistics()
+    assert stats['total_relationships'] == 4 and stats['total_edges'] == 3
+    assert stats['relationship_types'] == {'SAME_TYPE': 2, 'SAME_MATERIAL': 2}
+    
+    # Saved without the derived weight, restored on load
+    with open(service.graph_path) as f:
+        assert '"weight"' not in f.read()
+    reloaded = GraphService(service.graph_path)
+    assert reloaded.get_related_products("A") == related
+
+
+def test_loads_single_relationship_edges():
+    """Graphs saved with one relationship per edge load as one-entry relationship sets"""
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, "product_graph.json")
+    graph = {
+        'directed': False, 'multigraph': False, 'graph': {},
+        'nodes': [{'id': "A"}, {'id': "B"}],
+        'edges': [{'source': "A", 'target': "B", 'relationship': 'SAME_TYPE', 'weight': 0.7}],
+    }
+    with open(path, 'w') as f:
+        json.dump({'graph': graph, 'outlets': {}, 'product_outlets': {}}, f)
+    
+    service = GraphService(path)
+    assert service.graph.edges["A", "B"] == {'relationships': {'SAME_TYPE': 0.7}, 'weight': 0.7}
+    service.add_relationship("A", "B", "SAME_MATERIAL", weight=0.8)
+    assert service.get_related_products("A")[0]['relationships'] == {'SAME_TYPE': 0.7, 'SAME_MATERIAL': 0.8}
+
+
+def test_related_products_are_the_strongest():
+    """get_related_products returns the true top-k and stays sorted as edges change"""
+    directory = tempfile.mkdtemp()
+    service = make_service(directory)
+    rng = np.random.default_rng(0)
+    with service.bulk():
+        service.add_product("hub", {})
+        for i in range(200):
+            service.add_product(f"N{i}", {})
+            service.add_relationship("hub", f"N{i}", "SIMILAR_TO", weight=i / 200)  # Weakest added first
+    
+    related = service.get_related_products("hub", max_results=3)
+    assert [r['product_id'] for r in related] == ["N199", "N198", "N197"]
+    
+    # Updates after the first query keep the ranking in sync
+    service.add_relationship("hub", "N5", "SAME_MATERIAL", weight=0.999)
+    service.add_product("new", {})
+    service.add_relationship("hub", "new", "SIMILAR_TO", weight=0.9975)
+    for i in rng.integers(200, size=20):
+        service.add_relationship("hub", f"N{i}", "SAME_TYPE", weight=float(rng.random()))
+    related = service.get_related_products("hub", max_results=10)
+    expected = sorted(service.graph["hub"].items(), key=lambda item: (-item[1]['weight'], item[0]))[:10]
+    assert [r['product_id'] for r in related] == [neighbor for neighbor, _ in expected]
+    assert related[0]['product_id'] == "N5"
+    assert service.get_related_products("hub", max_results=0) == []
+    assert service.get_related_products("N5", max_results=1)[0]['product_id'] == "hub"
+
+
+def test_related_products_follow_replaced_weights():
+    """Replacing similarity weights, rolling back or editing the graph re-ranks related products"""
+    directory = tempfile.mkdtemp()
+    service = make_service(directory)
+    with service.bulk():
+        for product_id in ("hub", "A", "B", "C"):
+            service.add_product(product_id, {})
+    service.add_similarity_edges([("hub", "A", 0.9), ("hub", "B", 0.5), ("hub", "C", 0.1)])
+    assert [r['product_id'] for r in service.get_related_products("hub")] == ["A", "B", "C"]
+    
+    service.add_similarity_edges([("hub", "A", 0.2), ("C", "hub", 0.95)])
+    assert [r['product_id'] for r in service.get_related_products("hub")] == ["C", "B", "A"]
+    assert abs(service.get_related_products("A")[0]['weight'] - 0.2) < 1e-9
+    
+    try:
+        with service.bulk():
+            service.add_relationship("hub", "B", "SIMILAR_TO", weight=0.99)
+            assert service.get_related_products("hub")[0]['product_id'] == "B"
+            raise RuntimeError("build failed")
+    except RuntimeError:
+        pass
+    assert [r['product_id'] for r in service.get_related_products("hub")] == ["C", "B", "A"]
+    assert abs(service.get_related_products("hub")[1]['weight'] - 0.5) < 1e-9
+    
+    service.graph["hub"]["A"]['weight'] = 1.0  # Changed directly on the graph: nothing is cached
+    assert service.get_related_products("hub", max_results=1)[0]['product_id'] == "A"
+
+
+def main():
+    """Run all graph service tests"""
+    tests = [
+        test_bulk_writes_once_on_exit,
+        test_bulk_rolls_back_on_error,
+        test_build_relationships_writes_once,
+        test_bucketed_build_matches_all_pairs,
+        test_max_neighbors_keeps_most_similar,
+        test_similarity_edges_weighted_by_similarity,
+        test_edges_keep_every_relationship,
+        test_loads_single_relationship_edges,
+        test_related_products_are_the_strongest,
+        test_related_products_follow_replaced_weights,
+    ]
+    for test in tests:
+        test()
+        print(f"[OK] {test.__name__}")
+    print("\n[SUCCESS] All graph service tests passed!")
+
+
+if __name__ == "__main__":
+    main()
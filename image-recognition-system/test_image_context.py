@@ -0,0 +1,133 @@
+"""
+Tests for the shared ImageContext used by MasterFeatureExtractor
+Checks that derived planes are computed once and that extractors give
+the same results with a shared context as they do standalone
+
+Usage: python test_image_context.py (or pytest test_image_context.py)
+"""
+
+import sys
+import threading
+from pathlib import Path
+import numpy as np
+
+# Add app to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.services.feature_extractors.image_context import ImageContext
+from app.services.feature_extractors.geometric_extractor import GeometricExtractor
+from app.services.feature_extractors.color_extractor import ColorExtractor
+from app.services.feature_extractors.texture_extractor import TextureExtractor
+from app.services.feature_extractors.pattern_extractor import PatternExtractor
+from app.services.feature_extractors.material_classifier import MaterialClassifier
+from app.services.feature_extractors.object_type_classifier import ObjectTypeClassifier
+from app.services.feature_extractors.master_extractor import MasterFeatureExtractor
+from conftest import make_image
+
+
+def test_planes_are_memoized():
+    """Each derived plane is computed once and then reused"""
+    context = ImageContext(make_image())
+    for name in ('gray', 'hsv', 'edges', 'smoothed_edges', 'gradients',
+                 'gradient_magnitude', 'laplacian', 'fft_magnitude'):
+        assert getattr(context, name) is getattr(context, name)
+    assert context.gray.shape == context.image.shape[:2]
+    assert context.hsv.shape == context.image.shape
+
+
+def test_shared_context_matches_standalone():
+    """Extractors give identical results with and without a shared context"""
+    image = make_image(1)
+    context = ImageContext(image)
+    geometric = GeometricExtractor().extract(image)
+    pairs = [
+        (geometric, GeometricExtractor().extract(image, context)),
+        (ColorExtractor().extract(image), ColorExtractor().extract(image, context)),
+        (TextureExtractor().extract(image), TextureExtractor().extract(image, context)),
+        (PatternExtractor().extract(image), PatternExtractor().extract(image, context)),
+        (MaterialClassifier().classify(image), MaterialClassifier().classify(image, context)),
+        (ObjectTypeClassifier().classify(image, geometric),
+         ObjectTypeClassifier().classify(image, geometric, context)),
+    ]
+    for standalone, shared in pairs:
+        assert np.allclose(standalone['feature_vector'], shared['feature_vector'])
+
+
+def test_master_extractor_output():
+    """MasterFeatureExtractor still returns every feature group"""
+    features = MasterFeatureExtractor().extract_all(make_image(2))
+    for key in ('geometric', 'color', 'texture', 'pattern', 'material', 'object_type'):
+        assert 'feature_vector' in features[key]
+    assert np.isclose(np.linalg.norm(features['fused_vector']), 1.0, atol=1e-5)
+
+
+def test_concurrent_matches_sequential():
+    """Thread-pool extraction gives the same features as sequential extraction"""
+    image = make_image(3)
+    sequential = MasterFeatureExtractor().extract_all(image)
+    extractor = MasterFeatureExtractor(concurrent=True, max_workers=3)
+    
+    # Record which thread runs geometric extraction and object type classification
+    threads = {}
+    for name, obj, method in (('geometric', extractor.geometric, 'extract'),
+                              ('object_type', extractor.object_type, 'classify')):
+        def recorded(*args, _name=name, _func=getattr(obj, method)):
+            threads[_name] = threading.current_thread().name
+            return _func(*args)
+        setattr(obj, method, recorded)
+    
+    try:
+        for _ in range(2):  # second call reuses the shared pool
+            concurrent = extractor.extract_all(image)
+            assert np.allclose(sequential['fused_vector'], concurrent['fused_vector'])
+            # Object type is chained on the geometric task, not run after all extractors
+            assert threads['object_type'] == threads['geometric'] != threading.main_thread().name
+    finally:
+        extractor.shutdown()
+    
+    timings = concurrent['timings']
+    for key in ('geometric', 'color', 'texture', 'pattern', 'material', 'object_type', 'total'):
+        assert timings[key] >= 0.0
+
+
+def test_pattern_extractor_shared_across_threads():
+    """One PatternExtractor used by several threads gives each its own ORB detector"""
+    extractor = PatternExtractor()
+    images = [make_image(seed) for seed in range(8)]
+    expected = [extractor.extract(image)['feature_vector'] for image in images]
+    
+    results, detectors = {}, {}
+    
+    def extract(i):
+        detectors[i] = extractor.orb
+        for _ in range(3):
+            results[i] = extractor.extract(images[i])['feature_vector']
+    
+    threads = [threading.Thread(target=extract, args=(i,)) for i in range(len(images))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert all(np.array_equal(results[i], expected[i]) for i in range(len(images)))
+    assert len({id(detector) for detector in detectors.values()}) == len(images)
+    assert extractor.orb is extractor.orb
+
+
+def main():
+    """Run all ImageContext tests"""
+    tests = [
+        test_planes_are_memoized,
+        test_shared_context_matches_standalone,
+        test_master_extractor_output,
+        test_concurrent_matches_sequential,
+        test_pattern_extractor_shared_across_threads,
+    ]
+    for test in tests:
+        test()
+        print(f"[OK] {test.__name__}")
+    print("\n[SUCCESS] All ImageContext tests passed!")
+
+
+if __name__ == "__main__":
+    main()
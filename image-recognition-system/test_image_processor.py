@@ -0,0 +1,82 @@
+"""
+Tests for ImageProcessor decoding: reduced-resolution JPEG decoding,
+EXIF orientation and the decompression bomb limit
+
+Usage: python test_image_processor.py (or pytest test_image_processor.py)
+"""
+
+import io
+import sys
+from pathlib import Path
+import numpy as np
+from PIL import Image
+
+# Add app to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.services.image_processor import ImageProcessor
+
+
+def make_jpeg(width: int, height: int, orientation: int = None) -> bytes:
+    """Encode a JPEG whose left half is red and right half is blue"""
+    pixels = np.zeros((height, width, 3), dtype=np.uint8)
+    pixels[:, :width // 2, 0] = 255
+    pixels[:, width // 2:, 2] = 255
+    image = Image.fromarray(pixels)
+    
+    buffer = io.BytesIO()
+    if orientation is None:
+        image.save(buffer, format="JPEG", quality=95)
+    else:
+        exif = Image.Exif()
+        exif[0x0112] = orientation
+        image.save(buffer, format="JPEG", quality=95, exif=exif)
+    return buffer.getvalue()
+
+
+def test_draft_decode_matches_full_decode():
+    """Large JPEGs decode at reduced scale to the same size and nearly the same pixels"""
+    upload = make_jpeg(3200, 2400)
+    fast = ImageProcessor(fast_decode=True).preprocess(upload)
+    full = ImageProcessor(fast_decode=False).preprocess(upload)
+    
+    assert fast.shape == full.shape == (384, 512, 3)
+    assert np.abs(fast.astype(np.int16) - full.astype(np.int16)).mean() < 2.0
+
+
+def test_exif_orientation_is_applied():
+    """An image stored sideways (orientation 6 = rotate 90 CW) comes out upright"""
+    image = ImageProcessor().preprocess(make_jpeg(1600, 800, orientation=6))
+    
+    assert image.shape == (768, 384, 3)
+    top, bottom = image[:100].mean(axis=(0, 1)), image[-100:].mean(axis=(0, 1))
+    assert top[0] > 200 and bottom[2] > 200  # Red (left half) is now on top
+
+
+def test_pixel_limit():
+    """Images over max_pixels are rejected before decoding"""
+    upload = make_jpeg(1000, 1000)
+    try:
+        ImageProcessor(max_pixels=500_000).preprocess(upload)
+    except ValueError as e:
+        assert "too large" in str(e)
+    else:
+        raise AssertionError("Expected ValueError for an image over max_pixels")
+    assert ImageProcessor(max_pixels=None).preprocess(upload).shape == (384, 384, 3)
+
+
+def main():
+    """Run all image processor tests"""
+    tests = [
+        test_draft_decode_matches_full_decode,
+        test_exif_orientation_is_applied,
+        test_pixel_limit,
+    ]
+    for test in tests:
+        test()
+        print(f"[OK] {test.__name__}")
+    print("\n[SUCCESS] All image processor tests passed!")
+
+
+if __name__ == "__main__":
+    main()
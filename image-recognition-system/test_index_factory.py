@@ -0,0 +1,193 @@
+"""
+Tests for FAISS index types (index_factory) and their use in VectorStore
+
+Usage: python test_index_factory.py (or pytest test_index_factory.py)
+"""
+
+import sys
+import tempfile
+import threading
+from pathlib import Path
+import faiss
+import numpy as np
+
+# Add app to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.services import index_factory
+from app.services.index_factory import (
+    EXACT_SUBSET_SIZE, MIN_TRAIN_SIZE, build_index, get_search_params, knn_self_join, reconstruct_all,
+    search_subset, truncate_index
+)
+from app.services.vector_store import VectorStore
+from conftest import make_embeddings, make_vector_store
+
+DIM = 32
+
+
+def make_unit_vectors(n: int, seed: int = 0) -> np.ndarray:
+    """Random unit vectors"""
+    return make_embeddings(n, seed, dim=DIM, normalize=True)
+
+
+def make_store(directory: str, n: int, **kwargs) -> VectorStore:
+    """VectorStore in a temp directory holding n products"""
+    store = make_vector_store(directory, dim=DIM, **kwargs)
+    for i, embedding in enumerate(make_unit_vectors(n)):
+        store.add_product(f"P{i}", embedding, {"title": f"Product {i}"})
+    return store
+
+
+def test_index_types_find_exact_neighbours():
+    """Flat, HNSW and IVF-Flat return each stored vector as its own top hit"""
+    embeddings = make_unit_vectors(500)
+    for index_type in ('flat', 'hnsw', 'ivf_flat'):
+        index = build_index(embeddings, index_type, {'nprobe': 64})
+        assert index.ntotal == 500
+        _, found = index.search(embeddings[:50], 1)
+        assert (found[:, 0] == np.arange(50)).all(), index_type
+        assert np.allclose(reconstruct_all(index), embeddings)
+
+
+def test_ivf_pq_trains_on_small_catalogue():
+    """IVF-PQ shrinks list count and code size to what the data can train"""
+    index = build_index(make_unit_vectors(200), 'ivf_pq', {'pq_m': 8})
+    assert index.ntotal == 200
+    assert faiss.extract_index_ivf(index).nlist <= 200 // 39
+
+
+def test_truncate_index_keeps_leading_rows():
+    """Truncating drops the last rows and keeps the others searchable by row"""
+    embeddings = make_unit_vectors(1200)
+    for index_type in ('flat', 'hnsw', 'ivf_flat'):
+        index = truncate_index(build_index(embeddings, index_type, {'nprobe': 64}), 1000)
+        assert index.ntotal == 1000
+        assert np.allclose(reconstruct_all(index), embeddings[:1000]), index_type
+        _, found = index.search(embeddings[:50], 1)
+        assert (found[:, 0] == np.arange(50)).all(), index_type
+
+
+def test_rebuild_preserves_products_and_params():
+    """rebuild_index keeps product order; search params survive a reload"""
+    directory = tempfile.mkdtemp()
+    store = make_store(directory, 300, index_type='ivf_flat', index_params={'nprobe': 4})
+    assert store.active_index_type == 'flat'  # Too few vectors to train yet
+    
+    store.rebuild_index(index_params={'nprobe': 4})
+    assert store.active_index_type == 'ivf_flat'
+    query = make_unit_vectors(300)[7]
+    assert store.search(query, top_k=1)[0].product_id == "P7"
+    
+    reloaded = make_store(directory, 0, index_type='ivf_flat')
+    assert reloaded.active_index_type == 'ivf_flat'
+    assert get_search_params(reloaded.index) == {'nprobe': 4}
+    assert reloaded.search(query, top_k=1)[0].product_id == "P7"
+
+
+def test_load_switches_index_type():
+    """A saved flat index is rebuilt as the configured type once large enough"""
+    directory = tempfile.mkdtemp()
+    make_store(directory, MIN_TRAIN_SIZE)._save_index()
+    
+    store = make_store(directory, 0, index_type='hnsw')
+    assert store.active_index_type == 'hnsw'
+    assert isinstance(store.index, faiss.IndexHNSW)
+    assert len(store.products) == MIN_TRAIN_SIZE
+    
+    # Never more results than products, and no -1 padding from ANN indexes
+    results = store.search(make_unit_vectors(1, seed=5)[0], top_k=10)
+    assert len(results) == 10
+
+
+def test_search_subset_only_returns_selected_rows():
+    """Filtered search finds the true nearest selected rows, scanned exactly or via an ID selector"""
+    embeddings = make_unit_vectors(EXACT_SUBSET_SIZE + 1000)
+    queries = make_unit_vectors(5, seed=3)
+    rng = np.random.default_rng(1)
+    for index_type in ('flat', 'ivf_flat', 'hnsw'):
+        index = build_index(embeddings, index_type, {'nprobe': 256})
+        for n_rows in (40, EXACT_SUBSET_SIZE + 500):
+            rows = np.sort(rng.choice(len(embeddings), n_rows, replace=False))
+            distances, indices = search_subset(index, queries, rows, 5)
+            
+            expected = ((queries[:, None, :] - embeddings[rows][None]) ** 2).sum(axis=2)
+            expected_rows = rows[np.argsort(expected, axis=1)[:, :5]]
+            assert np.isin(indices, rows).all(), index_type
+            if index_type == 'hnsw' and n_rows > EXACT_SUBSET_SIZE:
+                continue  # Approximate
+            assert (indices[:, 0] == expected_rows[:, 0]).all(), (index_type, n_rows)
+            assert np.allclose(distances[:, 0], np.sort(expected, axis=1)[:, 0], atol=1e-4)
+    
+    distances, indices = search_subset(index, queries, np.array([], dtype=np.int64), 5)
+    assert indices.shape == (5, 0)
+
+
+def test_knn_self_join_matches_brute_force():
+    """Blocked, multi-threaded self-join finds each row's nearest other rows"""
+    embeddings = make_unit_vectors(500)
+    index = build_index(embeddings, 'flat')
+    all_distances = ((embeddings[:, None, :] - embeddings[None]) ** 2).sum(axis=2)
+    
+    for rows in (None, np.arange(0, 500, 2)):
+        selected = np.arange(500) if rows is None else rows
+        expected = all_distances[np.ix_(selected, selected)]
+        np.fill_diagonal(expected, np.inf)
+        expected_rows = selected[np.argsort(expected, axis=1)[:, :5]]
+        for workers in (1, 4):
+            distances, indices = knn_self_join(index, 5, rows, block_size=64, workers=workers)
+            assert indices.shape == (len(selected), 5)
+            assert (indices == expected_rows).all(), workers
+            assert np.allclose(distances, np.sort(expected, axis=1)[:, :5], atol=1e-4)
+    
+    distances, indices = knn_self_join(index, 5, np.array([3]))
+    assert (indices == -1).all() and np.isinf(distances).all()
+
+
+def test_knn_self_join_workers_run_faiss_single_threaded():
+    """Each worker searches with one OpenMP thread; the caller's thread count is left alone"""
+    index = build_index(make_unit_vectors(300), 'flat')
+    rows = np.arange(200)  # A subset, so blocks go through search_subset
+    observed = []
+    
+    def recording_search_subset(*args):
+        observed.append((threading.current_thread().name, faiss.omp_get_max_threads()))
+        return search_subset(*args)
+    
+    previous = faiss.omp_get_max_threads()
+    faiss.omp_set_num_threads(3)
+    index_factory.search_subset = recording_search_subset
+    try:
+        knn_self_join(index, 5, rows, block_size=32, workers=4)
+        assert len(observed) == 7
+        assert all(threads == 1 for _, threads in observed)
+        assert threading.current_thread().name not in {name for name, _ in observed}
+        assert faiss.omp_get_max_threads() == 3
+        
+        observed.clear()
+        knn_self_join(index, 5, rows, block_size=32, workers=1)  # On the calling thread
+        assert observed and all(threads == 3 for _, threads in observed)
+    finally:
+        index_factory.search_subset = search_subset
+        faiss.omp_set_num_threads(previous)
+
+
+def main():
+    """Run all index factory tests"""
+    tests = [
+        test_index_types_find_exact_neighbours,
+        test_ivf_pq_trains_on_small_catalogue,
+        test_truncate_index_keeps_leading_rows,
+        test_rebuild_preserves_products_and_params,
+        test_load_switches_index_type,
+        test_search_subset_only_returns_selected_rows,
+        test_knn_self_join_matches_brute_force,
+        test_knn_self_join_workers_run_faiss_single_threaded,
+    ]
+    for test in tests:
+        test()
+        print(f"[OK] {test.__name__}")
+    print("\n[SUCCESS] All index factory tests passed!")
+
+
+if __name__ == "__main__":
+    main()
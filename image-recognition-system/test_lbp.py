@@ -0,0 +1,113 @@
+"""
+Parity tests for the LBP implementations in TextureExtractor
+Checks the vectorized LBP against the original per-pixel loop
+
+Usage: python test_lbp.py (or pytest test_lbp.py)
+"""
+
+import sys
+import warnings
+from pathlib import Path
+import numpy as np
+
+# Add app to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.services.feature_extractors.texture_extractor import TextureExtractor
+from conftest import make_image
+
+
+def loop_lbp(extractor: TextureExtractor, gray: np.ndarray) -> np.ndarray:
+    """Run the reference loop, which relies on (deprecated) uint8 wrap-around"""
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', DeprecationWarning)
+        return extractor._compute_lbp(gray, method='loop')
+
+
+def test_fast_matches_loop():
+    """Vectorized LBP produces exactly the loop's codes"""
+    extractor = TextureExtractor()
+    for seed in range(3):
+        gray = make_image(seed)[:, :, 0]
+        fast = extractor._compute_lbp(gray, method='fast')
+        loop = loop_lbp(extractor, gray)
+        assert fast.dtype == loop.dtype
+        assert np.array_equal(fast, loop)
+
+
+def test_fast_matches_loop_other_geometry():
+    """Parity holds for other radius/point settings"""
+    extractor = TextureExtractor(lbp_radius=1, lbp_points=8)
+    gray = make_image(7, shape=(33, 41, 3))[:, :, 1]
+    assert np.array_equal(extractor._compute_lbp(gray, method='fast'),
+                          loop_lbp(extractor, gray))
+
+
+def test_fast_feature_vector_unchanged():
+    """Default extractor output is identical to the loop-based extractor"""
+    image = make_image(3)
+    fast = TextureExtractor(lbp_method='fast').extract(image)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', DeprecationWarning)
+        loop = TextureExtractor(lbp_method='loop').extract(image)
+    assert fast['lbp_histogram'] == loop['lbp_histogram']
+    assert np.allclose(fast['feature_vector'], loop['feature_vector'])
+
+
+def test_uniform_codes():
+    """Uniform LBP yields lbp_points + 2 rotation-invariant codes"""
+    extractor = TextureExtractor(lbp_method='uniform')
+    image = make_image(5)
+    lbp = extractor._compute_lbp(image[:, :, 2])
+    assert lbp.shape == image.shape[:2]
+    assert lbp.max() <= extractor.lbp_points + 1
+    
+    # A flat image is all "neighbours >= center": every bit set
+    flat = np.full((20, 20), 128, dtype=np.uint8)
+    assert np.all(extractor._compute_lbp(flat) == extractor.lbp_points)
+    
+    features = extractor.extract(image)
+    assert len(features['lbp_histogram']) == extractor.lbp_points + 2
+    assert features['feature_vector'].shape == (extractor.lbp_points + 2 + 5,)
+
+
+def test_uniform_rotation_invariant():
+    """Rotating the image by 90 degrees leaves the uniform histogram unchanged"""
+    extractor = TextureExtractor(lbp_method='uniform')
+    gray = make_image(11, shape=(48, 48, 3))[:, :, 0]
+    hist = np.bincount(extractor._compute_lbp(gray).ravel(), minlength=26)
+    hist_rot = np.bincount(extractor._compute_lbp(np.rot90(gray).copy()).ravel(), minlength=26)
+    assert np.array_equal(hist, hist_rot)
+
+
+def test_histogram_bins_follow_method_argument():
+    """The histogram uses the bins of the method passed, not the extractor default"""
+    extractor = TextureExtractor(lbp_method='fast')
+    gray = make_image(13)[:, :, 1]
+    uniform = extractor._compute_lbp_histogram(extractor._compute_lbp(gray, method='uniform'), method='uniform')
+    assert uniform.shape == (extractor.lbp_points + 2,)
+    assert uniform.sum() == gray.size
+    fast = TextureExtractor(lbp_method='uniform')._compute_lbp_histogram(
+        extractor._compute_lbp(gray, method='fast'), method='fast'
+    )
+    assert fast.shape == (256,)
+
+
+def main():
+    """Run all LBP tests"""
+    tests = [
+        test_fast_matches_loop,
+        test_fast_matches_loop_other_geometry,
+        test_fast_feature_vector_unchanged,
+        test_uniform_codes,
+        test_uniform_rotation_invariant,
+        test_histogram_bins_follow_method_argument,
+    ]
+    for test in tests:
+        test()
+        print(f"[OK] {test.__name__}")
+    print("\n[SUCCESS] All LBP tests passed!")
+
+
+if __name__ == "__main__":
+    main()
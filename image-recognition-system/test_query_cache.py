@@ -0,0 +1,75 @@
+"""
+Tests for the query embedding/feature cache
+
+Usage: python test_query_cache.py (or pytest test_query_cache.py)
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+import numpy as np
+
+# Add app to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.services.query_cache import QueryCache
+
+
+def test_lru_eviction_and_counters():
+    """Least recently used entries are evicted; hits and misses are counted"""
+    cache = QueryCache(max_entries=2)
+    keys = [cache.bytes_key(bytes([i])) for i in range(3)]
+    cache.put(keys[0], {'clip': np.zeros(4)})
+    cache.put(keys[1], {'clip': np.ones(4)})
+    assert cache.get(keys[0]) is not None  # keys[1] is now least recently used
+    cache.put(keys[2], {'clip': np.ones(4)})
+    
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) is not None
+    assert cache.stats() == {
+        'hits': 2, 'disk_hits': 0, 'misses': 1, 'hit_rate': 2 / 3, 'entries': 2, 'disk_entries': 0
+    }
+
+
+def test_keys():
+    """Byte and pixel keys differ by content, shape and namespace"""
+    cache = QueryCache()
+    image = np.zeros((4, 6, 3), dtype=np.uint8)
+    assert cache.pixels_key(image) == cache.pixels_key(image.copy())
+    assert cache.pixels_key(image) != cache.pixels_key(image.reshape(6, 4, 3))
+    assert cache.bytes_key(b"jpeg") != cache.bytes_key(b"png")
+    assert cache.bytes_key(b"jpeg") != QueryCache(namespace="ViT-L/14").bytes_key(b"jpeg")
+
+
+def test_disk_tier_survives_restart():
+    """Entries written to disk are found by a new cache; old files are evicted"""
+    directory = tempfile.mkdtemp()
+    cache = QueryCache(disk_dir=directory, max_disk_entries=2)
+    keys = [cache.bytes_key(bytes([i])) for i in range(3)]
+    for i, key in enumerate(keys):
+        cache.put(key, {'clip': np.full(4, float(i))})
+    assert len(os.listdir(directory)) == 2
+    
+    restarted = QueryCache(disk_dir=directory, max_disk_entries=2)
+    assert restarted.get(keys[0]) is None
+    assert np.array_equal(restarted.get(keys[2])['clip'], np.full(4, 2.0))
+    assert restarted.stats()['disk_hits'] == 1
+    assert restarted.get(keys[2]) is not None and restarted.stats()['hits'] == 1
+
+
+def main():
+    """Run all query cache tests"""
+    tests = [
+        test_lru_eviction_and_counters,
+        test_keys,
+        test_disk_tier_survives_restart,
+    ]
+    for test in tests:
+        test()
+        print(f"[OK] {test.__name__}")
+    print("\n[SUCCESS] All query cache tests passed!")
+
+
+if __name__ == "__main__":
+    main()
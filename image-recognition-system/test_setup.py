@@ -53,6 +53,9 @@ def test_basic_pipeline():
         print("\n[4/6] Extracting CLIP embedding...")
         embedding = clip_encoder.encode_image(processed)
         print(f"   [OK] Embedding extracted: shape {embedding.shape}, dim={len(embedding)}")
+        batch = clip_encoder.encode_images([processed, processed[::-1]], batch_size=1)
+        assert batch.shape == (2, len(embedding)) and np.allclose(batch[0], embedding, atol=1e-4)
+        print("   [OK] Batch encoding matches single-image encoding")
         
         # Step 5: Initialize vector store
         print("\n[5/6] Initializing vector store...")
@@ -0,0 +1,98 @@
+"""
+Tests for SimilarityScorer batch scoring
+Checks that score_batch produces the same numbers as compute_similarity
+
+Usage: python test_similarity_scorer.py (or pytest test_similarity_scorer.py)
+"""
+
+import sys
+from pathlib import Path
+import numpy as np
+
+# Add app to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.services.similarity_scorer import SimilarityScorer
+
+DIMS = {'geometric': 7, 'color': 116, 'texture': 261, 'pattern': 259,
+        'material': 6, 'object_type': 6, 'clip': 512}
+
+
+def make_features(rng: np.random.Generator, skip=()) -> dict:
+    """Random features in the layout produced by MasterFeatureExtractor + CLIP"""
+    features = {}
+    for name, dim in DIMS.items():
+        if name in skip:
+            continue
+        if name in SimilarityScorer.PROBABILITY_FEATURES:
+            vector = rng.random(dim)
+            vector = vector / vector.sum()
+        elif name == 'clip':
+            vector = rng.standard_normal(dim)
+        else:
+            vector = rng.random(dim)
+        vector = vector.astype(np.float32)
+        features[name] = vector if name == 'clip' else {'feature_vector': vector}
+    return features
+
+
+def to_matrices(candidates: list) -> dict:
+    """Stack candidate feature dicts into {feature: (n, dim)} matrices"""
+    return {
+        name: np.stack([c[name] if name == 'clip' else c[name]['feature_vector'] for c in candidates])
+        for name in candidates[0]
+    }
+
+
+def test_batch_matches_scalar():
+    """Per-feature and fused scores match compute_similarity for every candidate"""
+    rng = np.random.default_rng(0)
+    scorer = SimilarityScorer()
+    query = make_features(rng)
+    candidates = [make_features(rng) for _ in range(25)]
+    
+    batch = scorer.score_batch(query, to_matrices(candidates))
+    assert batch['score_matrix'].shape == (25, len(DIMS))
+    for i, candidate in enumerate(candidates):
+        scalar = scorer.compute_similarity(query, candidate)
+        assert list(scalar['per_feature_scores']) == batch['feature_names']
+        assert np.allclose(list(scalar['per_feature_scores'].values()),
+                           batch['score_matrix'][i], atol=1e-6)
+        assert abs(scalar['final_score'] - batch['final_scores'][i]) < 1e-6
+
+
+def test_batch_with_missing_features():
+    """Features missing from the query or candidates are left out of fusion"""
+    rng = np.random.default_rng(1)
+    scorer = SimilarityScorer(weights={'color': 1.0, 'texture': 3.0, 'clip': 2.0})
+    query = make_features(rng, skip=('pattern',))
+    candidates = [make_features(rng, skip=('geometric',)) for _ in range(4)]
+    
+    batch = scorer.score_batch(query, to_matrices(candidates))
+    assert 'pattern' not in batch['feature_names'] and 'geometric' not in batch['feature_names']
+    for i, candidate in enumerate(candidates):
+        scalar = scorer.compute_similarity(query, candidate)
+        assert abs(scalar['final_score'] - batch['final_scores'][i]) < 1e-6
+
+
+def test_empty_batch():
+    """No candidates yields empty results"""
+    batch = SimilarityScorer().score_batch(make_features(np.random.default_rng(2)), {})
+    assert batch['score_matrix'].shape[0] == 0 and len(batch['final_scores']) == 0
+
+
+def main():
+    """Run all similarity scorer tests"""
+    tests = [
+        test_batch_matches_scalar,
+        test_batch_with_missing_features,
+        test_empty_batch,
+    ]
+    for test in tests:
+        test()
+        print(f"[OK] {test.__name__}")
+    print("\n[SUCCESS] All similarity scorer tests passed!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Tests for loading the API's vector store on the shared index files
+
+Usage: python test_store_loader.py (or pytest test_store_loader.py)
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+import numpy as np
+
+# Add app to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.services.enhanced_vector_store import EnhancedVectorStore
+from app.services.store_loader import load_vector_stores
+from app.services.vector_store import VectorStore
+from conftest import DIM
+
+ENCODER = SimpleNamespace(embedding_dim=DIM)
+
+
+def start(directory: str):
+    """(vector_store, enhanced_vector_store) as app.main loads them"""
+    return load_vector_stores(
+        ENCODER, data_dir=directory, wal_path=os.path.join(directory, "index.wal"),
+        flush_every=200, flush_interval=300.0
+    )
+
+
+def upload(store, product_id: str, seed: int):
+    """What POST /api/v1/upload-product does"""
+    store.add_products([{'product_id': product_id, 'embedding': np.random.default_rng(seed).standard_normal(DIM),
+                         'metadata': {'title': product_id}}])
+
+
+def reindex(directory: str, product_ids: list):
+    """Index products with features, as scripts/reindex_with_features.py does"""
+    store = EnhancedVectorStore(
+        os.path.join(directory, "faiss_index.idx"), os.path.join(directory, "metadata.pkl"),
+        os.path.join(directory, "features.pkl"), os.path.join(directory, "feature_matrices"), flush_every=50
+    )
+    store.load_or_create_index(ENCODER, create_sample_data=False)
+    for i, product_id in enumerate(product_ids):
+        features = {'texture': {'feature_vector': np.full(8, float(i)), 'mean': i}}
+        store.add_product(product_id, np.random.default_rng(100 + i).standard_normal(DIM), features, {})
+    store.flush()
+
+
+def product_ids(store) -> list:
+    """IDs of the live products in row order"""
+    return [product['id'] for row, product in enumerate(store.products) if row not in store.tombstones]
+
+
+def assert_features_aligned(enhanced_vector_store, reindexed: list):
+    """Reindexed products keep their own feature rows, uploads have none"""
+    assert len(enhanced_vector_store.feature_matrix) == len(enhanced_vector_store.products)
+    for product_id, row in enhanced_vector_store._rows.items():
+        features = enhanced_vector_store.feature_matrix.get_row(row)
+        if product_id in reindexed:
+            assert np.all(features['texture']['feature_vector'] == reindexed.index(product_id))
+        else:
+            assert features is None
+
+
+def test_one_store_serves_both_searches():
+    """The enhanced store also serves CLIP-only search, so the index is loaded once"""
+    directory = tempfile.mkdtemp()
+    reindex(directory, ["A", "B"])
+    
+    vector_store, enhanced_vector_store = start(directory)
+    assert vector_store is enhanced_vector_store
+    query = np.random.default_rng(101).standard_normal(DIM)
+    assert vector_store.search(query, top_k=1)[0].product_id == "B"
+    assert vector_store.search(query, top_k=2, filters={'product_ids': ["A"]})[0].product_id == "A"
+
+
+def test_upload_after_recovery_survives_shutdown():
+    """An upload after crash recovery is still there after a clean shutdown"""
+    directory = tempfile.mkdtemp()
+    reindex(directory, ["A", "B"])
+    
+    vector_store, _ = start(directory)
+    upload(vector_store, "X", seed=1)  # Only in the log
+    # Crash: no shutdown
+    
+    vector_store, _ = start(directory)
+    assert product_ids(vector_store) == ["A", "B", "X"]
+    assert len(vector_store.products) == 3  # X was logged once
+    upload(vector_store, "Z", seed=2)
+    vector_store.flush()  # Shutdown
+    assert os.path.getsize(os.path.join(directory, "index.wal")) == 0
+    
+    vector_store, enhanced_vector_store = start(directory)
+    assert product_ids(vector_store) == ["A", "B", "X", "Z"]
+    assert_features_aligned(enhanced_vector_store, ["A", "B"])
+
+
+def test_delete_with_compaction_survives_shutdown():
+    """Upload, delete (compacting) and shutdown keep the upload and the features aligned"""
+    directory = tempfile.mkdtemp()
+    reindex(directory, ["A", "B", "C"])
+    
+    vector_store, _ = start(directory)
+    upload(vector_store, "Y", seed=1)
+    assert vector_store.remove_product("A")  # 1 of 4 rows removed: compacts in the background
+    vector_store._compaction_thread.join()
+    vector_store.flush()
+    
+    vector_store, enhanced_vector_store = start(directory)
+    assert product_ids(vector_store) == ["B", "C", "Y"]
+    assert not vector_store.tombstones  # Compacted on disk
+    assert_features_aligned(enhanced_vector_store, ["A", "B", "C"])
+    assert not vector_store.remove_product("A")
+
+
+def test_vector_store_writes_without_enhanced_store():
+    """If the enhanced store can't load, VectorStore saves the index instead"""
+    directory = tempfile.mkdtemp()
+    reindex(directory, ["A"])
+    shutil.rmtree(os.path.join(directory, "feature_matrices"))  # Features can't be matched any more
+    
+    vector_store, enhanced_vector_store = start(directory)
+    assert isinstance(vector_store, VectorStore) and enhanced_vector_store is None
+    upload(vector_store, "B", seed=1)
+    vector_store.flush()
+    assert product_ids(start(directory)[0]) == ["A", "B"]
+
+
+def main():
+    """Run all store loader tests"""
+    tests = [
+        test_one_store_serves_both_searches,
+        test_upload_after_recovery_survives_shutdown,
+        test_delete_with_compaction_survives_shutdown,
+        test_vector_store_writes_without_enhanced_store,
+    ]
+    for test in tests:
+        test()
+        print(f"[OK] {test.__name__}")
+    print("\n[SUCCESS] All store loader tests passed!")
+
+
+if __name__ == "__main__":
+    main()
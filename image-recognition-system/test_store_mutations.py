@@ -0,0 +1,304 @@
+"""
+Tests for product removal, replacement and compaction in the vector stores
+
+Usage: python test_store_mutations.py (or pytest test_store_mutations.py)
+"""
+
+import os
+import sys
+import tempfile
+import threading
+from pathlib import Path
+import numpy as np
+
+# Add app to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.services.vector_store import VectorStore
+from conftest import make_embeddings, make_enhanced_store, make_vector_store
+
+
+def add_products(store: VectorStore, embeddings: np.ndarray):
+    """Add products P0..Pn-1 with the given embeddings"""
+    store.add_products([
+        {'product_id': f"P{i}", 'embedding': embedding, 'metadata': {'title': f"Product {i}"}}
+        for i, embedding in enumerate(embeddings)
+    ])
+
+
+def test_remove_hides_product_and_persists():
+    """Removed products leave search results, including after a reload"""
+    directory = tempfile.mkdtemp()
+    embeddings = make_embeddings(10)
+    store = make_vector_store(directory, compact_threshold=None)
+    add_products(store, embeddings)
+    
+    assert store.remove_product("P3")
+    assert not store.remove_product("P3")
+    assert store.product_count == 9 and store.index.ntotal == 10
+    assert store.get_product("P3") is None
+    
+    results = store.search(embeddings[3], top_k=9)
+    assert "P3" not in [r.product_id for r in results]
+    assert len(results) == 9
+    assert [r.rank for r in results] == list(range(1, 10))
+    
+    reloaded = make_vector_store(directory, compact_threshold=None)
+    assert reloaded.product_count == 9
+    assert "P3" not in [r.product_id for r in reloaded.search(embeddings[3], top_k=9)]
+
+
+def test_upsert_replaces_product():
+    """Re-adding a product ID replaces its embedding instead of duplicating it"""
+    store = make_vector_store(tempfile.mkdtemp(), compact_threshold=None)
+    embeddings = make_embeddings(5)
+    add_products(store, embeddings)
+    
+    replacement = make_embeddings(1, seed=7)[0]
+    store.upsert_product("P0", replacement, {'title': "New mask"})
+    assert store.product_count == 5
+    assert store.get_product("P0")['metadata'] == {'title': "New mask"}
+    
+    results = store.search(replacement, top_k=5)
+    assert [r.product_id for r in results].count("P0") == 1
+    assert results[0].product_id == "P0" and results[0].title == "New mask"
+
+
+def test_compact_drops_tombstones():
+    """compact() shrinks the index without changing search results"""
+    directory = tempfile.mkdtemp()
+    embeddings = make_embeddings(20)
+    store = make_vector_store(directory, compact_threshold=None)
+    add_products(store, embeddings)
+    for i in range(0, 20, 2):
+        store.remove_product(f"P{i}")
+    query = make_embeddings(1, seed=3)[0]
+    before = [r.product_id for r in store.search(query, top_k=5)]
+    
+    assert store.compact()
+    assert store.index.ntotal == len(store.products) == 10 and not store.tombstones
+    assert [r.product_id for r in store.search(query, top_k=5)] == before
+    assert make_vector_store(directory).index.ntotal == 10
+
+
+def test_background_compaction():
+    """Passing compact_threshold triggers a compaction thread"""
+    store = make_vector_store(tempfile.mkdtemp(), compact_threshold=0.5)
+    add_products(store, make_embeddings(4))
+    store.remove_product("P0")
+    assert store._compaction_thread is None
+    store.remove_product("P1")
+    store._compaction_thread.join()
+    assert store.index.ntotal == 2
+    assert [p['id'] for p in store.products] == ["P2", "P3"]
+
+
+def test_mutation_log_replays_removals():
+    """Logged removals and replacements are replayed after a crash"""
+    directory = tempfile.mkdtemp()
+    wal_path = os.path.join(directory, "index.wal")
+    store = make_vector_store(directory, flush_every=100, wal_path=wal_path, compact_threshold=None)
+    add_products(store, make_embeddings(3))
+    store.remove_product("P1")
+    store.add_product("P2", make_embeddings(1, seed=5)[0], {'title': "Replaced"})
+    
+    recovered = make_vector_store(directory, wal_path=wal_path, compact_threshold=None)
+    assert recovered.product_count == 2
+    assert recovered.get_product("P1") is None
+    assert recovered.get_product("P2")['metadata'] == {'title': "Replaced"}
+
+
+def test_enhanced_compaction_keeps_features_aligned():
+    """Feature rows follow their products through removal and compaction"""
+    directory = tempfile.mkdtemp()
+    store = make_enhanced_store(directory, compact_threshold=None)
+    
+    embeddings = make_embeddings(4)
+    for i, embedding in enumerate(embeddings):
+        features = {'texture': {'feature_vector': np.full(8, float(i)), 'mean': i}}
+        store.add_product(f"P{i}", embedding, features, {'title': f"Product {i}"})
+    store.remove_product("P1")
+    assert "P1" not in store.features
+    assert "P1" not in [r.product_id for r in store.search_with_features(embeddings[1], {}, top_k=3)]
+    
+    assert store.compact()
+    assert [p['id'] for p in store.products] == ["P0", "P2", "P3"]
+    for row, i in enumerate((0, 2, 3)):
+        assert np.all(store.feature_matrix.get_row(row)['texture']['feature_vector'] == i)
+
+
+def test_find_similar_uses_stored_vectors():
+    """find_similar(_with_features) queries with a stored product's vectors and leaves it out"""
+    directory = tempfile.mkdtemp()
+    embeddings = make_embeddings(6)
+    embeddings[4] = embeddings[2] + 0.01  # P4 is P2's nearest neighbour
+    store = make_vector_store(directory, compact_threshold=None)
+    add_products(store, embeddings)
+    
+    results = store.find_similar("P2", top_k=3)
+    assert [r.rank for r in results] == [1, 2, 3]
+    assert results[0].product_id == "P4" and "P2" not in [r.product_id for r in results]
+    assert store.find_similar("missing") is None
+    
+    enhanced = make_enhanced_store(os.path.join(directory, "enhanced"), compact_threshold=None)
+    for i, embedding in enumerate(embeddings):
+        features = {'texture': {'feature_vector': np.full(8, float(i % 2) + 1)}, 'clip': embedding}
+        enhanced.add_product(f"P{i}", embedding, features, {'title': f"Product {i}"})
+    
+    results = enhanced.find_similar_with_features("P2", top_k=3)
+    assert len(results) == 3 and results[0].product_id == "P4"
+    assert "P2" not in [r.product_id for r in results]
+    assert set(results[0].per_feature_scores) == {'texture', 'clip'}
+    
+    # A product stored without features (an API upload) is compared on CLIP alone
+    enhanced.add_product("U", embeddings[2] + 0.02, None, {'title': "Upload"})
+    results = enhanced.find_similar_with_features("U", top_k=3)
+    assert [r.product_id for r in results] == [r.product_id for r in enhanced.find_similar("U", top_k=3)]
+    assert {results[0].product_id, results[1].product_id} == {"P2", "P4"}
+    assert results[0].similarity_score > 0.9
+
+
+def test_searches_run_outside_the_store_lock():
+    """Mutations go on while a search re-ranks; index.add waits for searches using the index"""
+    directory = tempfile.mkdtemp()
+    store = make_enhanced_store(directory, compact_threshold=None)
+    embeddings = make_embeddings(4)
+    for i, embedding in enumerate(embeddings):
+        store.add_product(f"P{i}", embedding, {'texture': {'feature_vector': np.full(8, float(i))}}, {})
+    
+    score_batch = store.similarity_scorer.score_batch
+    
+    def score_during_mutations(query_features, candidates):
+        mutation = threading.Thread(target=lambda: (store.remove_product("P0"), store.compact()))
+        mutation.start()
+        mutation.join(timeout=5)
+        assert not mutation.is_alive()  # Would deadlock if the re-rank held the lock
+        return score_batch(query_features, candidates)
+    
+    store.similarity_scorer.score_batch = score_during_mutations
+    results = store.search_with_features(embeddings[0], {'texture': {'feature_vector': np.zeros(8)}}, top_k=4)
+    store.similarity_scorer.score_batch = score_batch
+    # Ranked on the rows searched, before the removal and compaction
+    assert {r.product_id for r in results} == {"P0", "P1", "P2", "P3"}
+    assert all(set(r.per_feature_scores) == {'texture'} for r in results)
+    assert [p['id'] for p in store.products] == ["P1", "P2", "P3"]
+    
+    with store._searching() as snapshot:
+        adding = threading.Thread(target=store.add_product, args=("P4", embeddings[0], None, {}))
+        adding.start()
+        adding.join(timeout=0.2)
+        assert adding.is_alive()  # index.add waits for the search
+        assert snapshot['index'].ntotal == 3
+    adding.join()
+    assert store.search(embeddings[0], top_k=1)[0].product_id == "P4"
+
+
+def test_search_batch_matches_single_queries():
+    """Batched searches return the same results as one search per query"""
+    directory = tempfile.mkdtemp()
+    embeddings = make_embeddings(12)
+    queries = make_embeddings(3, seed=9)
+    store = make_vector_store(directory, compact_threshold=None)
+    add_products(store, embeddings)
+    store.remove_product("P5")
+    
+    batch = store.search_batch(queries, top_k=4)
+    assert len(batch) == 3
+    for query, results in zip(queries, batch):
+        assert [r.product_id for r in results] == [r.product_id for r in store.search(query, top_k=4)]
+    
+    enhanced = make_enhanced_store(os.path.join(directory, "enhanced"), compact_threshold=None)
+    for i, embedding in enumerate(embeddings):
+        features = {'texture': {'feature_vector': np.arange(8) * (i + 1.0)}, 'clip': embedding}
+        enhanced.add_product(f"P{i}", embedding, features, {'title': f"Product {i}"})
+    
+    query_features = [
+        {'texture': {'feature_vector': np.arange(8) % (q + 2)}, 'clip': query} for q, query in enumerate(queries)
+    ]
+    batch = enhanced.search_with_features_batch(queries, query_features, top_k=4)
+    for query, features, results in zip(queries, query_features, batch):
+        single = enhanced.search_with_features(query, features, top_k=4)
+        assert [(r.product_id, r.similarity_score) for r in results] == \
+            [(r.product_id, r.similarity_score) for r in single]
+
+
+def test_filtered_search_follows_mutations():
+    """Attribute filters return only matching live products, through removal and compaction"""
+    directory = tempfile.mkdtemp()
+    store = make_enhanced_store(directory, compact_threshold=None)
+    
+    embeddings = make_embeddings(30)
+    for i, embedding in enumerate(embeddings):
+        features = {
+            'material': {'predicted_material': 'wood' if i % 3 == 0 else 'clay'},
+            'object_type': {'predicted_type': 'mask' if i % 2 == 0 else 'pottery'},
+            'clip': embedding
+        }
+        store.add_product(f"P{i}", embedding, features, {'title': f"Product {i}"})
+    store.remove_product("P0")
+    
+    wooden_masks = {f"P{i}" for i in range(6, 30, 6)}
+    assert store.matching_product_ids({'material': 'Wood', 'object_type': 'mask'}) == wooden_masks
+    for _ in range(2):
+        results = store.search_with_features(embeddings[1], {'clip': embeddings[1]}, top_k=10,
+                                             filters={'material': 'wood', 'object_type': 'mask'})
+        assert {r.product_id for r in results} == wooden_masks
+        results = store.search(embeddings[1], top_k=10, filters={'material': 'wood', 'object_type': 'mask'})
+        assert {r.product_id for r in results} == wooden_masks  # CLIP-only
+        assert store.compact()
+        store.remove_product("P6")
+        wooden_masks.discard("P6")
+    
+    results = store.search_with_features(embeddings[1], {}, top_k=5, filters={'product_ids': ["P1", "P6"]})
+    assert [r.product_id for r in results] == ["P1"]
+    
+    vector_store = make_vector_store(directory, compact_threshold=None)
+    add_products(vector_store, embeddings)
+    results = vector_store.search(embeddings[1], top_k=5, filters={'product_ids': ["P2", "P4"]})
+    assert sorted(r.product_id for r in results) == ["P2", "P4"]
+
+
+def test_similarity_edges_link_nearest_live_products():
+    """The k-NN self-join links each live product to its nearest live products once"""
+    directory = tempfile.mkdtemp()
+    store = make_enhanced_store(directory, compact_threshold=None)
+    embeddings = make_embeddings(20)
+    embeddings[7] = embeddings[3] + 0.01  # P7 is P3's nearest neighbour
+    embeddings[9] = embeddings[3] + 0.02
+    for i, embedding in enumerate(embeddings):
+        store.add_product(f"P{i}", embedding, {'clip': embedding}, {'title': f"Product {i}"})
+    store.remove_product("P7")
+    
+    edges = store.similarity_edges(k=2, block_size=4, workers=2)
+    pairs = {frozenset((pid1, pid2)): similarity for pid1, pid2, similarity in edges}
+    assert len(pairs) == len(edges)
+    assert all("P7" not in pair and len(pair) == 2 for pair in pairs)
+    assert pairs[frozenset(("P3", "P9"))] > 0.99
+    degree = {f"P{i}": sum(f"P{i}" in pair for pair in pairs) for i in range(20) if i != 7}
+    assert min(degree.values()) >= 2
+    assert store.similarity_edges(k=2, min_similarity=0.99) == [("P3", "P9", pairs[frozenset(("P3", "P9"))])]
+
+
+def main():
+    """Run all store mutation tests"""
+    tests = [
+        test_remove_hides_product_and_persists,
+        test_upsert_replaces_product,
+        test_compact_drops_tombstones,
+        test_background_compaction,
+        test_mutation_log_replays_removals,
+        test_enhanced_compaction_keeps_features_aligned,
+        test_find_similar_uses_stored_vectors,
+        test_searches_run_outside_the_store_lock,
+        test_search_batch_matches_single_queries,
+        test_filtered_search_follows_mutations,
+        test_similarity_edges_link_nearest_live_products,
+    ]
+    for test in tests:
+        test()
+        print(f"[OK] {test.__name__}")
+    print("\n[SUCCESS] All store mutation tests passed!")
+
+
+if __name__ == "__main__":
+    main()
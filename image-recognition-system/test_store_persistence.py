@@ -0,0 +1,349 @@
+"""
+Tests for batched, deferred and atomic saving and the mutation log in the vector stores
+
+Usage: python test_store_persistence.py (or pytest test_store_persistence.py)
+"""
+
+import multiprocessing
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+import faiss
+import numpy as np
+
+# Add app to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.services import base_vector_store
+from app.services.index_factory import reconstruct_all
+from app.services.persistence import atomic_path
+from conftest import DIM, make_enhanced_store, make_vector_store
+
+
+def make_products(n: int, start: int = 0) -> list:
+    """add_products batch with random embeddings"""
+    rng = np.random.default_rng(start)
+    return [
+        {'product_id': f"P{i}", 'embedding': rng.standard_normal(DIM), 'metadata': {'title': f"Product {i}"}}
+        for i in range(start, start + n)
+    ]
+
+
+def load_logged_store(directory: str, enhanced: bool = False):
+    """VectorStore or EnhancedVectorStore with a mutation log in a temp directory"""
+    make_store = make_enhanced_store if enhanced else make_vector_store
+    return make_store(directory, wal_path=os.path.join(directory, "index.wal"), compact_threshold=None)
+
+
+def fail_metadata_save(store, fail):
+    """Make the store call fail() instead of replacing its metadata file"""
+    save_file = atomic_path
+    
+    @contextmanager
+    def save_or_fail(path):
+        if path == store.metadata_path:
+            fail()
+        with save_file(path) as tmp_path:
+            yield tmp_path
+    base_vector_store.atomic_path = save_or_fail
+
+
+def crash_after_index_save(directory: str, enhanced: bool):
+    """Child process: log and add two products, then die between replacing the index and the metadata"""
+    store = load_logged_store(directory, enhanced)
+    fail_metadata_save(store, lambda: os._exit(3))
+    store.add_products(make_products(6)[4:])
+
+
+def test_atomic_path_keeps_old_file_on_error():
+    """A failed write leaves the previous file and no temp file behind"""
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, "data.bin")
+    with atomic_path(path) as tmp_path:
+        with open(tmp_path, 'wb') as f:
+            f.write(b"old")
+    try:
+        with atomic_path(path) as tmp_path:
+            with open(tmp_path, 'wb') as f:
+                f.write(b"partial")
+            raise IOError("crash mid-save")
+    except IOError:
+        pass
+    with open(path, 'rb') as f:
+        assert f.read() == b"old"
+    assert os.listdir(directory) == ["data.bin"]
+
+
+def test_deferred_flush():
+    """Saves happen at the flush_every threshold or on flush()"""
+    directory = tempfile.mkdtemp()
+    store = make_vector_store(directory, flush_every=5)
+    for product in make_products(4):
+        store.add_product(**product)
+    assert not os.path.exists(store.index_path)
+    
+    store.add_product(**make_products(1, start=4)[0])
+    assert make_vector_store(directory).index.ntotal == 5
+    
+    store.add_products(make_products(3, start=5))
+    assert make_vector_store(directory).index.ntotal == 5
+    store.flush()
+    assert len(make_vector_store(directory).products) == 8
+
+
+def test_flush_interval():
+    """A zero interval saves on every add regardless of flush_every"""
+    store = make_vector_store(tempfile.mkdtemp(), flush_every=100, flush_interval=0.0)
+    store.add_products(make_products(2))
+    assert os.path.exists(store.index_path)
+
+
+def test_batch_matches_single_adds():
+    """add_products gives the same index and search results as add_product"""
+    products = make_products(20)
+    single = make_vector_store(tempfile.mkdtemp())
+    for product in products:
+        single.add_product(**product)
+    batch = make_vector_store(tempfile.mkdtemp())
+    batch.add_products(products)
+    
+    assert batch.products == single.products
+    query = np.random.default_rng(99).standard_normal(DIM)
+    assert [r.product_id for r in batch.search(query, 5)] == [r.product_id for r in single.search(query, 5)]
+
+
+def test_stores_take_the_same_batch():
+    """A VectorStore.add_products batch adds the same products to EnhancedVectorStore"""
+    directory = tempfile.mkdtemp()
+    products = make_products(5)
+    vector_store = make_vector_store(os.path.join(directory, "basic"))
+    vector_store.add_products(products)
+    enhanced = make_enhanced_store(os.path.join(directory, "enhanced"))
+    enhanced.add_products(products)
+    
+    assert enhanced.products == vector_store.products
+    assert len(enhanced.feature_matrix) == 5 and enhanced.feature_matrix.feature_count == 0
+    query = np.random.default_rng(99).standard_normal(DIM)
+    assert ([r.product_id for r in enhanced.search_with_features(query, {}, top_k=3)]
+            == [r.product_id for r in vector_store.search(query, 3)])
+
+
+def test_enhanced_batch_rolls_back_on_bad_features():
+    """A batch with inconsistent features adds nothing"""
+    directory = tempfile.mkdtemp()
+    store = make_enhanced_store(directory)
+    
+    def product(i, texture_dim=8):
+        features = {'texture': {'feature_vector': np.ones(texture_dim), 'mean': i}, 'clip': np.ones(DIM)}
+        return {'product_id': f"P{i}", 'embedding': np.ones(DIM), 'all_features': features, 'metadata': {}}
+    
+    store.add_products([product(0), product(1)])
+    try:
+        store.add_products([product(2), product(3, texture_dim=9)])
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("Expected ValueError for mismatched texture length")
+    assert len(store.feature_matrix) == store.index.ntotal == len(store.products) == 2
+    assert store.features["P1"] == {'texture': {'mean': 1}}
+
+
+def test_mutation_log_replays_unsaved_products():
+    """Products added after the last save are recovered from the log"""
+    directory = tempfile.mkdtemp()
+    wal_path = os.path.join(directory, "index.wal")
+    store = make_vector_store(directory, flush_every=4, wal_path=wal_path)
+    store.add_products(make_products(4))  # Saved snapshot
+    store.add_products(make_products(3, start=4))  # Only in the log
+    
+    recovered = make_vector_store(directory, wal_path=wal_path)
+    assert [p['id'] for p in recovered.products] == [f"P{i}" for i in range(7)]
+    assert recovered.index.ntotal == 7
+    
+    # Torn record from a crash mid-append is dropped, later appends still replay
+    with open(wal_path, 'ab') as f:
+        f.write(b"\x40\x00\x00\x00partial")
+    recovered = make_vector_store(directory, wal_path=wal_path)
+    recovered.add_products(make_products(1, start=7))
+    assert len(make_vector_store(directory, wal_path=wal_path).products) == 8
+
+
+def test_mutation_log_compaction():
+    """A save empties the log; records already in the snapshot are skipped"""
+    directory = tempfile.mkdtemp()
+    wal_path = os.path.join(directory, "index.wal")
+    store = make_vector_store(directory, flush_every=100, wal_path=wal_path)
+    store.add_products(make_products(5))
+    with open(wal_path, 'rb') as f:
+        logged = f.read()
+    
+    store.flush()
+    assert os.path.getsize(wal_path) == 0
+    
+    # Crash between writing the snapshot and emptying the log
+    with open(wal_path, 'wb') as f:
+        f.write(logged)
+    assert len(make_vector_store(directory, wal_path=wal_path).products) == 5
+
+
+def test_enhanced_replays_logged_features():
+    """EnhancedVectorStore recovers feature rows and attributes from the log"""
+    directory = tempfile.mkdtemp()
+    
+    def load():
+        return make_enhanced_store(directory, flush_every=100, wal_path=os.path.join(directory, "index.wal"))
+    
+    features = {'texture': {'feature_vector': np.arange(8.0), 'mean': 3.5}}
+    load().add_product("P0", np.ones(DIM), features, {'title': "Mask"})
+    
+    recovered = load()
+    assert recovered.products[0]['id'] == "P0"
+    assert np.array_equal(recovered.feature_matrix.get_row(0)['texture']['feature_vector'], np.arange(8.0))
+    assert recovered.features["P0"] == {'texture': {'mean': 3.5}}
+
+
+def test_feature_versions_flag_stale_vectors():
+    """Feature vectors saved by another extractor version are reported for re-indexing"""
+    directory = tempfile.mkdtemp()
+    
+    def load():
+        return make_enhanced_store(directory)
+    
+    store = load()
+    assert store.stale_features({'color': 2}) == []  # Nothing stored yet
+    store.add_product("P0", np.ones(DIM), {'color': {'feature_vector': np.ones(8)}}, {})
+    assert store.stale_features({'color': 2, 'texture': 1}) == ['color']  # Saved before versions were recorded
+    
+    store.feature_versions = {'color': 2, 'texture': 1}
+    store.add_product("P1", np.ones(DIM), {'color': {'feature_vector': np.ones(8)}}, {})
+    reloaded = load()
+    assert reloaded.stale_features({'color': 2, 'texture': 1}) == []
+    assert reloaded.stale_features({'color': 3, 'texture': 1}) == ['color']
+    reloaded.clear()
+    assert reloaded.feature_versions == {}
+
+
+def test_enhanced_realigns_feature_rows():
+    """Feature rows follow their products when another writer changed the index"""
+    directory = tempfile.mkdtemp()
+    
+    def load():
+        return make_enhanced_store(directory)
+    
+    store = load()
+    for i in range(4):
+        store.add_product(f"P{i}", np.full(DIM, i + 1.0), {'texture': {'feature_vector': np.full(8, float(i))}}, {})
+    
+    # VectorStore removes P1, compacts, replaces P3 and adds P4 on the same index and metadata
+    vector_store = make_vector_store(directory, compact_threshold=None)
+    vector_store.remove_product("P1")
+    vector_store.compact()
+    vector_store.add_products(make_products(1, start=3) + make_products(1, start=4))
+    
+    reloaded = load()
+    assert [p['id'] for p in reloaded.products] == ["P0", "P2", "P3", "P3", "P4"]
+    assert np.all(reloaded.feature_matrix.get_row(0)['texture']['feature_vector'] == 0)
+    assert np.all(reloaded.feature_matrix.get_row(1)['texture']['feature_vector'] == 2)
+    assert reloaded.feature_matrix.get_row(3) is None  # Replaced without features
+    assert reloaded.feature_matrix.get_row(4) is None
+    
+    # Without saved row IDs surplus rows can't be matched: ask for a re-index
+    matrices = os.path.join(directory, "matrices")
+    os.remove(os.path.join(matrices, "ids.npy"))
+    vector_store.remove_product("P0")
+    vector_store.compact()
+    try:
+        load()
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("Expected ValueError for unmatched feature rows")
+    
+    # Stripped features.pkl without matrices is never used to rebuild them
+    for name in os.listdir(matrices):
+        os.remove(os.path.join(matrices, name))
+    os.rmdir(matrices)
+    try:
+        load()
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("Expected ValueError for missing feature matrices")
+
+
+def test_crash_between_index_and_metadata_saves():
+    """Rows of logged products in an index saved without its metadata are replayed once"""
+    products = make_products(6)
+    embeddings = np.array([product['embedding'] for product in products], dtype=np.float32)
+    faiss.normalize_L2(embeddings)
+    for enhanced in (False, True):
+        directory = tempfile.mkdtemp()
+        load_logged_store(directory, enhanced).add_products(products[:4])
+        
+        child = multiprocessing.get_context("spawn").Process(
+            target=crash_after_index_save, args=(directory, enhanced)
+        )
+        child.start()
+        child.join()
+        assert child.exitcode == 3  # Killed after the index rename
+        
+        recovered = load_logged_store(directory, enhanced)
+        assert [p['id'] for p in recovered.products] == [f"P{i}" for i in range(6)]
+        assert recovered.index.ntotal == 6
+        assert np.allclose(reconstruct_all(recovered.index), embeddings)
+        recovered.flush()
+        assert np.allclose(reconstruct_all(load_logged_store(directory, enhanced).index), embeddings)
+
+
+def test_interrupted_compaction_is_rejected():
+    """An index compacted without its metadata can't be matched to the products"""
+    directory = tempfile.mkdtemp()
+    store = load_logged_store(directory)
+    store.add_products(make_products(4))
+    store.remove_product("P1")
+    
+    def interrupt():
+        raise IOError("crash before the metadata")
+    fail_metadata_save(store, interrupt)
+    try:
+        store.compact()
+    except IOError:
+        pass
+    finally:
+        base_vector_store.atomic_path = atomic_path
+    
+    try:
+        load_logged_store(directory)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("Expected ValueError for an index that doesn't match the metadata")
+
+
+def main():
+    """Run all persistence tests"""
+    tests = [
+        test_atomic_path_keeps_old_file_on_error,
+        test_deferred_flush,
+        test_flush_interval,
+        test_batch_matches_single_adds,
+        test_stores_take_the_same_batch,
+        test_enhanced_batch_rolls_back_on_bad_features,
+        test_mutation_log_replays_unsaved_products,
+        test_mutation_log_compaction,
+        test_enhanced_replays_logged_features,
+        test_feature_versions_flag_stale_vectors,
+        test_enhanced_realigns_feature_rows,
+        test_crash_between_index_and_metadata_saves,
+        test_interrupted_compaction_is_rejected,
+    ]
+    for test in tests:
+        test()
+        print(f"[OK] {test.__name__}")
+    print("\n[SUCCESS] All persistence tests passed!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Tests for the CLIP text embedding cache (uses a fake encoder, no model download)
+
+Usage: python test_text_embedding_cache.py (or pytest test_text_embedding_cache.py)
+"""
+
+import sys
+from pathlib import Path
+import numpy as np
+
+# Add app to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.services.text_embedding_cache import TextEmbeddingCache, default_vocabulary
+
+
+class FakeEncoder:
+    """Embeds a text as [len(text), 1, 0, 0], counting model calls"""
+    
+    def __init__(self):
+        self.calls = 0
+    
+    def encode_text(self, text):
+        self.calls += 1
+        return np.array([len(text), 1, 0, 0], dtype=np.float32)
+    
+    def encode_texts(self, texts, batch_size=256):
+        self.calls += 1
+        return np.stack([np.array([len(t), 1, 0, 0], dtype=np.float32) for t in texts])
+
+
+def test_vocabulary_served_without_model_calls():
+    """Warm-up encodes the vocabulary in one call; lookups are normalized"""
+    encoder = FakeEncoder()
+    cache = TextEmbeddingCache(encoder)
+    cache.warm_up()
+    assert encoder.calls == 1
+    assert "brass oil lamp" in default_vocabulary() and "wood mask" in default_vocabulary()
+    
+    embedding = cache.encode("  Brass   Oil LAMP ")
+    assert encoder.calls == 1
+    assert embedding[0] == len("brass oil lamp")
+    assert cache.stats()['vocabulary'] == len(default_vocabulary())
+
+
+def test_query_lru():
+    """Other queries run the model once, then come from the LRU"""
+    encoder = FakeEncoder()
+    cache = TextEmbeddingCache(encoder, max_entries=2)
+    assert cache.get("red clay vase with handles") is None
+    cache.encode("red clay vase with handles")
+    cache.encode("red clay vase with handles")
+    assert encoder.calls == 1
+    
+    cache.encode("blue batik")
+    cache.encode("green batik")
+    assert cache.get("red clay vase with handles") is None
+    assert cache.stats() == {'hits': 1, 'misses': 3, 'vocabulary': 0, 'entries': 2}
+
+
+def main():
+    """Run all text embedding cache tests"""
+    tests = [
+        test_vocabulary_served_without_model_calls,
+        test_query_lru,
+    ]
+    for test in tests:
+        test()
+        print(f"[OK] {test.__name__}")
+    print("\n[SUCCESS] All text embedding cache tests passed!")
+
+
+if __name__ == "__main__":
+    main()